@@ -1,27 +1,75 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import logging
-import cv2
+import os
 import time
 
-from perception.pose_estimator import PoseEstimator
+from event_stream import EventHub, format_sse
 from manipulation.state_machine import ScanStateMachine
+from async_bridge import BlockingExecutor, VersionWaiter
+from startup import Readiness
+from metrics import REGISTRY, RequestMetrics
+from tracing import LATENCY, TRACER
 
-def create_app(tracker_state, inventory, arm=None, camera_stream=None):
+def attach_cameras(app, cameras):
+    """Make camera(s) available to the API; the first one is the default stream."""
+    cameras = list(cameras) if isinstance(cameras, (list, tuple)) else [cameras]
+    app.state.camera_streams = {getattr(c, "name", "main"): c for c in cameras}
+    app.state.camera_stream = cameras[0]
+
+
+def create_app(tracker_state, inventory, arm=None, camera_stream=None, perception=None,
+               storage_workers=None, encode_workers=None, readiness=None):
+    """
+    camera_stream / perception may be None at first and attached later through
+    app.state (staged startup: the API binds before the camera and model are
+    up). `readiness` reports per-subsystem progress on /ready and /status.
+    camera_stream can also be a list of named cameras; the first one is the
+    default for video, the others are picked with ?camera=<name>.
+    """
     app = FastAPI(title="Grocery Robot API")
-    app.state.camera_stream = camera_stream
+    app.state.camera_streams = {}
+    app.state.camera_stream = None
+    if camera_stream is not None:
+        attach_cameras(app, camera_stream)
+    app.state.perception = perception
     app.state.inventory = inventory
     app.state.tracker_state = tracker_state
+    app.state.broadcasters = {}
+    app.state.pose_estimator = None
+    if readiness is None:
+        # Everything handed in up front is already up
+        readiness = Readiness([name for name, part in (("camera", camera_stream), ("model", perception)) if part])
+        for name in list(readiness.subsystems):
+            readiness.ready(name)
+    app.state.readiness = readiness
     
     # Initialize Logic Components
     state_machine = ScanStateMachine(arm) if arm else None
     app.state.state_machine = state_machine
-    
-    # Initialize Pose Estimator
-    pose_estimator = PoseEstimator()
+
+    # Push stream of tracker/inventory deltas for /events
+    event_hub = EventHub()
+    tracker_state.add_listener(event_hub.publish)
+    inventory.add_listener(event_hub.publish)
+    app.state.event_hub = event_hub
+
+    # Handlers are async: anything that blocks (inventory writes, JPEG encoding)
+    # goes to its own sized pool so streaming viewers can't starve /objects or /log
+    storage = BlockingExecutor("api-storage", storage_workers or int(os.environ.get("API_STORAGE_WORKERS", 2)))
+    encoder = BlockingExecutor("api-encode", encode_workers or int(os.environ.get("API_ENCODE_WORKERS", 2)))
+    app.state.storage_executor = storage
+    app.state.encode_executor = encoder
+    # One thread for on-demand profiles (created on first use)
+    profiler_pool = BlockingExecutor("api-profiler", 1)
+
+    # Long-polls wait on the event loop instead of a blocked thread each
+    objects_waiter = VersionWaiter(tracker_state)
+    inventory_waiter = VersionWaiter(inventory)
     
     # Enable CORS for Next.js frontend
     app.add_middleware(
@@ -32,34 +80,131 @@ def create_app(tracker_state, inventory, arm=None, camera_stream=None):
         allow_headers=["*"],
     )
 
+    # Per-route latency for /metrics
+    app.add_middleware(RequestMetrics)
+
     logger = logging.getLogger("API")
 
+    # Versions restart at 0 with the process, so ETags carry a per-process epoch
+    etag_epoch = int(time.time())
+    MAX_WAIT_SECONDS = 30.0
+
+    def versioned_response(request, kind, version, payload, since=None, extra_headers=None):
+        """
+        JSON response tagged with the state version. Returns 304 if the client
+        already has this version (If-None-Match, or ?since= after a long-poll timeout).
+        """
+        etag = f'"{kind}-{etag_epoch}-{version}"'
+        headers = {"ETag": etag, "X-Version": str(version), **(extra_headers or {})}
+        if request.headers.get("if-none-match") == etag or (since is not None and version <= since):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=payload, headers=headers)
+
     @app.get("/")
-    def read_root():
+    async def read_root():
         return {"status": "Grocery Robot API Online"}
 
+    @app.on_event("startup")
+    def api_started():
+        readiness.milestone("api_started")
+
     @app.get("/status")
-    def get_status():
+    async def get_status():
         # Minimal status
-        return {
-            "state": "CONTINUOUS_PERCEPTION",
-            "running": True
+        status = {
+            "state": "CONTINUOUS_PERCEPTION" if readiness.is_ready() else "STARTING",
+            "running": True,
+            "startup": readiness.snapshot()
         }
+        if app.state.perception:
+            status["perception"] = app.state.perception.get_stats()
+        # Frame age (capture -> inference / tracker / objects / log) percentiles
+        status["latency"] = LATENCY.percentiles()
+        return status
+
+    @app.get("/metrics")
+    async def get_metrics():
+        """Counters, gauges and latency histograms in Prometheus text format."""
+        return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    @app.get("/debug/trace")
+    async def get_trace(seconds: float = 2.0):
+        """
+        Record `seconds` of spans (capture, pipeline stages, API serving, tagged
+        with frame ids) and return them as Chrome trace-event JSON.
+        """
+        seconds = max(0.1, min(seconds, 30.0))
+        if not TRACER.start(seconds):
+            return JSONResponse(status_code=409, content={"error": "A trace is already being recorded"})
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            TRACER.stop()
+        return JSONResponse(content=TRACER.dump(),
+                            headers={"Content-Disposition": 'attachment; filename="perception-trace.json"'})
+
+    @app.get("/debug/profile")
+    async def get_profile(seconds: float = 5.0, hz: int = 100, mode: str = "cpu", format: str = "json"):
+        """
+        Sample the stacks of every backend thread for `seconds`. Returns collapsed
+        stacks (flamegraph.pl / speedscope input) and CPU time per thread as JSON,
+        or ?format=collapsed for the stacks alone as text. mode=wall also counts
+        threads that are blocked.
+        """
+        from profiler import SamplingProfiler # Deferred, only needed on demand
+        try:
+            profiler = SamplingProfiler(max(0.5, min(seconds, 60.0)), hz=max(1, min(hz, 1000)), mode=mode)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        result = None if SamplingProfiler.running() else await profiler_pool.run(profiler.run)
+        if result is None:
+            return JSONResponse(status_code=409, content={"error": "A profile is already running"})
+        if format == "collapsed":
+            return Response(result["collapsed"], media_type="text/plain")
+        return result
+
+    @app.get("/ready")
+    async def get_ready():
+        """200 once every subsystem is up, 503 with the per-subsystem states before that."""
+        snapshot = readiness.snapshot()
+        return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
 
     # Removed /start, /stop, /scan as they were for the manual planner
     
     @app.get("/objects")
-    def get_objects():
-        """Return stable tracked objects."""
-        return tracker_state.get_stable_objects() # logic/TaskPlanner not needed
+    async def get_objects(request: Request, since: Optional[int] = None, wait: float = 0.0,
+                          camera: Optional[str] = None):
+        """
+        Return stable tracked objects, ?camera=<name> only those seen by that camera.
+        ?since=<version>&wait=<s> long-polls until the tracker state is newer than `since`.
+        """
+        if camera is not None and app.state.camera_streams and camera not in app.state.camera_streams:
+            return JSONResponse(status_code=404, content={"error": f"Unknown camera {camera}",
+                                                          "cameras": list(app.state.camera_streams)})
+        if since is not None and wait > 0:
+            await objects_waiter.wait_for_change(since, min(wait, MAX_WAIT_SECONDS))
+        start = time.monotonic()
+        version, objects = tracker_state.get_stable_snapshot(camera) # logic/TaskPlanner not needed
+        kind = f"objects-{camera}" if camera else "objects"
+        headers = None
+        if objects:
+            # How stale the freshest box is (each object also carries frame_id / captured_at)
+            newest = max(objects, key=lambda obj: obj['captured_at'])
+            age = LATENCY.record("objects", newest['captured_at'], time.time())
+            headers = {"X-Frame-Id": str(newest['frame_id']), "X-Frame-Age-Ms": f"{age * 1000:.1f}"}
+            TRACER.span("serve /objects", start, time.monotonic(),
+                        {"frames": [f"{newest['camera']}:{newest['frame_id']}"], "objects": len(objects)}, "api")
+        return versioned_response(request, kind, version, objects, since, headers)
 
     @app.post("/log/{track_id}")
-    def log_item(track_id: int):
+    async def log_item(track_id: int, sync: bool = False):
         """
         Log an item to inventory by track ID.
         Returns the logged item including calculated grasp pose.
+        ?sync=true waits for the write to be committed instead of queueing it.
         """
         # mark_logged now returns a dict with {label, box, score} or None
+        start = time.monotonic()
         obj_data = tracker_state.mark_logged(track_id)
         
         if obj_data:
@@ -67,7 +212,16 @@ def create_app(tracker_state, inventory, arm=None, camera_stream=None):
             box = obj_data['box']
             
             # Estimate Pose
-            pose = pose_estimator.estimate_pose(box)
+            if app.state.pose_estimator is None:
+                from perception.pose_estimator import PoseEstimator # Deferred, only /log needs it
+                app.state.pose_estimator = PoseEstimator()
+            pose = app.state.pose_estimator.estimate_pose(box)
+            # The pose is only as fresh as the frame the box came from
+            age = LATENCY.record("log", obj_data['captured'])
+            frame = {"camera": obj_data['camera'], "frame_id": obj_data['frame_id'],
+                     "captured_at": round(time.time() - age, 3), "age_ms": round(age * 1000, 1)}
+            TRACER.span("serve /log", start, time.monotonic(),
+                        {"frames": [f"{obj_data['camera']}:{obj_data['frame_id']}"], "track_id": track_id}, "api")
             
             # Add to Inventory with Pose
             # Note: inventory.add_item calls inventory_db.add_item which now accepts pose
@@ -83,31 +237,72 @@ def create_app(tracker_state, inventory, arm=None, camera_stream=None):
             # For now let's assume InventoryManager abstracts it.
             # Wait, I should verify inventory.py.
             
-            added_item = inventory.add_item(item_name, category="grocery", qty=1, pose=pose)
+            added_item = await storage.run(inventory.add_item, item_name, category="grocery", qty=1, pose=pose, sync=sync)
             
-            return JSONResponse(content={"success": True, "item": added_item})
+            return JSONResponse(content={"success": True, "item": added_item, "frame": frame})
         
         return JSONResponse(content={"success": False, "error": "Item not found or already logged"})
 
     @app.get("/inventory")
-    def get_inventory():
-        return inventory.get_all()
+    async def get_inventory(request: Request, since: Optional[int] = None, wait: float = 0.0):
+        """Same conditional GET / long-poll contract as /objects."""
+        if since is not None and wait > 0:
+            await inventory_waiter.wait_for_change(since, min(wait, MAX_WAIT_SECONDS))
+        version, items = inventory.get_snapshot()
+        return versioned_response(request, "inventory", version, items, since)
 
     @app.post("/inventory/add")
-    def add_inventory_item(item: dict):
-        from logic import inventory_db
-        return inventory_db.add_item(item['name'], item['category'], item.get('qty', 1))
+    async def add_inventory_item(item: dict):
+        return await storage.run(inventory.add_item, item['name'], category=item['category'], qty=item.get('qty', 1))
+
+    # Registered before /inventory/{item_id}, which would otherwise catch "delete"
+    @app.delete("/inventory/delete")
+    async def delete_inventory_item_by_name(item_name: str):
+        success = await storage.run(inventory.delete_item_by_name, item_name)
+        return {"success": success}
+
+    @app.post("/inventory/clear")
+    async def clear_inventory():
+        await storage.run(inventory.clear)
+        return {"message": "Inventory cleared"}
 
     @app.delete("/inventory/{item_id}")
-    def delete_inventory_item(item_id: int):
-        success = inventory.delete_item(item_id) # integer ID to name or just ignore for now as our DB uses name
+    async def delete_inventory_item(item_id: int):
+        success = await storage.run(inventory.delete_item, item_id) # integer ID to name or just ignore for now as our DB uses name
         if success:
             return {"success": True, "message": f"Item with ID {item_id} deleted."}
         else:
             return JSONResponse(status_code=404, content={"success": False, "message": f"Item with ID {item_id} not found."})
 
+    @app.get("/events")
+    async def stream_events(rate: float = 10.0):
+        """
+        Server-Sent Events stream of deltas: track.* and inventory.* events.
+        Starts with a `snapshot` event; `resync` means events were dropped and the
+        client should refetch. ?rate= caps how often a batch is sent (Hz).
+        """
+        sub = event_hub.subscribe(max_rate_hz=max(0.5, min(rate, 30.0)))
+
+        async def generate():
+            try:
+                objects_version, objects = tracker_state.get_stable_snapshot()
+                inventory_version, items = inventory.get_snapshot()
+                yield format_sse("snapshot", {
+                    "objects": objects, "objects_version": objects_version,
+                    "inventory": items, "inventory_version": inventory_version
+                })
+                while True:
+                    messages = await sub.adrain(timeout=15.0)
+                    # Comment line doubles as a keep-alive when idle
+                    yield "".join(messages) if messages else ": keep-alive\n\n"
+            finally:
+                sub.close()
+
+        return StreamingResponse(generate(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+
     @app.post("/robot/scan")
-    def trigger_scan():
+    async def trigger_scan():
         if not state_machine:
             return JSONResponse(content={"success": False, "error": "Arm not initialized"}, status_code=503)
             
@@ -115,61 +310,66 @@ def create_app(tracker_state, inventory, arm=None, camera_stream=None):
         return JSONResponse(content={"success": success, "message": msg})
 
     # --- Video Streaming ---
-    from fastapi.responses import StreamingResponse
-    import cv2
-    import time
-
-    def generate_frames():
-        while True:
-            # We need access to camera_stream here. 
-            # Ideally tracker_state or a global should provide it, or we pass it to create_app.
-            # For now, let's assume we can pass camera_stream to create_app.
-            if hasattr(app.state, 'camera_stream'):
-                frame = app.state.camera_stream.read()
-                if frame is None:
-                    continue
-                
-                # Encode frame to JPEG
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
+
+    # One encoder per camera for all its viewers: each frame is JPEG-encoded once per rendition.
+    # Created on first use, once the camera is attached (keeps cv2 out of API startup).
+    def get_broadcaster(camera=None):
+        streams = app.state.camera_streams
+        name = camera or next(iter(streams), None)
+        stream = streams.get(name)
+        if stream is None:
+            return None
+        if name not in app.state.broadcasters:
+            from video_stream import MjpegBroadcaster
+            # With several cameras the annotations only show that camera's tracks
+            app.state.broadcasters[name] = MjpegBroadcaster(stream, tracker_state,
+                                                            camera=name if len(streams) > 1 else None)
+        return app.state.broadcasters[name]
+
+    @app.on_event("shutdown")
+    def stop_background():
+        for broadcaster in app.state.broadcasters.values():
+            broadcaster.stop()
+        storage.shutdown()
+        encoder.shutdown()
+        profiler_pool.shutdown()
+
+    async def generate_frames(sub):
+        try:
+            while True:
+                chunk = await sub.aget(timeout=5.0)
+                if chunk is None:
                     continue
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            else:
-                # Fallback or error
-                time.sleep(0.1)
+                yield chunk
+        finally:
+            sub.close()
     
     @app.get("/video_feed")
-    def video_feed():
-        return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+    async def video_feed(width: Optional[int] = None, quality: Optional[int] = None,
+                   fps: Optional[float] = None, annotate: bool = False, camera: Optional[str] = None):
+        """
+        MJPEG stream. Optional ?width= (px, keeps aspect), ?quality= (10-95),
+        ?fps= (capped by the server), ?annotate=true to burn in tracker boxes and
+        ?camera=<name> (default: the first camera).
+        """
+        broadcaster = get_broadcaster(camera)
+        if broadcaster is None:
+            return JSONResponse(status_code=503, content={"error": "Camera not ready"})
+        sub = broadcaster.subscribe(broadcaster.rendition(width, quality, annotate), fps)
+        return StreamingResponse(generate_frames(sub),
+                                 media_type="multipart/x-mixed-replace; boundary=frame")
 
     @app.get("/camera/latest")
-    def get_latest_frame():
-        """Return the current frame as a single JPEG image."""
-        if hasattr(app.state, 'camera_stream'):
-            frame = app.state.camera_stream.read()
-            if frame is not None:
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if ret:
-                    from fastapi.responses import Response
-                    return Response(content=buffer.tobytes(), media_type="image/jpeg")
+    async def get_latest_frame(width: Optional[int] = None, quality: Optional[int] = None,
+                               annotate: bool = False, camera: Optional[str] = None):
+        """Return the current frame as a single JPEG image (same options as /video_feed)."""
+        broadcaster = get_broadcaster(camera)
+        if broadcaster:
+            jpeg = await encoder.run(broadcaster.latest_jpeg, broadcaster.rendition(width, quality, annotate))
+            if jpeg is not None:
+                return Response(content=jpeg, media_type="image/jpeg")
         
-        # Return a placeholder or 404 if no frame
-        return JSONResponse(status_code=404, content={"error": "Camera not ready"})
-
-    return app
-
-    @app.delete("/inventory/delete")
-    def delete_inventory_item_by_name(item_name: str):
-        from logic import inventory_db
-        success = inventory_db.delete_item(item_name)
-        return {"success": success}
-
-    @app.post("/inventory/clear")
-    def clear_inventory():
-        from logic import inventory_db
-        inventory_db.clear_db()
-        return {"message": "Inventory cleared"}
+        # Return a placeholder or 503 if no frame yet
+        return JSONResponse(status_code=503, content={"error": "Camera not ready"})
 
     return app
@@ -0,0 +1,79 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Glue between the threaded backend (camera, perception, write-behind inventory)
+# and the async API: lets coroutines wait on changes made by other threads
+# without parking a threadpool worker per waiting request.
+
+
+class LoopSignal:
+    """An asyncio.Event bound to a loop that can be set from any thread."""
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def set(self):
+        # Any thread
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass # Loop already closed, nobody is waiting anymore
+
+    def clear(self):
+        self.event.clear()
+
+    async def wait(self, timeout):
+        """Wait until set. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class VersionWaiter:
+    """
+    Async long-poll on a versioned source (TrackerState / InventoryManager):
+    registers as the source's listener and wakes waiting coroutines on every
+    delta, they then re-check `source.version`.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.signals = () # Copy-on-write, read from the notifying thread
+        source.add_listener(self.notify)
+
+    def notify(self, events=None):
+        for signal in self.signals:
+            signal.set()
+
+    async def wait_for_change(self, since, timeout):
+        """Wait until version > since or timeout. Returns the current version."""
+        loop = asyncio.get_running_loop()
+        signal = LoopSignal(loop)
+        # Register before checking so a bump in between still wakes us
+        self.signals = self.signals + (signal,)
+        try:
+            deadline = loop.time() + timeout
+            while self.source.version <= since:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or not await signal.wait(remaining):
+                    break
+                signal.clear()
+        finally:
+            self.signals = tuple(s for s in self.signals if s is not signal)
+        return self.source.version
+
+
+class BlockingExecutor:
+    """Sized thread pool for one kind of blocking work (storage, image encoding)."""
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
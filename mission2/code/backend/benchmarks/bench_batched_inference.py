@@ -0,0 +1,65 @@
+"""
+Aggregate throughput of N cameras: one batched forward pass per tick
+(backend.detect_batch, what PerceptionLoop does with several cameras) vs. N
+separate calls, as N independent loops would make.
+
+Frames come from a directory of images or a video file; camera i gets frame
+t + i so the batch isn't N copies of the same image:
+    python -m benchmarks.bench_batched_inference --frames recordings/shelf.mp4 --cameras 1,2,4
+ONNX backends only batch with a dynamic export (python -m perception.backends export --dynamic).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from perception.backends import create_backend
+from benchmarks.bench_detector_backends import load_frames
+
+
+def run(backend, frames, cameras, ticks, conf, batched):
+    times = []
+    for t in range(ticks):
+        images = [frames[(t + i) % len(frames)] for i in range(cameras)]
+        start = time.perf_counter()
+        if batched:
+            backend.detect_batch(images, conf)
+        else:
+            for image in images:
+                backend.detect(image, conf)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", required=True, help="Directory of images or a video file")
+    parser.add_argument("--backend", default=None, help="torch / onnx / onnx-int8 (default DETECTOR_BACKEND)")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--cameras", default="1,2,3,4", help="Comma-separated camera counts")
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, 64)
+    if not frames:
+        raise SystemExit(f"No frames found in {args.frames}")
+    backend = create_backend(args.backend, args.model, args.imgsz, threads=args.threads)
+    print(f"{backend.name} backend, {len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'cameras':>8} {'mode':>10} {'tick p50':>9} {'tick p95':>9} {'frames/s':>9} {'speedup':>8}")
+    for cameras in (int(n) for n in args.cameras.split(",")):
+        results = {}
+        for mode in ("sequential", "batched"):
+            run(backend, frames, cameras, args.warmup, args.conf, mode == "batched")
+            ms = run(backend, frames, cameras, args.ticks, args.conf, mode == "batched")
+            results[mode] = cameras * 1000 / ms.mean()
+            speedup = results[mode] / results["sequential"]
+            print(f"{cameras:>8} {mode:>10} {np.percentile(ms, 50):9.1f} {np.percentile(ms, 95):9.1f} "
+                  f"{results[mode]:9.1f} {speedup:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Accuracy vs. cost of running the detector only every k-th frame (PerceptionLoop
+detect_interval) on recorded footage.
+
+The detector runs once on every frame; those detections are the reference
+(what detect_interval=1 serves). For each k the frames are then replayed in
+order: every k-th frame takes the reference detections (the model would give
+the same ones), the frames in between get boxes from
+  - flow: FlowPropagator moving the last detections with optical flow
+  - hold: the last detections as they are (no propagation)
+and are scored against that frame's reference: precision / recall at --iou
+and mean IoU of the matches, over the in-between frames only (keyframes are
+exact by construction). Cost per frame is the measured model time on
+keyframes plus the measured propagation time on the rest.
+
+--adaptive also detects whenever the propagator asks for it (needs_detection),
+like the loop does, and reports how many detections that added.
+
+    python -m perception.recording record --out recordings/shelf --seconds 20
+    python -m benchmarks.bench_detect_interval --frames recordings/shelf --intervals 1,2,3,5,10
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from perception.backends import create_backend
+from perception.propagation import FlowPropagator
+from perception.recording import ReplaySource, is_recording
+from benchmarks.bench_detector_backends import load_frames, match
+
+
+def read_frames(path, limit):
+    if not is_recording(path):
+        return load_frames(path, limit)
+    source = ReplaySource(path, speed=0)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = source.read()
+        if not ok:
+            break
+        frames.append(frame.copy())
+    source.release()
+    return frames
+
+
+def score(ref, det, iou_threshold):
+    """(matches, detections, reference boxes, sum of matched IoU) of one frame."""
+    pairs = match(ref, det, iou_threshold)
+    return len(pairs), len(det[2]), len(ref[2]), sum(iou for _, _, iou in pairs)
+
+
+def run_interval(frames, reference, det_ms, k, iou_threshold, adaptive):
+    flow = FlowPropagator()
+    totals = {"flow": np.zeros(4), "hold": np.zeros(4)}
+    cost_ms, propagate_ms, detections = 0.0, [], 0
+    last = None
+    since = k
+    for i, frame in enumerate(frames):
+        if since >= k or (adaptive and flow.needs_detection):
+            boxes, confs, cls = reference[i]
+            t0 = time.perf_counter()
+            flow.observe(i, frame)
+            flow.reset(i, np.arange(len(cls)), boxes)
+            cost_ms += det_ms[i] + (time.perf_counter() - t0) * 1000
+            last = reference[i]
+            detections += 1
+            since = 1
+            continue
+        since += 1
+        t0 = time.perf_counter()
+        ids, boxes = flow.step(i, frame)
+        elapsed = (time.perf_counter() - t0) * 1000
+        cost_ms += elapsed
+        propagate_ms.append(elapsed)
+        _, confs, cls = last
+        totals["flow"] += score(reference[i], (boxes, confs[ids], cls[ids]), iou_threshold)
+        totals["hold"] += score(reference[i], last, iou_threshold)
+
+    result = {"k": k, "detections": detections, "ms_per_frame": round(cost_ms / len(frames), 2),
+              "propagate_ms": round(float(np.mean(propagate_ms)), 2) if propagate_ms else 0.0}
+    for mode, (matched, n_det, n_ref, iou_sum) in totals.items():
+        if not propagate_ms:
+            result[mode] = None # k=1: every frame is a keyframe
+            continue
+        result[mode] = {"precision": round(float(matched / n_det), 3) if n_det else 1.0,
+                        "recall": round(float(matched / n_ref), 3) if n_ref else 1.0,
+                        "miou": round(float(iou_sum / matched), 3) if matched else 0.0}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", required=True, help="Recording directory, directory of images or a video file")
+    parser.add_argument("--intervals", default="1,2,3,5,10", help="Comma-separated values of k")
+    parser.add_argument("--backend", default=None, help="torch / onnx / onnx-int8 (default DETECTOR_BACKEND)")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a match against the reference")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=300)
+    parser.add_argument("--adaptive", action="store_true", help="Also detect when the flow loses the boxes")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    frames = read_frames(args.frames, args.limit)
+    if not frames:
+        raise SystemExit(f"No frames found in {args.frames}")
+    backend = create_backend(args.backend, args.model, args.imgsz, threads=args.threads)
+    backend.warmup(frames[0])
+    reference, det_ms = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        reference.append(backend.detect(frame, args.conf))
+        det_ms.append((time.perf_counter() - t0) * 1000)
+    n_boxes = sum(len(r[2]) for r in reference)
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, {backend.name} backend: "
+          f"{np.mean(det_ms):.1f} ms per detection, {n_boxes / len(frames):.1f} boxes per frame")
+
+    results = [run_interval(frames, reference, det_ms, int(k), args.iou, args.adaptive)
+               for k in args.intervals.split(",")]
+    base = next((r["ms_per_frame"] for r in results if r["k"] == 1), float(np.mean(det_ms)))
+    print(f"{'k':>3} {'dets':>5} {'ms/frame':>9} {'speedup':>8} {'flow ms':>8} | "
+          f"{'flow prec':>9} {'recall':>6} {'mIoU':>6} | {'hold prec':>9} {'recall':>6} {'mIoU':>6}")
+    for r in results:
+        r["speedup"] = round(base / r["ms_per_frame"], 2)
+        accuracy = " | ".join(f"{m['precision']:>9} {m['recall']:>6} {m['miou']:>6}" if m else f"{'-':>9} {'-':>6} {'-':>6}"
+                              for m in (r["flow"], r["hold"]))
+        print(f"{r['k']:>3} {r['detections']:>5} {r['ms_per_frame']:>9} {r['speedup']:>7}x {r['propagate_ms']:>8} | "
+              f"{accuracy}")
+    print("(accuracy over the frames between detections, vs. detecting on every frame)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"frames": args.frames, "backend": backend.name, "detect_ms": round(float(np.mean(det_ms)), 2),
+                       "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
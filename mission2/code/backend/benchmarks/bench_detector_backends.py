@@ -0,0 +1,127 @@
+"""
+Accuracy / latency comparison of the detector backends on recorded frames.
+
+The first backend is the reference (default: torch, the original path); the
+others are scored against its detections: a detection matches if it has the
+same class and IoU >= --iou with a reference box. Reports per-frame latency
+percentiles plus precision/recall/mean IoU/confidence drift vs. the reference.
+
+Frames come from a directory of images or a video file:
+    python -m perception.backends export --int8        # once, writes yolov8n.onnx + yolov8n.int8.onnx
+    python -m benchmarks.bench_detector_backends --frames recordings/shelf.mp4
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from perception.backends import create_backend
+
+
+def load_frames(path, limit):
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.jpg")) + glob.glob(os.path.join(path, "*.png")))
+        return [cv2.imread(f) for f in files[:limit]]
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def box_iou(a, b):
+    """Pairwise IoU of xyxy boxes: (N,4) x (M,4) -> (N,M)."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match(ref, det, iou_threshold):
+    """Greedy same-class matching, highest IoU first. Returns [(ref_idx, det_idx, iou)]."""
+    ref_boxes, _, ref_cls = ref
+    det_boxes, _, det_cls = det
+    if not len(ref_cls) or not len(det_cls):
+        return []
+    iou = box_iou(ref_boxes, det_boxes)
+    iou[ref_cls[:, None] != det_cls[None, :]] = 0
+    pairs = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < iou_threshold:
+            return pairs
+        pairs.append((i, j, float(iou[i, j])))
+        iou[i, :] = 0
+        iou[:, j] = 0
+
+
+def run_backend(backend, frames, conf, warmup):
+    for frame in frames[:warmup]:
+        backend.detect(frame, conf)
+    outputs, times = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        outputs.append(backend.detect(frame, conf))
+        times.append(time.perf_counter() - t0)
+    return outputs, np.array(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", required=True, help="Directory of images or a video file")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8", help="Comma-separated, first is the reference")
+    parser.add_argument("--model", default=None, help="Base model path (default yolov8n.pt / DETECTOR_MODEL)")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a match against the reference")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads per backend")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        raise SystemExit(f"No frames found in {args.frames}")
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    results = {}
+    for name in args.backends.split(","):
+        try:
+            backend = create_backend(name, args.model, args.imgsz, threads=args.threads)
+        except Exception as e:
+            print(f"{name:>10}: skipped ({e})")
+            continue
+        results[name] = run_backend(backend, frames, args.conf, args.warmup)
+
+    if not results:
+        return
+    ref_name = next(iter(results))
+    ref_outputs = results[ref_name][0]
+    print(f"{'backend':>10} {'p50 ms':>8} {'p95 ms':>8} {'fps':>6} {'dets':>6} "
+          f"{'prec':>6} {'recall':>6} {'mIoU':>6} {'dconf':>6}   (vs {ref_name})")
+    for name, (outputs, ms) in results.items():
+        n_ref = sum(len(o[1]) for o in ref_outputs)
+        n_det = sum(len(o[1]) for o in outputs)
+        ious, dconf = [], []
+        for ref, det in zip(ref_outputs, outputs):
+            for i, j, iou in match(ref, det, args.iou):
+                ious.append(iou)
+                dconf.append(abs(float(ref[1][i]) - float(det[1][j])))
+        precision = len(ious) / n_det if n_det else 1.0
+        recall = len(ious) / n_ref if n_ref else 1.0
+        print(f"{name:>10} {np.percentile(ms, 50):8.1f} {np.percentile(ms, 95):8.1f} "
+              f"{1000 / ms.mean():6.1f} {n_det:6d} {precision:6.3f} {recall:6.3f} "
+              f"{np.mean(ious) if ious else 0:6.3f} {np.mean(dconf) if dconf else 0:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
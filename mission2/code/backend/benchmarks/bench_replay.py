@@ -0,0 +1,179 @@
+"""
+End-to-end perception benchmark on recorded frames, no camera needed.
+
+Replays one recording per camera (python -m perception.recording record ...)
+through CameraStream -> PerceptionLoop -> TrackerState and reports:
+  - end-to-end FPS: frames that made it through the model per second (and
+    what the replay published, so drops show up)
+  - frame-to-stable latency: capture time of the frame an object first
+    appeared in -> the moment it became stable (visible on /objects)
+  - frame age (capture -> inference done / tracker updated) percentiles
+  - per-stage times from PerceptionLoop.get_stats()
+
+    python -m benchmarks.bench_replay --recording recordings/shelf --speed 1
+    python -m benchmarks.bench_replay --recording recordings/top --recording recordings/side --lockstep
+
+--speed 1 replays in real time (what the robot sees), 0 as fast as possible.
+--lockstep publishes the next frame only once the previous one is fully
+handled: nothing is dropped and, with --no-governor, runs are reproducible
+(same frames inferred, same tracks), so they can be compared across changes.
+"""
+import argparse
+import json
+import threading
+import time
+
+import numpy as np
+
+from startup import Readiness
+from perception.camera_stream import CameraStream
+from perception.continuous_detector import PerceptionLoop
+from perception.recording import ReplaySource
+from perception.tracker_state import TrackerState
+from tracing import LATENCY
+
+
+class StableLatency:
+    """TrackerState listener: capture time of a track's first frame -> time it became stable."""
+    def __init__(self):
+        self.start = 0.0 # Frames captured before the replay started count from here
+        self.lock = threading.Lock()
+        self.first_captured = {}
+        self.latencies = []
+        self.tracks = 0
+
+    def __call__(self, events):
+        now = time.time()
+        with self.lock:
+            for kind, data in events:
+                if kind == "track.appeared":
+                    self.tracks += 1
+                    self.first_captured[data["id"]] = data["captured_at"]
+                if kind == "track.stable":
+                    # A track can appear and become stable in the same update (min_seen_count=1)
+                    first = self.first_captured.pop(data["id"], data["captured_at"])
+                    self.latencies.append((now - max(first, self.start)) * 1000)
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = np.array(values)
+    return {"count": len(values), "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1), "max": round(float(values.max()), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording", action="append", required=True,
+                        help="Recording directory, repeat for several cameras")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 0 = as fast as possible")
+    parser.add_argument("--lockstep", action="store_true", help="One frame in flight at a time, nothing dropped")
+    parser.add_argument("--seconds", type=float, default=None, help="Stop after this long (default: end of replay)")
+    parser.add_argument("--backend", default=None, help="torch / onnx / onnx-int8 (default DETECTOR_BACKEND)")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=0, help="Inference worker processes")
+    parser.add_argument("--roi", default=None, help="As PERCEPTION_ROI")
+    parser.add_argument("--no-gate", action="store_true", help="Disable the motion gate")
+    parser.add_argument("--no-governor", action="store_true", help="Disable the perception governor")
+    parser.add_argument("--detect-interval", type=int, default=1,
+                        help="Run the model every k-th frame, optical flow in between")
+    parser.add_argument("--min-seen", type=int, default=5, help="TrackerState.min_seen_count")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    tracker_state = TrackerState(min_seen_count=args.min_seen)
+    stable = StableLatency()
+    tracker_state.add_listener(stable)
+
+    loop = None
+    lockstep = (lambda: loop.idle()) if args.lockstep else None
+    sources, cameras = [], []
+    for i, path in enumerate(args.recording):
+        source = ReplaySource(path, speed=args.speed, lockstep=lockstep, lockstep_timeout=30.0)
+        name = source.name if source.name not in [c.name for c in cameras] else f"{source.name}{i}"
+        sources.append(source)
+        cameras.append(CameraStream(src=source, shared=args.workers > 0, name=name))
+
+    readiness = Readiness(["model"])
+    loop = PerceptionLoop(cameras, tracker_state, model_path=args.model, imgsz=args.imgsz,
+                          conf_threshold=args.conf, inference_workers=args.workers, torch_threads=args.threads,
+                          backend=args.backend, readiness=readiness, roi=args.roi,
+                          motion_gate=not args.no_gate, governor=not args.no_governor,
+                          detect_interval=args.detect_interval).start()
+    # Replay starts once the model is warm, so load time doesn't count
+    while not readiness.is_ready("model"):
+        if readiness.snapshot()["subsystems"]["model"]["state"] == "failed":
+            raise SystemExit("Model failed to load")
+        time.sleep(0.05)
+
+    start = time.monotonic()
+    # (The first frame of each replay was read when its CameraStream opened, before the model loaded)
+    stable.start = time.time()
+    for camera in cameras:
+        camera.start()
+    deadline = start + args.seconds if args.seconds else None
+    while not all(camera.stopped for camera in cameras):
+        if deadline and time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    # Let the frames in flight finish
+    drain = time.monotonic() + 5.0
+    while not loop.idle() and time.monotonic() < drain:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - start
+
+    stats = loop.get_stats()
+    loop.stop()
+    for camera in cameras:
+        camera.stop()
+
+    published = sum(source.frames_read for source in sources)
+    results = {
+        "recordings": args.recording,
+        "speed": args.speed,
+        "lockstep": args.lockstep,
+        "detect_interval": args.detect_interval,
+        "backend": loop.backend.name if loop.backend else args.backend,
+        "seconds": round(elapsed, 2),
+        "frames_published": published,
+        "frames_late": sum(source.frames_late for source in sources),
+        "frames_inferred": stats["frames_inferred"],
+        "frames_gated": stats["frames_gated"],
+        "frames_propagated": stats["frames_propagated"],
+        "frames_dropped": stats["frames_dropped"],
+        "replay_fps": round(published / elapsed, 1),
+        "end_to_end_fps": round(stats["frames_inferred"] / elapsed, 1),
+        "tracks": stable.tracks,
+        "frame_to_stable_ms": percentiles(stable.latencies),
+        "frame_age": LATENCY.percentiles(),
+        "stages": stats["stages"],
+        "governor": stats["governor"]
+    }
+
+    print(f"{published} frames replayed in {elapsed:.1f}s ({results['replay_fps']} FPS, "
+          f"{results['frames_late']} skipped as late), "
+          f"{stats['frames_inferred']} inferred -> {results['end_to_end_fps']} FPS end-to-end "
+          f"({stats['frames_gated']} gated, {stats['frames_propagated']} propagated, "
+          f"{stats['frames_dropped']} dropped)")
+    latency = results["frame_to_stable_ms"]
+    if latency["count"]:
+        print(f"frame-to-stable: {latency['count']} of {stable.tracks} tracks, "
+              f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, max {latency['max']} ms")
+    else:
+        print(f"frame-to-stable: no stable objects ({stable.tracks} tracks)")
+    for point, age in results["frame_age"].items():
+        print(f"capture -> {point}: p50 {age['p50_ms']} ms, p90 {age['p90_ms']} ms, p99 {age['p99_ms']} ms")
+    print(f"{'stage':>12} {'frames':>7} {'avg ms':>8} {'dropped':>8}")
+    for name, stage in stats["stages"].items():
+        print(f"{name:>12} {stage['processed']:>7} {stage['avg_ms']:>8} {stage['queue_dropped']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
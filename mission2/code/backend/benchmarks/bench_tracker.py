@@ -0,0 +1,104 @@
+"""
+Per-frame tracker update time vs. number of boxes, native Tracker
+(perception.tracker) against ultralytics' BYTETracker (ByteTrackAdapter).
+
+Scenes are synthetic, so no model is needed: N objects move at constant
+velocity (plus jitter) over a canvas that grows with N (same density at every
+size), detections miss 5% of the time and get random scores, some of them low
+(second association stage). Besides time per update it reports identity
+errors against the ground truth, to check the trackers agree:
+  - switches: times an object's track id changed from one frame to the next
+  - ids: track ids handed out (ideally N)
+
+    python -m benchmarks.bench_tracker --boxes 10,50,100,200,500
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from perception.backends import ByteTrackAdapter
+from perception.tracker import Tracker, iou_matrix
+
+
+def make_scene(n, frames, seed=0):
+    """Ground-truth boxes (frames, n, 4) and per-frame (boxes, confs, clss, object index) detections."""
+    rng = np.random.default_rng(seed)
+    side = 640 * max(1.0, np.sqrt(n / 10)) # ~10 objects per 640x640
+    size = rng.uniform(30, 90, (n, 2))
+    pos = rng.uniform(0, side - 90, (n, 2))
+    vel = rng.uniform(-4, 4, (n, 2))
+    clss = rng.integers(0, 5, n).astype(np.int32)
+    truth, detections = [], []
+    for _ in range(frames):
+        pos += vel
+        bounce = (pos < 0) | (pos > side - size)
+        vel[bounce] *= -1
+        pos = np.clip(pos, 0, side - size)
+        boxes = np.concatenate([pos, pos + size], axis=1).astype(np.float32)
+        truth.append(boxes)
+        seen = np.flatnonzero(rng.random(n) > 0.05)
+        jitter = rng.normal(0, 1.5, (len(seen), 4)).astype(np.float32)
+        confs = np.where(rng.random(len(seen)) < 0.15, rng.uniform(0.1, 0.25, len(seen)),
+                         rng.uniform(0.4, 0.95, len(seen))).astype(np.float32)
+        detections.append((boxes[seen] + jitter, confs, clss[seen], seen))
+    return np.stack(truth), detections
+
+
+def run(tracker, truth, detections, warmup=5):
+    n = truth.shape[1]
+    times = []
+    last_id = np.full(n, -1, np.int64)
+    switches, ids = 0, set()
+    for i, (boxes, confs, clss, _) in enumerate(detections):
+        t0 = time.perf_counter()
+        track_ids, _, _, track_boxes = tracker.update(boxes, confs, clss)
+        if i >= warmup:
+            times.append(time.perf_counter() - t0)
+        if not len(track_ids):
+            continue
+        # Ground truth object of each output track: best IoU
+        iou = iou_matrix(track_boxes, truth[i])
+        obj = iou.argmax(axis=1)
+        ok = iou[np.arange(len(obj)), obj] > 0.5
+        for tid, o in zip(track_ids[ok].tolist(), obj[ok].tolist()):
+            ids.add(tid)
+            if last_id[o] != -1 and last_id[o] != tid:
+                switches += 1
+            last_id[o] = tid
+    ms = np.array(times) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "switches": switches, "ids": len(ids)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--boxes", default="10,50,100,200,500", help="Comma-separated object counts")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--trackers", default="native,bytetrack")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    factories = {"native": Tracker, "bytetrack": ByteTrackAdapter}
+    results = []
+    print(f"{'boxes':>6} {'tracker':>10} {'p50 ms':>8} {'p95 ms':>8} {'switches':>9} {'ids':>6}")
+    for n in (int(v) for v in args.boxes.split(",")):
+        truth, detections = make_scene(n, args.frames)
+        for name in args.trackers.split(","):
+            try:
+                tracker = factories[name]()
+            except Exception as e:
+                print(f"{n:>6} {name:>10}: skipped ({e})")
+                continue
+            result = run(tracker, truth, detections)
+            result.update(boxes=n, tracker=name)
+            results.append(result)
+            print(f"{n:>6} {name:>10} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['switches']:>9} {result['ids']:>6}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import json
+import asyncio
+import threading
+import time
+import logging
+import itertools
+from collections import OrderedDict
+
+from async_bridge import LoopSignal
+
+# Event types whose newer instance replaces an older one still waiting in a
+# client buffer (keyed by object id): only the latest box/qty matters.
+COALESCED_EVENTS = {"track.updated", "inventory.changed"}
+
+
+class Subscriber:
+    """
+    Per-client bounded buffer of serialized events.
+    Coalescable events are keyed by (type, id) so a slow client only ever holds
+    the latest update per object. On overflow the oldest events are dropped and
+    the client is sent a `resync` event telling it to refetch full state.
+    """
+    def __init__(self, hub, max_events=256, max_rate_hz=10.0):
+        self.hub = hub
+        self.max_events = max_events
+        self.min_interval = 1.0 / max_rate_hz if max_rate_hz else 0.0
+        self.cond = threading.Condition()
+        self.buffer = OrderedDict()
+        self.overflowed = False
+        self.closed = False
+        self.last_drain = 0.0
+        self._seq = itertools.count()
+        self.signal = None # Set by adrain(), wakes the async consumer
+
+    def push(self, event_type, key, message):
+        with self.cond:
+            if event_type in COALESCED_EVENTS and key is not None:
+                buf_key = (event_type, key)
+                self.buffer.pop(buf_key, None) # Re-append at the end
+            else:
+                buf_key = next(self._seq)
+            self.buffer[buf_key] = message
+            while len(self.buffer) > self.max_events:
+                self.buffer.popitem(last=False)
+                self.overflowed = True
+            self.cond.notify()
+        if self.signal:
+            self.signal.set()
+
+    def drain(self, timeout=15.0):
+        """
+        Wait for events and return them as a list of SSE-formatted strings
+        (empty list on timeout). Paced to at most max_rate_hz drains per second.
+        """
+        wait = self.last_drain + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait) # Throttle: let updates coalesce meanwhile
+        with self.cond:
+            self.cond.wait_for(lambda: self.buffer or self.closed, timeout)
+            messages = self._take() or []
+        self.last_drain = time.monotonic()
+        return messages
+
+    def _take(self):
+        # None if there is nothing to send yet (cond's lock is reentrant, drain() holds it)
+        with self.cond:
+            if not (self.buffer or self.closed):
+                return None
+            messages = list(self.buffer.values())
+            self.buffer.clear()
+            if self.overflowed:
+                messages.insert(0, format_sse("resync", {}))
+                self.overflowed = False
+            return messages
+
+    async def adrain(self, timeout=15.0):
+        """drain() for the event loop: waits without holding a thread."""
+        if self.signal is None:
+            self.signal = LoopSignal()
+        wait = self.last_drain + self.min_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        deadline = time.monotonic() + timeout
+        while True:
+            self.signal.clear()
+            messages = self._take()
+            if messages is not None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await self.signal.wait(remaining):
+                messages = []
+                break
+        self.last_drain = time.monotonic()
+        return messages
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.signal:
+            self.signal.set()
+        self.hub.unsubscribe(self)
+
+
+def format_sse(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventHub:
+    """
+    Fan-out of tracker and inventory deltas to streaming clients.
+    Each event is serialized once and shared by all subscribers.
+    """
+    def __init__(self, max_events=256, max_rate_hz=10.0):
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.max_events = max_events
+        self.max_rate_hz = max_rate_hz
+        self.logger = logging.getLogger("EventHub")
+
+    def subscribe(self, max_rate_hz=None):
+        sub = Subscriber(self, self.max_events, max_rate_hz or self.max_rate_hz)
+        with self.lock:
+            self.subscribers = self.subscribers + [sub]
+        self.logger.info(f"Client subscribed ({len(self.subscribers)} total)")
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s is not sub]
+
+    def publish(self, events):
+        """
+        Listener callback for TrackerState / InventoryManager.
+        `events` is a list of (event_type, data) where data carries an 'id' if it has one.
+        """
+        subscribers = self.subscribers # Copy-on-write list, no lock needed to read
+        if not subscribers:
+            return
+        for event_type, data in events:
+            message = format_sse(event_type, data)
+            key = data.get('id')
+            for sub in subscribers:
+                sub.push(event_type, key, message)
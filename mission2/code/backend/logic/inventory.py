@@ -1,17 +1,197 @@
 import logging
-from logic import inventory_db
+import os
+import threading
+from metrics import REGISTRY
+from logic.inventory_store import create_store, normalize_name, _now_str
+
+FLUSH_TIME = REGISTRY.histogram("inventory_flush_seconds", "Write-behind batch commits to the store")
+FLUSH_FAILURES = REGISTRY.counter("inventory_flush_failures_total", "Write-behind batches that failed to commit")
+PENDING_OPS = REGISTRY.gauge("inventory_pending_ops", "Increments queued for the next write-behind flush")
 
 class InventoryManager:
-    def __init__(self):
+    def __init__(self, store=None, write_behind=None, flush_interval_ms=50, max_batch_ops=200):
         self.logger = logging.getLogger("Inventory")
-        self.logger.info("Initialized InventoryManager with JSON DB")
+        self.store = store or create_store()
+
+        # Write-through read cache: { id: item } in insertion order.
+        # Cached dicts are replaced, never mutated, so they can be handed out as-is.
+        self.cache_lock = threading.Lock()
+        self._cache = {}
+        self._by_name = {}
+        # Bumped whenever the cached inventory changes; `changed` wakes long-pollers
+        self.version = 0
+        self.changed = threading.Condition(self.cache_lock)
+        self.listeners = []
+        self._reload_cache()
+
+        # Write-behind queue: increments to existing items are coalesced per
+        # name and flushed in one commit every flush_interval_ms or max_batch_ops.
+        if write_behind is None:
+            write_behind = os.getenv("INVENTORY_WRITE_BEHIND", "true").lower() != "false"
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_ops = max_batch_ops
+        self.flush_lock = threading.Lock() # Serializes flushes and direct writes
+        self._pending = {} # { name_key: {name, category, qty, pose, timestamp} }
+        self._pending_ops = 0
+        self._flush_event = threading.Event()
+        PENDING_OPS.set_function(lambda: self._pending_ops)
+        self.stopped = False
+        self.t = None
+        if self.write_behind:
+            self.t = threading.Thread(target=self._flush_loop, args=(), name="inventory-flush")
+            self.t.daemon = True
+            self.t.start()
+
+        self.logger.info(f"Initialized InventoryManager with {type(self.store).__name__} "
+                         f"({len(self._cache)} items, write_behind={self.write_behind})")
+
+    def _reload_cache(self):
+        items = self.store.get_all_items()
+        with self.cache_lock:
+            self._cache = {item['id']: item for item in items}
+            self._by_name = {normalize_name(item.get('name')): item['id'] for item in items}
+            self._bump()
+
+    def _bump(self, event=None):
+        # Caller holds cache_lock. Listeners run under it so events arrive in version order.
+        self.version += 1
+        self.changed.notify_all()
+        if event and self.listeners:
+            for callback in self.listeners:
+                try:
+                    callback([event])
+                except Exception as e:
+                    self.logger.error(f"Listener error: {e}")
+
+    def add_listener(self, callback):
+        """
+        Register callback(events) for cache deltas; events is a list of (event_type, data):
+        inventory.changed (data = item) / inventory.deleted / inventory.cleared.
+        """
+        self.listeners.append(callback)
+
+    def _overlay_pending(self, item):
+        # Caller holds cache_lock. Re-applies increments that are queued but not yet stored.
+        inc = self._pending.get(normalize_name(item.get('name')))
+        if inc:
+            item = dict(item, qty=item['qty'] + inc['qty'], timestamp=inc['timestamp'])
+            if inc['pose']:
+                item['pose'] = inc['pose']
+        return item
+
+    def _cache_put(self, item):
+        if not item:
+            return
+        with self.cache_lock:
+            item = self._overlay_pending(item)
+            if self._cache.get(item['id']) == item:
+                return # e.g. a flush confirming what the cache already shows
+            self._cache[item['id']] = item
+            self._by_name[normalize_name(item.get('name'))] = item['id']
+            self._bump(("inventory.changed", item))
+
+    def _cache_drop(self, item_id):
+        with self.cache_lock:
+            item = self._cache.pop(item_id, None)
+            if item:
+                key = normalize_name(item.get('name'))
+                self._by_name.pop(key, None)
+                # Increments queued since the caller's flush would re-create the item
+                dropped = self._pending.pop(key, None)
+                if dropped:
+                    self._pending_ops -= dropped['ops']
+                self._bump(("inventory.deleted", {"id": item_id}))
+
+    def _enqueue(self, item_name, category, qty, pose):
+        """
+        Coalesce an increment into the pending batch and update the cache optimistically.
+        Returns the optimistic item, or None if the item is unknown (needs a real ID first).
+        """
+        key = normalize_name(item_name)
+        now = _now_str()
+        with self.cache_lock:
+            item_id = self._by_name.get(key)
+            if item_id is None:
+                return None
+
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = {"name": item_name, "category": category, "qty": 0, "pose": None, "ops": 0}
+                self._pending[key] = pending
+            pending['qty'] += qty
+            pending['timestamp'] = now
+            if pose:
+                pending['pose'] = pose
+            pending['ops'] += 1
+            self._pending_ops += 1
+
+            cached = self._cache[item_id]
+            item = dict(cached, qty=cached['qty'] + qty, timestamp=now)
+            if pose:
+                item['pose'] = pose
+            self._cache[item_id] = item
+            self._bump(("inventory.changed", item))
+            batch_full = self._pending_ops >= self.max_batch_ops
+
+        if batch_full:
+            self._flush_event.set()
+        return item
+
+    def _flush_loop(self):
+        while not self.stopped:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            self.flush()
+
+    def flush(self):
+        """Commit all pending increments in one atomic batch."""
+        with self.flush_lock:
+            with self.cache_lock:
+                if not self._pending:
+                    return
+                batch = self._pending
+                self._pending = {}
+                self._pending_ops = 0
+
+            try:
+                with FLUSH_TIME.time():
+                    items = self.store.add_items(list(batch.values()))
+            except Exception as e:
+                FLUSH_FAILURES.inc()
+                self.logger.error(f"Failed to flush {len(batch)} inventory updates: {e}")
+                # Put the batch back in front of anything queued meanwhile
+                with self.cache_lock:
+                    for key, inc in self._pending.items():
+                        if key in batch:
+                            batch[key]['qty'] += inc['qty']
+                            batch[key]['timestamp'] = inc['timestamp']
+                            batch[key]['pose'] = inc['pose'] or batch[key]['pose']
+                            batch[key]['ops'] += inc['ops']
+                        else:
+                            batch[key] = inc
+                    self._pending = batch
+                    self._pending_ops = sum(inc['ops'] for inc in batch.values())
+                return
 
-    def log_item(self, item_name, category="grocery", status="stored", qty=1, pose=None):
+            # Refresh the cache from the store, keeping increments queued since the swap
+            for item in items:
+                self._cache_put(item)
+
+    def log_item(self, item_name, category="grocery", status="stored", qty=1, pose=None, sync=False):
         # Map log_item to add_item
-        # Note: 'status' is not currently used in the simple JSON schema, 
+        # Note: 'status' is not currently used in the simple JSON schema,
         # but we could add it if needed. For now, we just track name, category, qty.
+        # sync=True bypasses the write-behind queue and returns once the write is durable.
         try:
-            result = inventory_db.add_item(item_name, category, qty, pose)
+            result = None
+            if self.write_behind and not sync:
+                result = self._enqueue(item_name, category, qty, pose)
+            if result is None:
+                self.flush()
+                with self.flush_lock:
+                    result = self.store.add_item(item_name, category, qty, pose)
+                    self._cache_put(result)
             self.logger.info(f"Logged item: {item_name} ({category})")
             return result
         except Exception as e:
@@ -19,11 +199,20 @@ class InventoryManager:
             return None
 
     def get_inventory(self):
-        try:
-            return inventory_db.get_all_items()
-        except Exception as e:
-            self.logger.error(f"Failed to fetch inventory: {e}")
-            return []
+        # Served from the cache, no disk access
+        with self.cache_lock:
+            return list(self._cache.values())
+
+    def get_snapshot(self):
+        """Return (version, items) as one consistent pair."""
+        with self.cache_lock:
+            return self.version, list(self._cache.values())
+
+    def wait_for_change(self, since, timeout):
+        """Block until version > since or timeout. Returns the current version."""
+        with self.cache_lock:
+            self.changed.wait_for(lambda: self.version > since, timeout)
+            return self.version
 
     def get_all(self):
         """Alias for get_inventory to match API spec."""
@@ -31,14 +220,62 @@ class InventoryManager:
 
     def delete_item(self, item_id):
         try:
-            return inventory_db.delete_item_by_id(item_id)
+            self.flush()
+            with self.flush_lock:
+                success = self.store.delete_item_by_id(item_id)
+                if success:
+                    self._cache_drop(item_id)
+            return success
         except Exception as e:
             self.logger.error(f"Failed to delete item {item_id}: {e}")
             return False
 
-    def close(self):
-        pass # No connection to close
+    def delete_item_by_name(self, item_name):
+        try:
+            self.flush()
+            with self.flush_lock:
+                success = self.store.delete_item(item_name)
+                if success:
+                    with self.cache_lock:
+                        item_id = self._by_name.get(normalize_name(item_name))
+                    if item_id is not None:
+                        self._cache_drop(item_id)
+            return success
+        except Exception as e:
+            self.logger.error(f"Failed to delete item {item_name}: {e}")
+            return False
+
+    def update_item_qty(self, item_name, qty):
+        try:
+            self.flush()
+            with self.flush_lock:
+                result = self.store.update_item_qty(item_name, qty)
+                self._cache_put(result)
+            return result
+        except Exception as e:
+            self.logger.error(f"Failed to update item {item_name}: {e}")
+            return None
 
-    def add_item(self, item_name, category="grocery", qty=1, pose=None):
-        return self.log_item(item_name, category=category, qty=qty, pose=pose)
+    def clear(self):
+        self.flush()
+        with self.flush_lock:
+            self.store.clear()
+            with self.cache_lock:
+                self._cache = {}
+                self._by_name = {}
+                self._pending = {} # Queued since the flush above, for items that are gone now
+                self._pending_ops = 0
+                self._bump(("inventory.cleared", {}))
+
+    def close(self):
+        """Stop the flusher, write out anything pending and close the store."""
+        self.stopped = True
+        self._flush_event.set()
+        if self.t and self.t.is_alive():
+            self.t.join()
+        self.flush()
+        self.store.close()
+        self.logger.info("Inventory flushed and closed.")
 
+    def add_item(self, item_name, category="grocery", qty=1, pose=None, sync=False):
+        return self.log_item(item_name, category=category, qty=qty, pose=pose, sync=sync)
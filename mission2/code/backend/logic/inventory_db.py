@@ -3,29 +3,40 @@ import os
 import fcntl
 from datetime import datetime
 
+from metrics import REGISTRY
+
+DB_TIME = REGISTRY.histogram("inventory_db_seconds", "JSON inventory file load / save", ("op",))
+_LOAD_TIME = DB_TIME.labels("load")
+_SAVE_TIME = DB_TIME.labels("save")
+
 # Define the path relative to this file
 # logic/inventory_db.py -> ../data/inventory_db.json
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'inventory_db.json')
 
+def normalize_name(name):
+    """Key used for case-insensitive item matching (same in every backend and the cache)."""
+    return (name or '').strip().lower()
+
 def _load_db():
     """Load the database from the JSON file with shared lock."""
     if not os.path.exists(DB_PATH):
         return []
-    try:
-        with open(DB_PATH, 'r') as f:
-            try:
-                fcntl.flock(f, fcntl.LOCK_SH)
-                return json.load(f)
-            finally:
-                fcntl.flock(f, fcntl.LOCK_UN)
-    except (json.JSONDecodeError, IOError):
-        return []
+    with _LOAD_TIME.time():
+        try:
+            with open(DB_PATH, 'r') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                    return json.load(f)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        except (json.JSONDecodeError, IOError):
+            return []
 
 def _save_db(data):
     """Save the database to the JSON file with exclusive lock."""
     # Ensure the directory exists
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with open(DB_PATH, 'w') as f:
+    with _SAVE_TIME.time(), open(DB_PATH, 'w') as f:
         try:
             fcntl.flock(f, fcntl.LOCK_EX)
             json.dump(data, f, indent=4)
@@ -40,7 +51,7 @@ def add_item(item_name, category, qty=1, pose=None):
     
     # Check if item already exists (simple case-insensitive match)
     for item in db:
-        if item.get('name', '').lower() == item_name.lower():
+        if normalize_name(item.get('name')) == normalize_name(item_name):
             item['qty'] += qty
             item['timestamp'] = datetime.now().strftime("%d/%m/%y %I:%M %p") # Update timestamp
             if pose:
@@ -61,6 +72,37 @@ def add_item(item_name, category, qty=1, pose=None):
     _save_db(db)
     return new_item
 
+def add_items(increments):
+    """
+    Apply a batch of coalesced increments with a single load/save.
+    Each entry: {name, category, qty, pose, timestamp}. Returns the touched items.
+    """
+    db = _load_db()
+    by_name = {normalize_name(item.get('name')): item for item in db}
+    next_id = max((item.get('id', 0) for item in db), default=0) + 1
+    touched = []
+    for inc in increments:
+        item = by_name.get(normalize_name(inc['name']))
+        if item is None:
+            item = {
+                "id": next_id,
+                "name": inc['name'],
+                "category": inc['category'],
+                "qty": 0,
+                "timestamp": inc['timestamp'],
+                "pose": None
+            }
+            next_id += 1
+            db.append(item)
+            by_name[normalize_name(inc['name'])] = item
+        item['qty'] += inc['qty']
+        item['timestamp'] = inc['timestamp']
+        if inc.get('pose'):
+            item['pose'] = inc['pose']
+        touched.append(item)
+    _save_db(db)
+    return touched
+
 def get_all_items():
     """Retrieve all items from the database."""
     return _load_db()
@@ -69,7 +111,7 @@ def update_item_qty(item_name, qty):
     """Update the quantity of a specific item."""
     db = _load_db()
     for item in db:
-        if item.get('name', '').lower() == item_name.lower():
+        if normalize_name(item.get('name')) == normalize_name(item_name):
             item['qty'] = qty
             _save_db(db)
             return item
@@ -79,7 +121,7 @@ def delete_item(item_name):
     """Delete an item by name."""
     db = _load_db()
     initial_len = len(db)
-    db = [item for item in db if item.get('name', '').lower() != item_name.lower()]
+    db = [item for item in db if normalize_name(item.get('name')) != normalize_name(item_name)]
     
     if len(db) < initial_len:
         _save_db(db)
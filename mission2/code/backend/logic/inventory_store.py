@@ -0,0 +1,264 @@
+import json
+import os
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+from logic import inventory_db
+from logic.inventory_db import normalize_name
+
+# Default location of the SQLite store, next to the legacy JSON file
+# logic/inventory_store.py -> ../data/inventory.db
+SQLITE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'inventory.db')
+
+TIMESTAMP_FORMAT = "%d/%m/%y %I:%M %p"
+
+
+def _now_str():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+class InventoryStore:
+    """
+    Storage engine interface used by InventoryManager.
+    Items are plain dicts: {id, name, category, qty, timestamp, pose}.
+    """
+    def add_item(self, item_name, category, qty=1, pose=None):
+        raise NotImplementedError
+
+    def add_items(self, increments):
+        """
+        Apply a batch of coalesced increments atomically.
+        Each entry: {name, category, qty, pose, timestamp}. Returns the touched items.
+        """
+        raise NotImplementedError
+
+    def get_all_items(self):
+        raise NotImplementedError
+
+    def update_item_qty(self, item_name, qty):
+        raise NotImplementedError
+
+    def delete_item(self, item_name):
+        raise NotImplementedError
+
+    def delete_item_by_id(self, item_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonInventoryStore(InventoryStore):
+    """Legacy backend: the whole DB lives in data/inventory_db.json."""
+    def add_item(self, item_name, category, qty=1, pose=None):
+        return inventory_db.add_item(item_name, category, qty, pose)
+
+    def add_items(self, increments):
+        return inventory_db.add_items(increments)
+
+    def get_all_items(self):
+        return inventory_db.get_all_items()
+
+    def update_item_qty(self, item_name, qty):
+        return inventory_db.update_item_qty(item_name, qty)
+
+    def delete_item(self, item_name):
+        return inventory_db.delete_item(item_name)
+
+    def delete_item_by_id(self, item_id):
+        return inventory_db.delete_item_by_id(item_id)
+
+    def clear(self):
+        inventory_db.clear_db()
+
+
+class SqliteInventoryStore(InventoryStore):
+    """
+    SQLite backend (WAL mode). Names are matched through a unique index on
+    the normalized name, so lookups and upserts don't scan the table.
+    """
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self.logger = logging.getLogger("InventoryStore")
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One shared connection, serialized by self.lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    name_key TEXT NOT NULL,
+                    category TEXT,
+                    qty INTEGER NOT NULL DEFAULT 0,
+                    timestamp TEXT,
+                    pose TEXT
+                )
+            """)
+            self.conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_items_name_key ON items(name_key)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+    def _row_to_item(self, row):
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "category": row["category"],
+            "qty": row["qty"],
+            "timestamp": row["timestamp"],
+            "pose": json.loads(row["pose"]) if row["pose"] else None
+        }
+
+    def _get_by_key(self, name_key):
+        row = self.conn.execute(
+            "SELECT * FROM items WHERE name_key = ?", (name_key,)).fetchone()
+        return self._row_to_item(row)
+
+    def add_item(self, item_name, category, qty=1, pose=None):
+        """Add a new item or update quantity if it exists."""
+        name_key = normalize_name(item_name)
+        pose_json = json.dumps(pose) if pose else None
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT INTO items (name, name_key, category, qty, timestamp, pose)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name_key) DO UPDATE SET
+                    qty = qty + excluded.qty,
+                    timestamp = excluded.timestamp,
+                    pose = COALESCE(excluded.pose, pose)
+            """, (item_name, name_key, category, qty, _now_str(), pose_json))
+            return self._get_by_key(name_key)
+
+    def add_items(self, increments):
+        rows = [(inc['name'], normalize_name(inc['name']), inc['category'], inc['qty'],
+                 inc['timestamp'], json.dumps(inc['pose']) if inc.get('pose') else None)
+                for inc in increments]
+        with self.lock, self.conn:
+            self.conn.executemany("""
+                INSERT INTO items (name, name_key, category, qty, timestamp, pose)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name_key) DO UPDATE SET
+                    qty = qty + excluded.qty,
+                    timestamp = excluded.timestamp,
+                    pose = COALESCE(excluded.pose, pose)
+            """, rows)
+            return [self._get_by_key(row[1]) for row in rows]
+
+    def get_all_items(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM items ORDER BY id").fetchall()
+        return [self._row_to_item(r) for r in rows]
+
+    def update_item_qty(self, item_name, qty):
+        name_key = normalize_name(item_name)
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "UPDATE items SET qty = ? WHERE name_key = ?", (qty, name_key))
+            if cur.rowcount == 0:
+                return None
+            return self._get_by_key(name_key)
+
+    def delete_item(self, item_name):
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "DELETE FROM items WHERE name_key = ?", (normalize_name(item_name),))
+            return cur.rowcount > 0
+
+    def delete_item_by_id(self, item_id):
+        with self.lock, self.conn:
+            cur = self.conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+            return cur.rowcount > 0
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM items")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def migrate_from_json(self, json_path=inventory_db.DB_PATH):
+        """
+        One-shot import of the legacy JSON DB. Runs only once per SQLite file;
+        existing IDs are kept and duplicate names (case-insensitive) are merged.
+        The legacy `len(db) + 1` ids repeat after a delete: an id that is
+        already taken gets a fresh one. Returns the number of imported rows.
+        """
+        with self.lock:
+            done = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done or not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                items = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            self.logger.error(f"Could not read legacy JSON DB {json_path}: {e}")
+            return 0
+
+        imported = 0
+        with self.lock, self.conn:
+            taken = {row[0] for row in self.conn.execute("SELECT id FROM items")}
+            for item in items:
+                name = item.get('name')
+                if not name:
+                    continue
+                pose = item.get('pose')
+                name_key = normalize_name(name)
+                item_id = item.get('id')
+                if item_id in taken:
+                    item_id = None # AUTOINCREMENT picks a new one
+                # Duplicate names merge into the existing row and don't use their id
+                merged = self.conn.execute(
+                    "SELECT 1 FROM items WHERE name_key = ?", (name_key,)).fetchone()
+                cur = self.conn.execute("""
+                    INSERT INTO items (id, name, name_key, category, qty, timestamp, pose)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(name_key) DO UPDATE SET qty = qty + excluded.qty
+                """, (item_id, name, name_key, item.get('category'),
+                      item.get('qty', 0), item.get('timestamp'),
+                      json.dumps(pose) if pose else None))
+                if not merged:
+                    taken.add(cur.lastrowid) # Also fresh ids, a later legacy row may carry them
+                imported += 1
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (_now_str(),))
+
+        self.logger.info(f"Migrated {imported} items from {json_path}")
+        return imported
+
+
+def create_store(backend=None, path=None):
+    """
+    Build the storage engine selected by `backend` or the INVENTORY_BACKEND
+    env var ("sqlite" by default, "json" for the legacy file).
+    """
+    backend = (backend or os.getenv("INVENTORY_BACKEND", "sqlite")).lower()
+    if backend == "json":
+        return JsonInventoryStore()
+    if backend == "sqlite":
+        store = SqliteInventoryStore(path or os.getenv("INVENTORY_DB_PATH", SQLITE_PATH))
+        store.migrate_from_json()
+        return store
+    raise ValueError(f"Unknown inventory backend: {backend}")
@@ -1,13 +1,17 @@
-import time
+import os
 import logging
 import threading
+from startup import Readiness
+
+# Created first so startup milestones are timed from process start
+readiness = Readiness(["camera", "model"])
+
 import uvicorn
 from api import create_app
 
 # New imports
-from perception.camera_stream import CameraStream
+# (camera / perception modules pull in cv2 and the model runtime: imported by bring_up, off the API's path)
 from perception.tracker_state import TrackerState
-from perception.continuous_detector import PerceptionLoop
 from logic.inventory import InventoryManager
 
 # Keep ArmController for now, though not heavily used yet
@@ -16,22 +20,89 @@ from manipulation.arm_controller import ArmController
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Main")
 
+def camera_sources():
+    """
+    CAMERAS="top=5,side=4" (name=device index, video file or recording directory)
+    opens several cameras; without it a single camera comes from CAMERA_SRC.
+    """
+    spec = os.environ.get("CAMERAS")
+    if spec:
+        pairs = [part.split("=", 1) for part in spec.split(",") if part.strip()]
+    else:
+        pairs = [("main", os.environ.get("CAMERA_SRC", "8"))] # Device index or a video file
+    return [(name.strip(), int(src) if src.strip().isdigit() else src.strip()) for name, src in pairs]
+
+def bring_up(app, tracker_state, parts, inference_workers, torch_threads):
+    """
+    Background startup: camera, then perception (model load + warmup happen in
+    PerceptionLoop's own loader thread). Each part is attached to the app as
+    soon as it's usable; progress is visible on /ready.
+    """
+    from perception.camera_stream import CameraStream
+    from perception.continuous_detector import PerceptionLoop
+    from perception.recording import FrameRecorder, ReplaySource, is_recording
+    from api import attach_cameras
+
+    # 1. Initialize Threaded Cameras
+    # RECORD_DIR=dir records every camera to dir/<name>; a recording directory as source replays it
+    # (REPLAY_SPEED=1 real time, 0 = as fast as possible; REPLAY_LOOP=1 loops)
+    readiness.starting("camera")
+    record_dir = os.environ.get("RECORD_DIR")
+    cameras = []
+    for name, src in camera_sources():
+        if is_recording(src):
+            src = ReplaySource(src, speed=float(os.environ.get("REPLAY_SPEED", 1.0)),
+                               loop=os.environ.get("REPLAY_LOOP", "0") == "1")
+        recorder = FrameRecorder(os.path.join(record_dir, name), name) if record_dir else None
+        camera = CameraStream(src=src, shared=inference_workers > 0, name=name, recorder=recorder).start()
+        parts.setdefault("cameras", []).append(camera)
+        # Ready once real frames arrive (no fixed warmup sleep)
+        if camera.wait_until_ready():
+            cameras.append(camera)
+        else:
+            logger.error(f"No frames from camera {name} ({src}), leaving it out")
+    if not cameras:
+        readiness.failed("camera", "no frames from camera")
+        return
+    readiness.milestone("first_frame")
+    readiness.ready("camera")
+    attach_cameras(app, cameras)
+
+    # 3. Initialize Perception Loop
+    # PERCEPTION_ROI="x0,y0,x1,y1" (pixels or 0-1 fractions, "top=...;side=..." per camera) = pick area,
+    # PERCEPTION_MOTION_GATE=0 disables gating
+    # The governor gives perception full rate while a scan routine runs (PERCEPTION_GOVERNOR=0 disables it);
+    # Between scans it yields to a loaded CPU; PERCEPTION_IDLE_FPS caps its rate then (unset = camera rate),
+    # PERCEPTION_IDLE_DUTY (0-1, default 0.5) the share of time the model may run
+    def scanning():
+        state_machine = getattr(app.state, "state_machine", None)
+        return bool(state_machine and state_machine.is_running)
+
+    detector = PerceptionLoop(cameras, tracker_state, inference_workers=inference_workers,
+                              torch_threads=torch_threads, readiness=readiness,
+                              roi=os.environ.get("PERCEPTION_ROI") or None,
+                              motion_gate=os.environ.get("PERCEPTION_MOTION_GATE", "1") != "0",
+                              governor=os.environ.get("PERCEPTION_GOVERNOR", "1") != "0",
+                              priority=scanning,
+                              latency_budget_ms=float(os.environ.get("PERCEPTION_LATENCY_MS", 120)),
+                              idle_fps=float(os.environ["PERCEPTION_IDLE_FPS"]) if os.environ.get("PERCEPTION_IDLE_FPS") else None,
+                              idle_duty=float(os.environ.get("PERCEPTION_IDLE_DUTY", 0.5)),
+                              # Run the model every k-th frame, optical flow in between
+                              detect_interval=int(os.environ.get("PERCEPTION_DETECT_INTERVAL", 1)))
+    parts["detector"] = detector
+    app.state.perception = detector
+    detector.start()
+
 def main():
     logger.info("Starting Grocery Sorting Robot System (Phase 2.C)...")
     
-    # 1. Initialize Threaded Camera
-    # 1. Initialize Threaded Camera
-    camera = CameraStream(src=8).start()
-    time.sleep(1.0) # Warmup
-    time.sleep(1.0) # Warmup
-    
+    # YOLO in child processes (PERCEPTION_WORKERS > 0) reads frames from shared memory
+    inference_workers = int(os.environ.get("PERCEPTION_WORKERS", 0))
+    torch_threads = int(os.environ.get("PERCEPTION_TORCH_THREADS", 0)) or None
+
     # 2. Initialize Tracker State
     tracker_state = TrackerState()
     
-    # 3. Initialize Perception Loop
-    detector = PerceptionLoop(camera, tracker_state)
-    detector.start()
-    
     # 4. Initialize Other Components
     inventory = InventoryManager()
     arm = ArmController(mock=True) # Phase 1 artifact
@@ -40,18 +111,27 @@ def main():
     # as we move to a continuous decoupled architecture.
     # Logic will move to consuming tracker_state.
     
+    parts = {}
     try:
         # Start API Server
         logger.info("Starting API Server on port 8000...")
         # We pass tracker_state to the API instead of planner
-        app = create_app(tracker_state, inventory, arm, camera_stream=camera)
+        # The API binds right away; camera and model come up in the background
+        app = create_app(tracker_state, inventory, arm, readiness=readiness)
+        t = threading.Thread(target=bring_up, args=(app, tracker_state, parts, inference_workers, torch_threads),
+                             name="bring-up")
+        t.daemon = True
+        t.start()
         uvicorn.run(app, host="0.0.0.0", port=8000)
 
     except KeyboardInterrupt:
         logger.info("Stopping system...")
     finally:
-        detector.stop()
-        camera.stop()
+        if "detector" in parts:
+            parts["detector"].stop()
+        for camera in parts.get("cameras", []):
+            camera.stop()
+        inventory.close()
         logger.info("System shutdown.")
 
 if __name__ == "__main__":
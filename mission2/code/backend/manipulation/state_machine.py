@@ -21,7 +21,7 @@ class ScanStateMachine:
             self.is_running = True
         
         # Start background thread
-        t = threading.Thread(target=self._routine, args=(task_name,))
+        t = threading.Thread(target=self._routine, args=(task_name,), name=f"scan-{task_name}")
         t.daemon = True
         t.start()
         
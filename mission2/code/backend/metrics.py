@@ -0,0 +1,324 @@
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+
+# Minimal in-process metrics (counters, gauges, fixed-bucket histograms) served
+# in Prometheus text format on /metrics. Recording is a short per-series lock
+# and an integer add; anything that's already counted elsewhere (queue depths,
+# FPS) is read through set_function() only when /metrics is scraped.
+
+# Seconds, 0.5 ms .. 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("Metrics")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Value:
+    """One series of a counter or gauge."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+        self.fn = None
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, fn):
+        """Read the value from fn() at scrape time (for numbers kept elsewhere)."""
+        self.fn = fn
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+
+class _HistogramValue:
+    """One series of a histogram: per-bucket counts, sum and count."""
+    def __init__(self, buckets):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """with histogram.time(): ... observes the block's duration in seconds."""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _Timer:
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.perf_counter() - self.start)
+
+
+class Metric:
+    """
+    A metric family. Without labelnames the metric itself records
+    (counter.inc(), histogram.observe()); with labelnames pick the series
+    first: metric.labels("inference").observe(...). Keep the series handle
+    around in hot paths, labels() is a dict lookup.
+    """
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def _new_series(self):
+        return _Value()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        series = self.series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self.lock:
+                series = self.series.setdefault(key, self._new_series())
+        return series
+
+    def remove(self, *values):
+        with self.lock:
+            self.series.pop(tuple(str(v) for v in values), None)
+
+    # Unlabelled shortcuts
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1.0):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, fn):
+        self.labels().set_function(fn)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in list(self.series.items()):
+            try:
+                value = series.get()
+            except Exception as e:
+                logger.debug(f"{self.name}{key}: {e}")
+                continue
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def _new_series(self):
+        return _HistogramValue(self.buckets)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for key, series in list(self.series.items()):
+            counts, total, count = series.snapshot()
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, {"le": bound})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Named metrics of the process. counter()/gauge()/histogram() return the
+    existing metric if the name is already registered, so modules can declare
+    their metrics at import time and re-created objects (a second camera, a
+    new PerceptionLoop) share them.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _get(self, cls, name, help, labelnames, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as {metric.kind} {metric.labelnames}")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self):
+        """Everything in Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class RateMeter:
+    """Events per second over the last `window` events (e.g. FPS); 0 once they stop for `idle` seconds."""
+    def __init__(self, window=30, idle=2.0):
+        self.times = deque(maxlen=window)
+        self.idle = idle
+
+    def mark(self):
+        self.times.append(time.monotonic()) # deque.append is thread-safe
+
+    def rate(self):
+        times = list(self.times)
+        if len(times) < 2 or time.monotonic() - times[-1] > self.idle:
+            return 0.0
+        return round((len(times) - 1) / (times[-1] - times[0]), 2) if times[-1] > times[0] else 0.0
+
+
+class TimedLock:
+    """
+    threading.Lock that observes how long callers waited for it and how long
+    they held it. Works as the lock of a threading.Condition; the time a
+    Condition.wait() spends parked is not counted as holding or waiting.
+    """
+    def __init__(self, wait_histogram, hold_histogram):
+        self._lock = threading.Lock()
+        self.wait = wait_histogram
+        self.hold = hold_histogram
+        self._acquired = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        ok = self._lock.acquire(blocking, timeout)
+        if ok:
+            self._acquired = time.perf_counter()
+            self.wait.observe(self._acquired - start)
+        return ok
+
+    def release(self):
+        self.hold.observe(time.perf_counter() - self._acquired)
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    # Condition hooks
+    def _release_save(self):
+        self.hold.observe(time.perf_counter() - self._acquired)
+        self._lock.release()
+
+    def _acquire_restore(self, state):
+        self._lock.acquire()
+        self._acquired = time.perf_counter()
+
+    def _is_owned(self):
+        if self._lock.acquire(False):
+            self._lock.release()
+            return False
+        return True
+
+
+class RequestMetrics:
+    """
+    ASGI middleware: request count and time to response start (headers, so
+    streaming endpoints count their setup, not the whole stream) per
+    method / route template / status.
+    """
+    def __init__(self, app, registry=REGISTRY):
+        self.app = app
+        self.latency = registry.histogram("http_request_duration_seconds",
+                                          "Time until the response starts", ("method", "route", "status"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # The router stores the matched route in the scope; unmatched paths share one series
+                route = scope.get("route")
+                path = getattr(route, "path", "unmatched")
+                self.latency.labels(scope["method"], path, message["status"]).observe(time.perf_counter() - start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
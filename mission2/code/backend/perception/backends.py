@@ -0,0 +1,317 @@
+import os
+import ast
+import logging
+import cv2
+import numpy as np
+
+from perception.preprocess import letterbox, unletterbox
+from perception.tracker import Tracker
+
+# Startup selection: DETECTOR_BACKEND=torch|onnx|onnx-int8, DETECTOR_MODEL=<path>,
+# DETECTOR_TRACKER=native|bytetrack
+BACKENDS = ("torch", "onnx", "onnx-int8")
+TRACKERS = ("native", "bytetrack")
+DEFAULT_MODEL = "yolov8n.pt"
+# Trackers get every detection above this, they split high / low scores themselves
+TRACKER_CONF = 0.1
+
+logger = logging.getLogger("DetectorBackend")
+
+
+def _empty_detections():
+    return np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int32)
+
+
+def _empty_tracks():
+    return (np.empty(0, np.int64), np.empty(0, np.int32),
+            np.empty(0, np.float32), np.empty((0, 4), np.float32))
+
+
+class DetectorBackend:
+    """
+    Common interface for the YOLO runtimes. All outputs are NumPy arrays in
+    the pixel coordinates of the image that was passed in.
+
+    detect(image, conf) -> (boxes xyxy Nx4, confs, class ids)
+    track(image, conf)  -> (track ids, class ids, confs, boxes), stateful across calls
+    `names` maps class id -> raw model label. `imgsz` overrides the inference
+    size per call (ROI crops run smaller); static-shape backends ignore it.
+
+    detect_batch / track_batch take several images (one per camera) and run
+    them through the model together where the runtime supports it. track_batch
+    keeps one tracker per `streams` entry, so cameras never share track state.
+    Tracking is the same for every runtime: detection arrays into a tracker
+    from create_tracker() (`tracker_name`, default DETECTOR_TRACKER).
+    """
+    name = "base"
+    tracker_name = None
+
+    def __init__(self):
+        self.names = {}
+        self.stream_trackers = {}
+
+    def detect(self, image, conf_threshold=0.25, imgsz=None):
+        raise NotImplementedError
+
+    def track(self, image, conf_threshold=0.25, imgsz=None):
+        return self.track_batch([image], [0], conf_threshold, imgsz)[0]
+
+    def detect_batch(self, images, conf_threshold=0.25, imgsz=None):
+        """One (boxes, confs, class ids) per image. Default: one call per image."""
+        return [self.detect(image, conf_threshold, imgsz) for image in images]
+
+    def track_batch(self, images, streams, conf_threshold=0.25, imgsz=None):
+        """Batched detection, then the tracker of each stream. One (ids, clss, confs, boxes) per image."""
+        # Trackers get everything above their own low threshold, output is filtered after
+        outputs = []
+        for stream, (boxes, confs, clss) in zip(streams, self.detect_batch(images, TRACKER_CONF, imgsz)):
+            tracker = self.stream_trackers.get(stream)
+            if tracker is None:
+                tracker = self.stream_trackers[stream] = create_tracker(self.tracker_name)
+            ids, clss, confs, boxes = tracker.update(boxes, confs, clss)
+            keep = confs > conf_threshold
+            outputs.append((ids[keep], clss[keep], confs[keep], boxes[keep]))
+        return outputs
+
+    def warmup(self, image, runs=2, track=True, imgsz=None, batch=1):
+        """
+        Run a few dummy frames so graph building / kernel selection isn't paid
+        by the first real frame. Trackers start fresh afterwards.
+        batch > 1 warms up the batched path (streams 0..batch-1) instead.
+        """
+        for _ in range(runs):
+            if batch > 1:
+                self.track_batch([image] * batch, list(range(batch)), imgsz=imgsz)
+            elif track:
+                self.track(image, imgsz=imgsz)
+            else:
+                self.detect(image, imgsz=imgsz)
+        self.stream_trackers.clear()
+
+
+class TorchBackend(DetectorBackend):
+    """The original path: ultralytics YOLO on PyTorch."""
+    name = "torch"
+
+    def __init__(self, model_path=DEFAULT_MODEL, imgsz=640, device=None, threads=None):
+        super().__init__()
+        import torch
+        from ultralytics import YOLO
+        if threads:
+            torch.set_num_threads(threads)
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.imgsz = imgsz
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+
+    def detect(self, image, conf_threshold=0.25, imgsz=None):
+        return self.detect_batch([image], conf_threshold, imgsz)[0]
+
+    def detect_batch(self, images, conf_threshold=0.25, imgsz=None):
+        # A list source is stacked into one forward pass
+        results = self.model(list(images), imgsz=imgsz or self.imgsz, conf=conf_threshold,
+                             device=self.device, verbose=False)
+        outputs = []
+        for r in results:
+            boxes = r.boxes
+            if boxes is None or not len(boxes):
+                outputs.append(_empty_detections())
+                continue
+            outputs.append((boxes.xyxy.cpu().numpy().astype(np.float32), boxes.conf.cpu().numpy(),
+                            boxes.cls.cpu().numpy().astype(np.int32)))
+        return outputs
+
+
+class ByteTrackAdapter:
+    """
+    ultralytics' BYTETracker driven by plain detection arrays
+    (DETECTOR_TRACKER=bytetrack), to compare against the native Tracker.
+    Same update() interface and (ids, clss, confs, boxes) output.
+    """
+    class _Dets:
+        # The attribute surface BYTETracker.update reads from a Boxes object
+        def __init__(self, boxes, confs, clss):
+            self.xyxy = boxes
+            self.conf = confs
+            self.cls = clss
+            self.xywh = np.concatenate([(boxes[:, :2] + boxes[:, 2:]) / 2, boxes[:, 2:] - boxes[:, :2]], axis=1)
+
+        def __len__(self):
+            return len(self.conf)
+
+        def __getitem__(self, idx):
+            return ByteTrackAdapter._Dets(self.xyxy[idx], self.conf[idx], self.cls[idx])
+
+    def __init__(self, frame_rate=30):
+        import yaml
+        from types import SimpleNamespace
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        from ultralytics.utils.checks import check_yaml
+        with open(check_yaml("bytetrack.yaml")) as f:
+            cfg = SimpleNamespace(**yaml.safe_load(f))
+        try:
+            self.tracker = BYTETracker(cfg, frame_rate=frame_rate)
+        except TypeError: # Newer ultralytics reads it from the config instead
+            cfg.frame_rate = frame_rate
+            self.tracker = BYTETracker(cfg)
+
+    def update(self, boxes, confs, clss):
+        tracks = self.tracker.update(self._Dets(boxes, confs.astype(np.float32), clss.astype(np.float32)))
+        if not len(tracks):
+            return _empty_tracks()
+        tracks = np.asarray(tracks)
+        # Rows: x1, y1, x2, y2, track_id, score, cls, det_index
+        return (tracks[:, 4].astype(np.int64), tracks[:, 6].astype(np.int32),
+                tracks[:, 5].astype(np.float32), tracks[:, :4].astype(np.float32))
+
+
+class OnnxBackend(DetectorBackend):
+    """
+    YOLOv8 exported to ONNX, run with ONNX Runtime on CPU. Pre/post-processing
+    (letterbox, class-aware NMS) is done here in NumPy/OpenCV to match
+    ultralytics' predict defaults. Works the same with an INT8-quantized export.
+    """
+    name = "onnx"
+
+    def __init__(self, model_path="yolov8n.onnx", imgsz=640, threads=None, iou_threshold=0.7, max_det=300):
+        super().__init__()
+        import onnxruntime as ort
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found, export it with: python -m perception.backends export")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        # Static exports fix the input size, dynamic ones take our imgsz
+        batch, _, h, w = self.input.shape
+        self.imgsz = h if isinstance(h, int) else imgsz
+        self.max_batch = batch if isinstance(batch, int) else None # None = any batch size
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self.names = self._read_names()
+
+    def _read_names(self):
+        # ultralytics stores the class names as a dict literal in the model metadata
+        meta = self.session.get_modelmeta().custom_metadata_map
+        if "names" in meta:
+            return {int(k): v for k, v in ast.literal_eval(meta["names"]).items()}
+        nc = self.session.get_outputs()[0].shape[1] - 4
+        return {i: str(i) for i in range(nc)}
+
+    def _blob(self, image):
+        # Square letterbox (stride = imgsz pads the short side all the way), HWC BGR -> NCHW RGB 0..1
+        padded, scale, pad = letterbox(image, self.imgsz, stride=self.imgsz)
+        blob = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)
+        return blob, scale, pad
+
+    def detect(self, image, conf_threshold=0.25, imgsz=None):
+        blob, scale, pad = self._blob(image)
+        pred = self.session.run(None, {self.input.name: blob})[0][0]
+        return self._decode(pred, image.shape, scale, pad, conf_threshold)
+
+    def detect_batch(self, images, conf_threshold=0.25, imgsz=None):
+        if self.max_batch is not None and self.max_batch != len(images):
+            # Static batch-1 export (the default): one run per image
+            return super().detect_batch(images, conf_threshold, imgsz)
+        blobs = [self._blob(image) for image in images]
+        preds = self.session.run(None, {self.input.name: np.concatenate([b[0] for b in blobs])})[0]
+        return [self._decode(pred, image.shape, scale, pad, conf_threshold)
+                for pred, image, (_, scale, pad) in zip(preds, images, blobs)]
+
+    def _decode(self, pred, shape, scale, pad, conf_threshold):
+        pred = pred.T # (anchors, 4 + classes)
+        class_scores = pred[:, 4:]
+        clss = class_scores.argmax(axis=1)
+        confs = class_scores.max(axis=1)
+        keep = confs > conf_threshold
+        if not keep.any():
+            return _empty_detections()
+        cx, cy, w, h = pred[keep, :4].T
+        clss, confs = clss[keep].astype(np.int32), confs[keep].astype(np.float32)
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+        # Class-aware NMS in one call: shift each class into its own coordinate range
+        shifted = boxes + (clss * (self.imgsz + 1))[:, None]
+        xywh = np.concatenate([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]], axis=1)
+        idx = cv2.dnn.NMSBoxes(xywh.tolist(), confs.tolist(), conf_threshold, self.iou_threshold)
+        idx = np.asarray(idx, dtype=np.int64).reshape(-1)[:self.max_det]
+
+        boxes = unletterbox(boxes[idx], scale, pad)
+        h0, w0 = shape[:2]
+        np.clip(boxes, 0, [w0, h0, w0, h0], out=boxes)
+        return boxes.astype(np.float32), confs[idx], clss[idx]
+
+
+def create_tracker(name=None):
+    """A tracker for one stream, picked by argument or DETECTOR_TRACKER (default native)."""
+    name = (name or os.environ.get("DETECTOR_TRACKER", "native")).lower()
+    if name not in TRACKERS:
+        raise ValueError(f"Unknown tracker {name!r}, expected one of {TRACKERS}")
+    return ByteTrackAdapter() if name == "bytetrack" else Tracker()
+
+
+def default_model_path(backend, model_path=None):
+    """Model file for a backend: yolov8n.pt -> yolov8n.onnx / yolov8n.int8.onnx."""
+    model_path = model_path or os.environ.get("DETECTOR_MODEL", DEFAULT_MODEL)
+    stem, ext = os.path.splitext(model_path)
+    if backend == "onnx" and ext == ".pt":
+        return stem + ".onnx"
+    if backend == "onnx-int8" and not stem.endswith(".int8"):
+        return stem + ".int8.onnx"
+    return model_path
+
+
+def supports_imgsz(backend=None):
+    """Only the torch backend changes its input size per call; ONNX exports are static."""
+    return (backend or os.environ.get("DETECTOR_BACKEND", "torch")).lower() == "torch"
+
+
+def create_backend(backend=None, model_path=None, imgsz=640, threads=None, device=None, tracker=None):
+    """Instantiate the backend picked by argument or DETECTOR_BACKEND (default torch)."""
+    backend = (backend or os.environ.get("DETECTOR_BACKEND", "torch")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r}, expected one of {BACKENDS}")
+    model_path = default_model_path(backend, model_path)
+    logger.info(f"Loading {backend} detector from {model_path}...")
+    if backend == "torch":
+        instance = TorchBackend(model_path, imgsz, device=device, threads=threads)
+    else:
+        instance = OnnxBackend(model_path, imgsz, threads=threads)
+        instance.name = backend
+    instance.tracker_name = tracker
+    return instance
+
+
+def export_onnx(model_path=DEFAULT_MODEL, imgsz=640, int8=False, dynamic=False):
+    """
+    Export a .pt model to ONNX (static 1 x imgsz x imgsz input) next to it, and
+    optionally an INT8 copy via ONNX Runtime dynamic quantization
+    (weights int8, activations quantized on the fly, no calibration set needed).
+    dynamic=True exports a variable batch/size input, which multi-camera
+    batching needs. Returns the written paths.
+    """
+    from ultralytics import YOLO
+    onnx_path = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True)
+    paths = [onnx_path]
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = default_model_path("onnx-int8", onnx_path)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        paths.append(int8_path)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export YOLO weights for the ONNX backends")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--int8", action="store_true", help="Also write a dynamically quantized INT8 model")
+    parser.add_argument("--dynamic", action="store_true", help="Variable batch size (batched multi-camera inference)")
+    args = parser.parse_args()
+    for path in export_onnx(args.model, args.imgsz, args.int8, args.dynamic):
+        print(f"Wrote {path}")
@@ -2,13 +2,42 @@ import cv2
 import threading
 import time
 import logging
-import numpy as np
+
+from metrics import REGISTRY, RateMeter
+from tracing import TRACER
+from perception.frame_bus import FrameBus
+from perception.preprocess import FramePreprocessor
+
+FRAMES = REGISTRY.counter("camera_frames_total", "Frames captured", ("camera",))
+READ_FAILURES = REGISTRY.counter("camera_read_failures_total", "Failed camera reads", ("camera",))
+READ_TIME = REGISTRY.histogram("camera_read_seconds", "Time blocked in the capture read", ("camera",))
+PUBLISH_TIME = REGISTRY.histogram("camera_publish_seconds", "Correction + frame bus write per frame", ("camera",))
+CAPTURE_FPS = REGISTRY.gauge("camera_fps", "Capture rate over the last 30 frames", ("camera",))
 
 class CameraStream:
-    def __init__(self, device_id="/dev/video2", src=None):
-        self.logger = logging.getLogger("CameraStream")
+    """
+    `src` is a device index, a video file, or an object with the VideoCapture
+    read() interface (e.g. perception.recording.ReplaySource, to replay a
+    recording). `recorder` (a FrameRecorder) gets every raw frame before
+    correction, timestamped at capture.
+
+    Every published frame carries its id and capture time (time.monotonic(),
+    taken as the read returns) in the FramePacket; perception passes both on
+    to TrackerState, so the API can tell how old a box is.
+    """
+    def __init__(self, device_id="/dev/video2", src=None, bus_slots=8, shared=False, preprocessor=None, name="main",
+                 recorder=None):
+        self.logger = logging.getLogger(f"CameraStream[{name}]")
+        self.name = name # Tracks, /objects?camera= and /video_feed?camera= refer to this
         self.src = src
         self.device_id = device_id
+        self.recorder = recorder
+        self.fps = RateMeter()
+        self.m_frames = FRAMES.labels(name)
+        self.m_failures = READ_FAILURES.labels(name)
+        self.m_read = READ_TIME.labels(name)
+        self.m_publish = PUBLISH_TIME.labels(name)
+        CAPTURE_FPS.labels(name).set_function(self.fps.rate)
         
         # Use src if explicit, otherwise device_id
         if src is not None: 
@@ -16,7 +45,10 @@ class CameraStream:
         else:
              target_cam = self.device_id
              
-        self.stream = cv2.VideoCapture(target_cam)
+        # Capture-like objects (replay sources) are used as they are
+        self.stream = target_cam if hasattr(target_cam, "read") else cv2.VideoCapture(target_cam)
+        # Replay sources pace themselves, devices get a small sleep between reads
+        self.poll_interval = getattr(self.stream, "poll_interval", 0.01)
         
         self.logger.info(f"Opening camera: {target_cam}")
         
@@ -31,21 +63,36 @@ class CameraStream:
         self.stream.set(cv2.CAP_PROP_CONTRAST, 0.6)
         # self.stream.set(cv2.CAP_PROP_EXPOSURE, -4) # Auto-exposure is usually better if lighting varies
         
-        self.grabbed, self.frame = self.stream.read()
+        # First frame sizes the bus; frames are read from the bus only (read / read_latest)
+        self.grabbed, frame = self.stream.read()
         
         # Apply initial software boost if hardware fails to brighten enough
-        if self.grabbed and self.frame.mean() < 50:
+        if self.grabbed and frame.mean() < 50:
             self.logger.warning("Camera image extremely dark, checking auto-exposure...")
 
         self.stopped = False
         self.lock = threading.Lock()
+        self.bad_shape = None # Shape of frames currently dropped for not matching the bus
+
+        # Software Brightness/Gamma Correction (tables precomputed once)
+        # Default gamma 0.6 (< 1.0 to brighten)
+        self.preprocessor = preprocessor or FramePreprocessor(gamma=0.6)
+
+        # Frames are corrected once in the capture thread and published to a ring
+        # buffer; readers get read-only views of the latest slot instead of copies.
+        shape = frame.shape if self.grabbed else (480, 640, 3)
+        self.bus = FrameBus(shape, slots=bus_slots, shared=shared)
 
         if not self.grabbed:
             self.logger.error("Failed to open camera source")
             self.stopped = True
+        else:
+            self._capture(frame)
 
     def start(self):
-        self.t = threading.Thread(target=self.update, args=())
+        if self.recorder is not None:
+            self.recorder.start()
+        self.t = threading.Thread(target=self.update, args=(), name=f"camera-{self.name}")
         self.t.daemon = True
         self.t.start()
         return self
@@ -55,34 +102,82 @@ class CameraStream:
             if self.stopped:
                 return
             
+            start = time.perf_counter()
             grabbed, frame = self.stream.read()
+            self.m_read.observe(time.perf_counter() - start)
             if not grabbed:
+                if getattr(self.stream, "finished", False):
+                    self.logger.info("Replay finished")
+                    self.stopped = True
+                    return
+                self.m_failures.inc()
                 self.logger.warning("Camera read failed, retrying...")
                 time.sleep(0.1)
                 continue
             
             with self.lock:
                 self.grabbed = grabbed
-                self.frame = frame
+            self._capture(frame)
             
-            time.sleep(0.01) # Small sleep to preventing hogging CPU
+            if self.poll_interval:
+                time.sleep(self.poll_interval) # Small sleep to preventing hogging CPU
+
+    def _capture(self, frame):
+        captured = time.monotonic()
+        if self.recorder is not None:
+            self.recorder.write(frame, time.time()) # Recordings keep wall-clock time
+        frame_id = self._publish(frame, captured)
+        published = time.monotonic()
+        self.m_publish.observe(published - captured)
+        self.m_frames.inc()
+        self.fps.mark()
+        TRACER.span("capture", captured, published, {"camera": self.name, "frame_id": frame_id}, "camera")
+
+    def _publish(self, frame, timestamp=None):
+        try:
+            # Corrected output is written straight into the bus slot
+            frame_id = self.bus.publish(frame, timestamp=timestamp, transform=self.preprocessor.apply)
+        except ValueError as e:
+            # Warn once per wrong resolution, not at camera rate
+            if frame.shape != self.bad_shape:
+                self.bad_shape = frame.shape
+                self.logger.warning(f"Dropping frames: {e}")
+            return None
+        self.bad_shape = None
+        return frame_id
 
     def read(self):
-        with self.lock:
-            # Software Brightness/Gamma Correction
-            # Gamma < 1.0 makes dark regions lighter
-            if self.frame is not None:
-                # Optimized gamma correction using LUT
-                # gamma = 0.6 # < 1.0 to brighten
-                gamma = 0.6
-                invGamma = 1.0 / gamma
-                table = np.array([((i / 255.0) ** invGamma) * 255
-                    for i in np.arange(0, 256)]).astype("uint8")
-                return cv2.LUT(self.frame, table)
-            return self.frame
+        """Return a read-only view of the latest corrected frame (or None)."""
+        packet = self.bus.latest()
+        return packet.frame if packet else None
+
+    def read_latest(self):
+        """Return the latest FramePacket(frame, frame_id, timestamp), or None."""
+        return self.bus.latest()
+
+    def wait_for_frame(self, last_id=0, timeout=1.0):
+        """Block until a frame newer than last_id arrives. Returns a FramePacket or None."""
+        return self.bus.wait_next(last_id, timeout)
+
+    def wait_until_ready(self, min_frames=3, timeout=10.0):
+        """
+        Block until the capture thread has delivered `min_frames` frames (lets
+        auto-exposure settle) instead of sleeping a fixed time.
+        Returns False if the camera failed or timed out.
+        """
+        deadline = time.monotonic() + timeout
+        while self.bus.frame_id < min_frames:
+            remaining = deadline - time.monotonic()
+            if self.stopped or remaining <= 0:
+                return False
+            self.bus.wait_next(self.bus.frame_id, min(remaining, 0.5))
+        return True
 
     def stop(self):
         self.stopped = True
         if self.t.is_alive():
             self.t.join()
         self.stream.release()
+        if self.recorder is not None:
+            self.recorder.stop()
+        self.bus.close()
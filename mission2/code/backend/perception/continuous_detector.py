@@ -1,91 +1,555 @@
-import threading
 import time
 import logging
-from ultralytics import YOLO
+import threading
+import numpy as np
+
+from startup import Readiness
+from metrics import REGISTRY, RateMeter
+from tracing import LATENCY
+from perception.pipeline import PipelineStage, StageQueue
+from perception.labels import build_label_lookup, map_label
+from perception.preprocess import letterbox, unletterbox, crop, parse_roi, roi_imgsz
+from perception.motion_gate import MotionGate
+from perception.propagation import FlowPropagator
+from perception.backends import create_backend, create_tracker, supports_imgsz, TRACKER_CONF
+from perception.governor import PerceptionGovernor, SIZE_LADDER
+from perception.inference_worker import InferenceWorkerPool
+
+FRAMES = REGISTRY.counter("perception_frames_total",
+                          "Camera frames by what perception did with them (inferred / propagated / gated / throttled / dropped)",
+                          ("camera", "outcome"))
+INFER_FPS = REGISTRY.gauge("perception_inference_fps", "Frames through the model per second (all cameras)")
+INFER_TIME = REGISTRY.histogram("perception_inference_seconds", "Model time per tick (all cameras, incl. worker round trip)")
+INFER_IMGSZ = REGISTRY.gauge("perception_infer_imgsz", "Model input size currently used")
+
+# Track ids of camera i are offset by i * CAMERA_ID_STRIDE, so every camera has its own id namespace
+CAMERA_ID_STRIDE = 1_000_000_000_000
+
+
+def camera_name(camera):
+    return getattr(camera, "name", "main")
+
+
+def parse_rois(spec, cameras):
+    """
+    ROI config -> {camera name: roi or None}. `spec` is one ROI for every camera
+    ("x0,y0,x1,y1" or a tuple), "top=x0,y0,x1,y1;side=..." or a dict per camera name.
+    """
+    if isinstance(spec, str) and "=" in spec:
+        spec = dict(part.split("=", 1) for part in spec.split(";") if part.strip())
+    rois = {}
+    for cam in cameras:
+        roi = spec.get(camera_name(cam)) if isinstance(spec, dict) else spec
+        rois[camera_name(cam)] = parse_roi(roi, cam.bus.shape) if isinstance(roi, str) else roi
+    return rois
+
+
+class _CameraState:
+    """Per-camera perception state: ROI, motion gate, propagator, frame accounting and live tracks."""
+    def __init__(self, index, camera, roi, imgsz, gate, propagator=None):
+        self.index = index
+        self.camera = camera
+        self.name = camera_name(camera)
+        self.id_base = index * CAMERA_ID_STRIDE
+        self.roi = roi
+        self.infer_imgsz = roi_imgsz(roi, imgsz) if roi else imgsz
+        self.gate = gate
+        self.last_frame_id = 0
+        self.frames_skipped = 0
+        self.live_ids = [] # Track ids from the last inference, kept alive on gated frames
+        self.settling = False # Some of those aren't stable yet -> don't gate
+        self.tracker = None # Tracks this camera's detections when the model runs in worker processes
+        # Detect-every-k: boxes are moved by optical flow on the frames in between.
+        # The lock orders propagation steps (selecting thread) against detection
+        # results (tracker thread), and their TrackerState writes
+        self.propagator = propagator
+        self.flow_lock = threading.Lock()
+        self.since_detect = 0
+        self.frames_propagated = 0
+        self.m_frames = {outcome: FRAMES.labels(self.name, outcome)
+                         for outcome in ("inferred", "propagated", "gated", "throttled", "dropped")}
+
+    def stats(self):
+        return {
+            "frames_captured": self.camera.bus.frame_id,
+            "last_frame_id": self.last_frame_id,
+            "roi": list(self.roi) if self.roi else None,
+            "infer_imgsz": self.infer_imgsz,
+            "frames_propagated": self.frames_propagated,
+            "propagation_quality": round(self.propagator.quality, 3) if self.propagator else None,
+            "motion_gate": self.gate.stats() if self.gate else None
+        }
+
 
 class PerceptionLoop:
-    def __init__(self, camera_stream, tracker_state, model_path="yolov8n.pt"):
-        self.camera_stream = camera_stream
+    """
+    Capture -> preprocess -> inference -> postprocess -> tracker update, each
+    stage on its own thread with bounded queues in between, so consecutive
+    frames overlap instead of paying the sum of all stage times.
+
+    The inference inbox keeps only the newest frames (drop-oldest); the later
+    queues block, which pushes back on inference if the tracker falls behind.
+
+    `camera_stream` is one CameraStream or a list of them (e.g. top and side).
+    With several cameras each pipeline item is a tick: the newest frame of every
+    camera, taken within a few ms of each other, run through the model as one
+    batch (backend.track_batch, one tracker per camera). Track ids are offset per
+    camera (CAMERA_ID_STRIDE) and tracks record their camera's name.
+
+    With inference_workers > 0 the model runs in child processes instead
+    (see InferenceWorkerPool): they read frames from the cameras' shared-memory
+    buses and return detection arrays, this process tracks them (one
+    perception.tracker per camera, DETECTOR_TRACKER) and keeps the tracker
+    state, so worker restarts don't reset track ids.
+    The cameras must then be created with CameraStream(shared=True).
+
+    `backend` picks the runtime (torch / onnx / onnx-int8, see perception.backends);
+    None falls back to DETECTOR_BACKEND.
+
+    Construction is cheap: the model is loaded and warmed up on a dummy frame in
+    the background by start(), and the "model" subsystem of `readiness` reports
+    progress (plus first_inference / first_detection milestones).
+
+    `roi` (see parse_rois) restricts inference to the pick area, run at the
+    crop's own resolution (see roi_imgsz). `motion_gate` (True, False, or a
+    MotionGate with a single camera) skips inference on frames where nothing
+    changed in that area; tracks from the last inference are kept alive
+    meanwhile, and the gate stays open while new tracks are still confirming.
+
+    `governor` (True, False or a PerceptionGovernor) adapts inference rate and
+    model input size to a latency budget and system load; `priority` is a
+    callable that is true while perception matters most (a scan is running).
+    `idle_fps` / `idle_duty` throttle perception while it isn't (see PerceptionGovernor).
+    Frames are always letterboxed at the base size and only the model's imgsz
+    changes, so tracker coordinates stay the same when the governor steps.
+
+    `detect_interval` k > 1 runs the model on every k-th frame that passes the
+    motion gate (sooner while tracks are settling or the flow lost them) and
+    moves the detected boxes along with the image on the frames in between
+    (FlowPropagator, sparse optical flow, a few ms on the CPU), so /objects
+    positions still refresh at camera rate. Frames the governor throttles are
+    propagated too. Detections of frame N are flowed forward to the newest
+    frame before they reach TrackerState, so a slow inference doesn't snap
+    boxes back. Propagated frames refresh positions but don't count as
+    sightings (see TrackerState.update_boxes).
+    """
+    def __init__(self, camera_stream, tracker_state, model_path=None,
+                 imgsz=640, conf_threshold=0.4, queue_depths=(1, 2, 2),
+                 inference_workers=0, torch_threads=None, backend=None, readiness=None,
+                 roi=None, motion_gate=True, governor=True, priority=None, latency_budget_ms=120.0,
+                 idle_fps=None, idle_duty=0.5, sync_window=0.015, detect_interval=1):
+        cameras = list(camera_stream) if isinstance(camera_stream, (list, tuple)) else [camera_stream]
+        self.camera_stream = cameras[0]
         self.tracker_state = tracker_state
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        self.model_path = model_path
+        self.backend_name = backend
+        self.torch_threads = torch_threads
+        self.readiness = readiness or Readiness()
+        self.sync_window = sync_window # How long a tick waits for the other cameras' frames
+        self.detect_interval = max(1, int(detect_interval))
         self.stopped = False
         self.logger = logging.getLogger("PerceptionLoop")
-        
-        self.logger.info(f"Loading YOLO model {model_path}...")
+
+        # Frame accounting: everything the cameras published vs. what we ran the model on.
+        # Frames that arrive while the pipeline is busy are dropped (only the newest is kept).
+        self.frames_inferred = 0
+        # Ticks handed to the pipeline vs. fully handled (tracker updated, gated or failed), see idle()
+        self.ticks_taken = 0
+        self.ticks_done = 0
+        self.infer_rate = RateMeter()
+        INFER_FPS.set_function(self.infer_rate.rate)
+
+        if isinstance(motion_gate, MotionGate) and len(cameras) > 1:
+            raise ValueError("Pass motion_gate=True to get one MotionGate per camera")
+        rois = parse_rois(roi, cameras)
+        self.cams = [_CameraState(i, camera, rois[camera_name(camera)], imgsz,
+                                  MotionGate() if motion_gate is True else (motion_gate or None),
+                                  FlowPropagator() if self.detect_interval > 1 else None)
+                     for i, camera in enumerate(cameras)]
+        for cam in self.cams:
+            cam.since_detect = self.detect_interval # First frame goes to the model
+        # One camera keeps the backend's own tracking path, several go through track_batch
+        self.batched = len(self.cams) > 1
+        base_imgsz = max(cam.infer_imgsz for cam in self.cams)
+        if governor is True:
+            # Static ONNX exports can't change size, the governor then only paces the rate
+            sizes = [s for s in SIZE_LADDER if s < base_imgsz] if supports_imgsz(backend) else []
+            governor = PerceptionGovernor([base_imgsz] + sizes, budget_ms=latency_budget_ms, priority=priority,
+                                          idle_fps=idle_fps, idle_duty=idle_duty)
+        self.governor = governor or None
+        self.base_imgsz = base_imgsz
+        INFER_IMGSZ.set_function(self._model_imgsz)
+
+        self.backend = None
+        self.workers = None
+        self.label_lookup = None
+        infer_depth, post_depth, update_depth = queue_depths
+        self.infer_q = None
+        self.update_q = StageQueue(update_depth)
+
+        if inference_workers:
+            # Class names arrive from the first worker that loads the model
+            # Workers only detect (down to the trackers' low threshold), tracking happens here
+            self.workers = InferenceWorkerPool([cam.camera.bus for cam in self.cams], model_path, imgsz,
+                                               TRACKER_CONF, num_workers=inference_workers, backend=backend,
+                                               torch_threads=torch_threads)
+            for cam in self.cams:
+                cam.tracker = create_tracker()
+            # Workers pull frames from the buses themselves, so no frame queue: the
+            # source always hands over the newest frame ids once the worker is free
+            if self.detect_interval == 1:
+                self.stages = [
+                    PipelineStage("inference", self._gate_remote, outbox=self.update_q, source=self._next_frame,
+                                  trace=self._trace_args),
+                    PipelineStage("tracker", self._update_tracker, inbox=self.update_q, trace=self._trace_args),
+                ]
+                return
+            # Propagation has to keep up with the camera while a worker is busy,
+            # so selection gets its own thread and hands keyframes over
+            self.infer_q = StageQueue(infer_depth, drop_oldest=True)
+            self.stages = [
+                PipelineStage("select", self._select, outbox=self.infer_q, source=self._next_frame,
+                              trace=self._trace_args),
+                PipelineStage("inference", self._infer_remote, inbox=self.infer_q, outbox=self.update_q,
+                              trace=self._trace_args),
+                PipelineStage("tracker", self._update_tracker, inbox=self.update_q, trace=self._trace_args),
+            ]
+            return
+
+        self.infer_q = StageQueue(infer_depth, drop_oldest=True)
+        self.post_q = StageQueue(post_depth)
+        self.stages = [
+            PipelineStage("preprocess", self._preprocess, outbox=self.infer_q, source=self._next_frame,
+                          trace=self._trace_args),
+            PipelineStage("inference", self._infer, inbox=self.infer_q, outbox=self.post_q, trace=self._trace_args),
+            PipelineStage("postprocess", self._postprocess, inbox=self.post_q, outbox=self.update_q,
+                          trace=self._trace_args),
+            PipelineStage("tracker", self._update_tracker, inbox=self.update_q, trace=self._trace_args),
+        ]
+
+    def start(self):
+        """Returns immediately; the model loads in the background and the stages start once it's warm."""
+        self.logger.info("Starting perception pipeline...")
+        self.readiness.starting("model")
+        self.loader = threading.Thread(target=self._load, args=(), name="perception-loader")
+        self.loader.daemon = True
+        self.loader.start()
+        return self
+
+    def _load(self):
+        if self.workers:
+            # Workers load and warm up in their own processes; stages can run meanwhile
+            # (frames are dropped until a worker is ready)
+            self.workers.start()
+            for stage in self.stages:
+                stage.start()
+            while not self.stopped and not self.workers.names_ready.wait(1.0):
+                errors = [w["last_error"] for w in self.workers.stats() if w["last_error"]]
+                if errors:
+                    self.readiness.failed("model", errors[-1])
+            if not self.stopped:
+                self.readiness.ready("model")
+            return
+
         try:
-            self.model = YOLO(model_path)
-            # Warmup
-            # self.model.track(source=self.camera_stream.read(), persist=True, tracker="bytetrack.yaml", verbose=False) 
-            self.logger.info("Model loaded.")
+            self.backend = create_backend(self.backend_name, self.model_path, self.imgsz, threads=self.torch_threads)
+            # Class id -> grocery label, built once instead of per box
+            self.label_lookup = build_label_lookup(self.backend.names)
+            self.readiness.milestone("model_loaded")
+            # Warmup: a blank frame of the real input size through the whole model + tracker path
+            cam = self.cams[0]
+            dummy = letterbox(crop(np.zeros(cam.camera.bus.shape, np.uint8), cam.roi), cam.infer_imgsz)[0]
+            self.backend.warmup(dummy, imgsz=self.base_imgsz, batch=len(self.cams))
+            self.logger.info(f"Model loaded and warmed up ({self.backend.name} backend).")
         except Exception as e:
             self.logger.error(f"Failed to load YOLO model: {e}")
-            self.model = None
+            self.backend = None
+            self.readiness.failed("model", e)
+            return
+        self.readiness.ready("model")
+        if not self.stopped:
+            for stage in self.stages:
+                stage.start()
 
-    def start(self):
-        self.t = threading.Thread(target=self.run, args=())
-        self.t.daemon = True
-        self.t.start()
-        return self
+    # --- Stages ---
 
-    def run(self):
-        self.logger.info("Starting perception loop...")
-        while not self.stopped:
-            frame = self.camera_stream.read()
-            if frame is None:
-                time.sleep(0.1)
+    def _next_frame(self):
+        """
+        Block until the first camera publishes a frame we haven't seen yet, then
+        give the others `sync_window` to deliver theirs. Returns the tick as
+        [(camera state, FramePacket)], or None if no camera had a new frame.
+        """
+        first = self.cams[0]
+        # With more cameras don't let a stalled first one hold up the rest for long
+        packet = first.camera.wait_for_frame(first.last_frame_id, timeout=1.0 if not self.batched else 0.1)
+        tick = [(first, packet)] if packet is not None else []
+        deadline = time.monotonic() + self.sync_window
+        for cam in self.cams[1:]:
+            packet = cam.camera.wait_for_frame(cam.last_frame_id, timeout=max(0.0, deadline - time.monotonic()))
+            if packet is not None:
+                tick.append((cam, packet))
+        if tick:
+            self.ticks_taken += 1 # Before last_frame_id moves, so idle() never sees a taken frame as done
+        for cam, packet in tick:
+            missed = packet.frame_id - cam.last_frame_id - 1 if cam.last_frame_id else 0
+            if missed > 0:
+                cam.frames_skipped += missed
+                cam.m_frames["dropped"].inc(missed)
+            cam.last_frame_id = packet.frame_id
+        return tick or None
+
+    def _gate(self, tick):
+        """
+        The part of the tick that should go to the model. Throttled (governor)
+        or unchanged (motion gate) frames only keep their camera's tracks alive.
+        """
+        if self.detect_interval > 1:
+            return self._gate_propagating(tick)
+        due = self.governor is None or self.governor.due()
+        run = []
+        for cam, packet in tick:
+            if due and (cam.gate is None or cam.gate.should_run(crop(packet.frame, cam.roi), force=cam.settling)):
+                run.append((cam, packet))
+            else:
+                cam.m_frames["gated" if due else "throttled"].inc()
+                self.tracker_state.keep_alive(cam.live_ids)
+        if run and self.governor is not None:
+            self.governor.started()
+        if len(run) < len(tick):
+            self.tracker_state.prune()
+        return run
+
+    def _gate_propagating(self, tick):
+        """
+        _gate for detect_interval > 1: unchanged frames are skipped as usual
+        (the boxes wouldn't move either), moving ones go to the model if their
+        camera is due for a detection and the governor admits it, and get their
+        tracks propagated otherwise.
+        """
+        due = None # Asked at most once per tick, and only if a camera wants the model
+        run = []
+        for cam, packet in tick:
+            flow = cam.propagator
+            force = cam.settling or flow.needs_detection
+            if cam.gate is not None and not cam.gate.should_run(crop(packet.frame, cam.roi), force=force):
+                cam.m_frames["gated"].inc()
+                self.tracker_state.keep_alive(cam.live_ids)
                 continue
-            
-            if self.model:
-                try:
-                    # Run tracking
-                    # persist=True is crucial for tracking
-                    results = self.model.track(source=frame, persist=True, tracker="bytetrack.yaml", verbose=False)
-                    
-                    # Update state
-                    for r in results:
-                        if r.boxes and r.boxes.id is not None:
-                            ids = r.boxes.id.cpu().numpy().astype(int)
-                            clss = r.boxes.cls.cpu().numpy().astype(int)
-                            confs = r.boxes.conf.cpu().numpy()
-                            boxes = r.boxes.xyxy.cpu().numpy()
-                            
-                            for i, track_id in enumerate(ids):
-                                cls_id = clss[i]
-                                conf = confs[i]
-                                box = boxes[i]
-                                
-                                raw_label = self.model.names[cls_id]
-                                clean_label = self._map_label(raw_label)
-                                
-                                # Filter low confidence
-                                if conf > 0.4: 
-                                    self.tracker_state.update(track_id, clean_label, conf, box)
-                                    
-                except Exception as e:
-                    self.logger.error(f"Error in tracking loop: {e}")
-            
-            # Prune old objects occasionally
+            cam.since_detect += 1
+            if force or cam.since_detect >= self.detect_interval:
+                if due is None:
+                    due = self.governor is None or self.governor.due()
+                if due:
+                    with cam.flow_lock:
+                        flow.observe(packet.frame_id, packet.frame, packet.timestamp) # Keyframe for reset()
+                    cam.since_detect = 0
+                    run.append((cam, packet))
+                    continue
+            self._propagate(cam, packet)
+        if run and self.governor is not None:
+            self.governor.started()
+        if len(run) < len(tick):
             self.tracker_state.prune()
-            
-            # Control frame rate roughly (e.g., 20 FPS)
-            time.sleep(0.05)
+        return run
+
+    def _propagate(self, cam, packet):
+        with cam.flow_lock:
+            ids, boxes = cam.propagator.step(packet.frame_id, packet.frame, packet.timestamp)
+            if len(ids):
+                self.tracker_state.update_boxes(ids, boxes, captured_at=packet.timestamp, frame_id=packet.frame_id)
+        cam.frames_propagated += 1
+        cam.m_frames["propagated"].inc()
+        if len(ids):
+            LATENCY.record("propagated", packet.timestamp)
+
+    def _select(self, tick):
+        """Gate a tick; None if nothing of it goes to the model (then the tick is done)."""
+        run = self._gate(tick)
+        if not run:
+            self.ticks_done += 1
+            return None
+        return run
+
+    def _trace_args(self, item):
+        # Stage items are ticks [(camera state, packet)] or batches {"frames": [...]}
+        if isinstance(item, dict):
+            return {"frames": [f"{f['camera'].name}:{f['frame_id']}" for f in item["frames"]]}
+        return {"frames": [f"{cam.name}:{packet.frame_id}" for cam, packet in item]}
+
+    def _model_imgsz(self):
+        return self.governor.imgsz if self.governor is not None else self.base_imgsz
+
+    def _record(self, start, frames):
+        elapsed = time.perf_counter() - start
+        INFER_TIME.observe(elapsed)
+        if self.governor is not None:
+            self.governor.record(elapsed * 1000)
+        now = time.monotonic()
+        for f in frames:
+            f["camera"].m_frames["inferred"].inc()
+            self.infer_rate.mark()
+            LATENCY.record("inference", f["timestamp"], now)
+
+    def _preprocess(self, tick):
+        run = self._select(tick)
+        if run is None:
+            return None
+        frames = []
+        for cam, packet in run:
+            image, scale, pad = letterbox(crop(packet.frame, cam.roi), cam.infer_imgsz)
+            frames.append({"camera": cam, "frame_id": packet.frame_id, "timestamp": packet.timestamp,
+                           "image": image, "scale": scale, "pad": pad})
+        return {"frames": frames}
+
+    def _infer(self, batch):
+        if not self.backend:
+            self.ticks_done += 1
+            return None
+        # Run tracking
+        # Tracker state persists across calls (this stage is single-threaded, frames stay in order)
+        frames = batch["frames"]
+        images = [f.pop("image") for f in frames]
+        start = time.perf_counter()
+        if self.batched:
+            outputs = self.backend.track_batch(images, [f["camera"].index for f in frames],
+                                               self.conf_threshold, imgsz=self._model_imgsz())
+        else:
+            outputs = [self.backend.track(images[0], self.conf_threshold, imgsz=self._model_imgsz())]
+        self._record(start, frames)
+        for f, arrays in zip(frames, outputs):
+            f["arrays"] = arrays
+        self.frames_inferred += len(frames)
+        self.readiness.milestone("first_inference")
+        return batch
+
+    def _postprocess(self, batch):
+        # Whole-frame array ops: label lookup, un-letterbox to camera-frame pixels
+        for f in batch["frames"]:
+            cam = f["camera"]
+            ids, clss, confs, boxes = f.pop("arrays")
+            origin = cam.roi[:2] if cam.roi else (0, 0)
+            f["detections"] = self._to_detections(cam, (ids, clss, confs, unletterbox(boxes, f["scale"], f["pad"], origin)))
+        return batch
+
+    def _to_detections(self, cam, arrays):
+        ids, clss, confs, boxes = arrays
+        if not len(ids):
+            return []
+        return [(ids + cam.id_base, self.label_lookup[clss], confs, boxes)]
+
+    def _gate_remote(self, tick):
+        run = self._select(tick)
+        return self._infer_remote(run) if run is not None else None
+
+    def _infer_remote(self, run):
+        start = time.perf_counter()
+        outputs = self.workers.infer_batch([(cam.index, packet.frame_id, cam.roi) for cam, packet in run],
+                                           imgsz=self._model_imgsz())
+        if self.label_lookup is None and self.workers.names is not None:
+            self.label_lookup = build_label_lookup(self.workers.names)
+        frames = []
+        for (cam, packet), arrays in zip(run, outputs):
+            if arrays is None:
+                continue # Worker (re)starting, frame overwritten or failed
+            ids, clss, confs, boxes = cam.tracker.update(*arrays) # Single stage thread, frames stay in order
+            keep = confs > self.conf_threshold
+            frames.append({"camera": cam, "frame_id": packet.frame_id, "timestamp": packet.timestamp,
+                           "detections": self._to_detections(cam, (ids[keep], clss[keep], confs[keep], boxes[keep]))})
+        if not frames:
+            self.ticks_done += 1
+            return None
+        self._record(start, frames) # Round trip, what the pipeline actually waits for
+        self.frames_inferred += len(frames)
+        self.readiness.milestone("first_inference")
+        return {"frames": frames}
+
+    def _update_tracker(self, batch):
+        # One lock acquisition per camera result instead of per object
+        for f in batch["frames"]:
+            cam = f["camera"]
+            live_ids = []
+            with cam.flow_lock:
+                detections, frame_id, timestamp = f["detections"], f["frame_id"], f["timestamp"]
+                if cam.propagator is not None:
+                    detections, frame_id, timestamp = self._forward(cam, f)
+                for ids, labels, confs, boxes in detections:
+                    self.tracker_state.update_batch(ids, labels, confs, boxes, camera=cam.name,
+                                                    captured_at=timestamp, frame_id=frame_id)
+                    live_ids.extend(ids.tolist())
+            cam.live_ids = live_ids
+            cam.settling = self.tracker_state.pending(live_ids) > 0
+            LATENCY.record("tracker", f["timestamp"])
+            if f["detections"]:
+                self.readiness.milestone("first_detection") # Time-to-first-detection from process start
+
+        # Prune old objects occasionally
+        self.tracker_state.prune()
+        self.ticks_done += 1
+
+    def _forward(self, cam, f):
+        """
+        Hand a keyframe's detections to the camera's propagator, which moves
+        them to the newest frame it has seen. Returns (detections, frame id,
+        capture time) to write to TrackerState. Caller holds cam.flow_lock.
+        """
+        if f["detections"]:
+            ids, labels, confs, boxes = f["detections"][0]
+        else:
+            ids, labels, confs, boxes = np.empty(0, np.int64), [], np.empty(0), np.empty((0, 4), np.float32)
+        ids, boxes, frame_id, timestamp = cam.propagator.reset(f["frame_id"], ids, boxes)
+        if timestamp is None: # Keyframe fell out of the history, boxes stay where they were detected
+            frame_id, timestamp = f["frame_id"], f["timestamp"]
+        return ([(ids, labels, confs, boxes)] if len(ids) else []), frame_id, timestamp
+
+    def idle(self):
+        """
+        True when every published frame has been taken and fully handled.
+        A replay in lockstep (ReplaySource(lockstep=loop.idle)) publishes one
+        frame at a time, so no frame is dropped and runs are reproducible.
+        """
+        dropped = self.infer_q.dropped if self.infer_q else 0 # Replaced by a newer tick, also done
+        return (self.ticks_done + dropped >= self.ticks_taken
+                and all(cam.last_frame_id >= cam.camera.bus.frame_id for cam in self.cams))
+
+    def get_stats(self):
+        """
+        Frame counters summed over cameras: captured (published) vs. inferred vs.
+        dropped (pipeline busy) vs. gated (nothing moved), per-stage times, and
+        the same per camera under "cameras".
+        """
+        gates = [cam.gate.stats() for cam in self.cams if cam.gate]
+        checked = sum(g["frames_checked"] for g in gates)
+        gated = sum(g["frames_skipped"] for g in gates)
+        return {
+            "frames_captured": sum(cam.camera.bus.frame_id for cam in self.cams),
+            "frames_inferred": self.frames_inferred,
+            "frames_dropped": sum(cam.frames_skipped for cam in self.cams) + (self.infer_q.dropped if self.infer_q else 0),
+            "frames_gated": gated,
+            "frames_propagated": sum(cam.frames_propagated for cam in self.cams),
+            "detect_interval": self.detect_interval,
+            "skip_rate": round(gated / checked, 3) if checked else 0.0,
+            "infer_imgsz": self._model_imgsz(),
+            "batched": self.batched,
+            "governor": self.governor.stats() if self.governor else None,
+            "last_frame_id": self.cams[0].last_frame_id,
+            "cameras": {cam.name: cam.stats() for cam in self.cams},
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+            "inference_workers": self.workers.stats() if self.workers else None
+        }
 
     def _map_label(self, label):
         """
         Map YOLOv8 COCO labels to Grocery labels.
         """
-        mapping = {
-            "banana": "Banana",
-            "apple": "Red Apple",
-            "orange": "Orange",
-            "broccoli": "Broccoli",
-            "carrot": "Carrot",
-            "bottle": "Milk", 
-            "cup": "Cereal",
-            "box": "Cereal",
-        }
-        return mapping.get(label, label.title())
+        return map_label(label)
 
     def stop(self):
         self.stopped = True
-        if self.t.is_alive():
-            self.t.join()
+        for stage in self.stages:
+            stage.stopped = True
+        for stage in self.stages:
+            stage.stop()
+        if self.workers:
+            self.workers.stop()
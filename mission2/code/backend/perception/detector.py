@@ -1,19 +1,16 @@
-import torch
-from ultralytics import YOLO
 import numpy as np
 
+from perception.labels import map_label
+from perception.backends import create_backend
+
 class GroceryDetector:
-    def __init__(self, model_path="yolov8n.pt", device=None):
-        if device is None:
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        else:
-            self.device = device
-            
-        print(f"Loading YOLOv8 model ({model_path}) on {self.device}...")
+    def __init__(self, model_path=None, device=None, backend=None):
+        # backend: torch / onnx / onnx-int8 (None -> DETECTOR_BACKEND, default torch)
+        print(f"Loading YOLOv8 model ({backend or 'default'} backend)...")
         try:
-            self.model = YOLO(model_path)
+            self.model = create_backend(backend, model_path, device=device)
             # Warmup
-            # self.model(np.zeros((640, 640, 3), dtype=np.uint8)) 
+            # self.model.detect(np.zeros((640, 640, 3), dtype=np.uint8))
             print("Model loaded successfully.")
         except Exception as e:
             print(f"Error loading model: {e}")
@@ -28,7 +25,7 @@ class GroceryDetector:
             return {"name": "Unknown (Model Failed)", "confidence": 0.0}
 
         # Run inference
-        results = self.model(image, verbose=False)
+        boxes, confs, clss = self.model.detect(image)
         
         # Process results
         # We want the highest confidence object
@@ -36,14 +33,11 @@ class GroceryDetector:
         best_conf = -1.0
         best_class_id = -1
         
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                conf = float(box.conf)
-                if conf > best_conf:
-                    best_conf = conf
-                    best_box = box.xyxy[0].tolist() # [xmin, ymin, xmax, ymax]
-                    best_class_id = int(box.cls)
+        if len(confs):
+            i = int(np.argmax(confs))
+            best_conf = float(confs[i])
+            best_box = boxes[i].tolist() # [xmin, ymin, xmax, ymax]
+            best_class_id = int(clss[i])
         
         if best_conf < 0.3: # Threshold
              return {"name": "Unknown Item", "confidence": 0.0}
@@ -61,19 +55,8 @@ class GroceryDetector:
     def _map_label(self, label):
         """
         Map YOLOv8 COCO labels to Grocery labels.
-        COCO classes relevant: 'banana', 'apple', 'orange', 'broccoli', 'carrot', 'bottle', 'cup' ...
         """
-        mapping = {
-            "banana": "Banana",
-            "apple": "Red Apple",
-            "orange": "Orange",
-            "broccoli": "Broccoli",
-            "carrot": "Carrot",
-            "bottle": "Milk", # Assuming bottle -> Milk for now based on prompt
-            "cup": "Cereal", # Weird mapping but placeholders
-            "box": "Cereal", # Not in COCO usually, but maybe YOLO defines it?
-        }
-        return mapping.get(label, label.title())
+        return map_label(label)
 
 if __name__ == "__main__":
     det = GroceryDetector()
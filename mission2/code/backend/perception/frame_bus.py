@@ -0,0 +1,163 @@
+import threading
+import time
+import logging
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+# What readers get back: a read-only view into a ring slot plus its metadata
+FramePacket = namedtuple("FramePacket", ["frame", "frame_id", "timestamp"])
+
+
+class FrameBus:
+    """
+    Single-writer ring buffer of preallocated frames with sequence numbers.
+
+    The writer (camera thread) copies/transforms each captured frame into the
+    next slot and bumps the sequence. Readers get a read-only view of the
+    latest slot, no copy. A slot is only rewritten after `slots - 1` newer
+    frames, so a reader that needs a frame for longer than that should copy it
+    (or check `is_current(frame_id)` afterwards).
+
+    With shared=True the ring lives in multiprocessing.shared_memory so another
+    process can `FrameBus.attach(name, ...)` and read frames without pickling.
+
+    After close(), readers get None (latest/get/wait_next) and publish() raises
+    ValueError, so threads still reading during shutdown stop cleanly.
+    """
+    def __init__(self, shape, dtype=np.uint8, slots=8, shared=False, name=None, create=True,
+                 untrack=True):
+        self.logger = logging.getLogger("FrameBus")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.shared = shared
+        self.shm = None
+        self._owner = create
+
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        # Header: [seq, id of slot 0..n-1] as int64, then capture timestamps (time.monotonic()) as float64
+        header_bytes = 8 * (1 + slots) + 8 * slots
+
+        if shared:
+            self.shm = shared_memory.SharedMemory(
+                name=name, create=create, size=header_bytes + frame_bytes * slots)
+            if not create and untrack:
+                # Readers must not unlink the owner's segment when they exit
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            buf = self.shm.buf
+        else:
+            buf = bytearray(header_bytes + frame_bytes * slots)
+
+        self._ids = np.ndarray((1 + slots,), dtype=np.int64, buffer=buf, offset=0)
+        self._stamps = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 * (1 + slots))
+        self._buffers = np.ndarray((slots,) + self.shape, dtype=self.dtype,
+                                   buffer=buf, offset=header_bytes)
+        if create:
+            self._ids[:] = -1
+            self._ids[0] = 0 # No frame published yet
+            self._stamps[:] = 0.0
+
+        # Wakes in-process readers; other processes poll the sequence instead
+        self.cond = threading.Condition()
+        self.closed = False
+
+    @property
+    def name(self):
+        return self.shm.name if self.shm else None
+
+    @classmethod
+    def attach(cls, name, shape, dtype=np.uint8, slots=8, untrack=True):
+        """
+        Open an existing shared-memory bus from another process (read side).
+        Pass untrack=False from a multiprocessing child of the owner: it shares
+        the owner's resource tracker, so unregistering would drop the owner's entry.
+        """
+        return cls(shape, dtype=dtype, slots=slots, shared=True, name=name, create=False, untrack=untrack)
+
+    @property
+    def frame_id(self):
+        """Id of the latest published frame (0 = nothing yet)."""
+        ids = self._ids
+        return int(ids[0]) if ids is not None else 0
+
+    def publish(self, frame, timestamp=None, transform=None):
+        """
+        Write a frame into the next slot. `transform(src, dst)` lets the caller
+        fill the slot directly (e.g. cv2.LUT(..., dst=dst)) instead of copying.
+        Returns the new frame id.
+        """
+        if self.closed:
+            raise ValueError("FrameBus is closed")
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match bus shape {self.shape}")
+
+        frame_id = int(self._ids[0]) + 1
+        slot = frame_id % self.slots
+        dst = self._buffers[slot]
+        if transform is not None:
+            transform(frame, dst)
+        else:
+            np.copyto(dst, frame)
+
+        self._stamps[slot] = timestamp if timestamp is not None else time.monotonic()
+        self._ids[1 + slot] = frame_id
+        with self.cond:
+            self._ids[0] = frame_id # Publish last, readers key off the sequence
+            self.cond.notify_all()
+        return frame_id
+
+    def _packet(self, frame_id):
+        ids, stamps, buffers = self._ids, self._stamps, self._buffers
+        if self.closed or buffers is None:
+            return None
+        slot = frame_id % self.slots
+        if frame_id <= 0 or ids[1 + slot] != frame_id:
+            return None
+        view = buffers[slot]
+        view.flags.writeable = False
+        return FramePacket(view, frame_id, float(stamps[slot]))
+
+    def get(self, frame_id):
+        """FramePacket for `frame_id` if its slot still holds it, else None."""
+        return self._packet(frame_id)
+
+    def latest(self):
+        """Return the newest FramePacket, or None if nothing was published yet."""
+        return self._packet(self.frame_id)
+
+    def wait_next(self, last_id=0, timeout=None):
+        """
+        Block until a frame newer than `last_id` is published and return it.
+        Returns None on timeout or once the bus is closed.
+        """
+        if self._owner or not self.shared:
+            with self.cond:
+                if not self.cond.wait_for(lambda: self.closed or self._ids[0] > last_id, timeout):
+                    return None
+            return self.latest()
+
+        # Attached from another process: no shared condition, poll the sequence
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.closed and self.frame_id <= last_id:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.002)
+        return self.latest()
+
+    def is_current(self, frame_id):
+        """True while the slot holding `frame_id` has not been reused by the writer."""
+        return not self.closed and self.frame_id - frame_id < self.slots - 1
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all() # Waiting readers return None
+        if self.shm is not None:
+            # Drop our numpy views before releasing the mapping
+            self._ids = self._stamps = self._buffers = None
+            self.shm.close()
+            if self._owner:
+                self.shm.unlink()
+            self.shm = None
@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+
+# Model input sizes the governor can step through (largest first)
+SIZE_LADDER = (640, 512, 416, 320, 256)
+
+
+def system_load():
+    """1-minute load average per CPU (1.0 = all cores busy), 0 where unsupported."""
+    if not hasattr(os, "getloadavg"):
+        return 0.0
+    return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+
+class PerceptionGovernor:
+    """
+    Decides how often and at what input size the detector runs, from measured
+    inference latency and system load.
+
+    - Rate: the next inference is admitted at most every 1/fps seconds and no
+      sooner than infer_time / duty, i.e. perception keeps the model busy at most
+      `duty` of the time. Frames in between are skipped (counted as throttled).
+    - Size: if the latency EMA is over `budget_ms` the model input steps down the
+      ladder; it steps back up once the next size is predicted (~area) to fit.
+    - Priority: while `priority()` is true (a scan routine is running) perception
+      gets full rate and the full budget regardless of load. When idle it keeps
+      the model busy at most `idle_duty` of the time (only slow models notice)
+      and, if set, runs at most `idle_fps`; both plus the budget are halved
+      while the load average per CPU is above `high_load`.
+
+    Decisions are re-evaluated every `adjust_interval` seconds (sizes change at
+    most that often, so the tracker isn't churned).
+    """
+    def __init__(self, sizes=(640,), budget_ms=120.0, active_fps=30.0, idle_fps=None,
+                 idle_duty=0.5, high_load=0.9, priority=None, adjust_interval=2.0, load_fn=system_load):
+        self.sizes = sorted(set(sizes), reverse=True)
+        self.budget_ms = budget_ms
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.idle_duty = idle_duty
+        self.high_load = high_load
+        self.priority = priority or (lambda: False)
+        self.adjust_interval = adjust_interval
+        self.load_fn = load_fn
+        self.logger = logging.getLogger("PerceptionGovernor")
+
+        self.size_idx = 0
+        self.infer_ms = None # EMA of per-frame inference time at the current size
+        self.min_interval = 0.0
+        self.next_slot = 0.0
+        self.next_adjust = 0.0
+        self.active = False
+        self.load = 0.0
+        self.budget = budget_ms
+        self.frames_admitted = 0
+        self.frames_throttled = 0
+
+    @property
+    def imgsz(self):
+        return self.sizes[self.size_idx]
+
+    def due(self, now=None):
+        """True if an inference may start now; False -> skip this frame."""
+        now = now if now is not None else time.monotonic()
+        if now >= self.next_adjust:
+            self._adjust(now)
+        if now >= self.next_slot:
+            return True
+        self.frames_throttled += 1
+        return False
+
+    def started(self, now=None):
+        """An inference was started: reserve the next slot."""
+        now = now if now is not None else time.monotonic()
+        self.frames_admitted += 1
+        self.next_slot = now + self.min_interval
+
+    def record(self, infer_ms):
+        """Feed the measured time of one inference."""
+        self.infer_ms = infer_ms if self.infer_ms is None else self.infer_ms * 0.8 + infer_ms * 0.2
+
+    def _adjust(self, now):
+        self.next_adjust = now + self.adjust_interval
+        try:
+            self.active = bool(self.priority())
+        except Exception as e:
+            self.logger.error(f"Priority check failed: {e}")
+            self.active = False
+        self.load = self.load_fn()
+
+        fps, duty, budget = self.active_fps, 1.0, self.budget_ms
+        if not self.active:
+            fps, duty = self.idle_fps or fps, self.idle_duty
+            if self.load > self.high_load:
+                # Idle and the machine is busy: give the CPU back
+                fps, duty, budget = fps / 2, duty / 2, budget / 2
+        self.budget = budget
+
+        if self.infer_ms is not None:
+            size_idx = self.size_idx
+            if self.infer_ms > budget and size_idx < len(self.sizes) - 1:
+                size_idx += 1
+            elif size_idx > 0:
+                # Cost scales roughly with input area
+                predicted = self.infer_ms * (self.sizes[size_idx - 1] / self.sizes[size_idx]) ** 2
+                if predicted < budget * 0.8:
+                    size_idx -= 1
+            if size_idx != self.size_idx:
+                self.logger.info(f"imgsz {self.imgsz} -> {self.sizes[size_idx]} "
+                                 f"(infer {self.infer_ms:.0f} ms, budget {budget:.0f} ms, load {self.load:.2f})")
+                # Rescale the estimate so the next decision doesn't flap on stale numbers
+                self.infer_ms *= (self.sizes[size_idx] / self.imgsz) ** 2
+                self.size_idx = size_idx
+
+        infer_s = (self.infer_ms or 0.0) / 1000
+        self.min_interval = max(1.0 / fps, infer_s / duty)
+
+    def stats(self):
+        total = self.frames_admitted + self.frames_throttled
+        return {
+            "mode": "active" if self.active else "idle",
+            "imgsz": self.imgsz,
+            "infer_ms": round(self.infer_ms, 1) if self.infer_ms is not None else None,
+            "budget_ms": round(self.budget, 1),
+            "target_fps": round(1.0 / self.min_interval, 1) if self.min_interval else None,
+            "load": round(self.load, 2),
+            "frames_throttled": self.frames_throttled,
+            "throttle_rate": round(self.frames_throttled / total, 3) if total else 0.0
+        }
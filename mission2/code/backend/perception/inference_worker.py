@@ -0,0 +1,314 @@
+import os
+import time
+import queue
+import itertools
+import logging
+import threading
+import multiprocessing as mp
+import numpy as np
+
+from perception.frame_bus import FrameBus
+from perception.preprocess import letterbox, unletterbox, crop, roi_imgsz
+from perception.backends import create_backend
+
+
+def worker_main(bus_specs, backend, model_path, imgsz, conf_threshold,
+                torch_threads, requests, results):
+    """
+    Child-process entry point. Attaches to the cameras' shared-memory FrameBuses
+    (bus_specs: one (name, shape, dtype, slots) per camera), loads the detector
+    backend and answers ("infer", seq, entries, model_imgsz) requests with
+    ("result", seq, outputs, infer_ms). Frames never cross the pipe, only their
+    ids and the detection arrays do.
+
+    entries is a list of (stream, frame_id, roi), stream being the bus index;
+    outputs has one (boxes, confs, clss) detection tuple per entry, or None if
+    that frame was already overwritten. The frames of one request run as a
+    single batch (detect_batch); tracking is left to the parent. A non-None roi
+    (x0, y0, x1, y1) runs the model on that crop only, at roi_imgsz(); boxes
+    come back in frame pixels. model_imgsz (None = default) lowers the model's
+    input size.
+    """
+    # Must be set before torch / onnxruntime are imported to cap their OpenMP pools too
+    if torch_threads:
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    logger = logging.getLogger(f"InferenceWorker[{os.getpid()}]")
+
+    buses = []
+    try:
+        detector = create_backend(backend, model_path, imgsz, threads=torch_threads)
+        for name, shape, dtype, slots in bus_specs:
+            buses.append(FrameBus.attach(name, shape, dtype=dtype, slots=slots, untrack=False))
+        # Warm up before reporting ready, so the first real frame isn't the slow one
+        detector.warmup(letterbox(np.zeros(buses[0].shape, buses[0].dtype), imgsz)[0], batch=len(buses))
+    except Exception as e:
+        results.put(("failed", f"{type(e).__name__}: {e}"))
+        for bus in buses:
+            bus.close()
+        return
+    results.put(("ready", detector.names))
+
+    parent = mp.parent_process()
+    try:
+        while True:
+            try:
+                request = requests.get(timeout=1.0)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    return # Orphaned, don't outlive the API process
+                continue
+            if request is None:
+                return
+            _, seq, entries, model_imgsz = request
+
+            outputs = [None] * len(entries)
+            images, metas = [], []
+            for k, (stream, frame_id, roi) in enumerate(entries):
+                bus = buses[stream]
+                packet = bus.get(frame_id)
+                if packet is None:
+                    continue
+                size = roi_imgsz(roi, imgsz) if roi else imgsz
+                image, scale, pad = letterbox(crop(packet.frame, roi), size)
+                if not bus.is_current(frame_id):
+                    # Camera lapped us while copying, the slot may be torn
+                    continue
+                images.append(image)
+                metas.append((k, scale, pad, roi[:2] if roi else (0, 0), size))
+
+            start = time.perf_counter()
+            if images:
+                try:
+                    size = model_imgsz or max(m[4] for m in metas)
+                    detections = detector.detect_batch(images, conf_threshold, imgsz=size)
+                    for (k, scale, pad, origin, _), (boxes, confs, clss) in zip(metas, detections):
+                        outputs[k] = (unletterbox(boxes, scale, pad, origin), confs, clss)
+                except Exception as e:
+                    logger.error(f"Inference error: {e}")
+                    results.put(("error", seq, str(e)))
+                    continue
+            results.put(("result", seq, outputs, (time.perf_counter() - start) * 1000))
+    finally:
+        for bus in buses:
+            bus.close()
+
+
+class _WorkerHandle:
+    """One child process plus its request/result queues and restart bookkeeping."""
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.ready = False
+        self.names = None
+        self.generation = -1
+        self.restarts = 0
+        self.next_start = 0.0  # monotonic time of the pending restart, 0 while running
+        self.backoff = 0.0
+        self.last_error = None
+        self.started_at = 0.0
+        self.lock = threading.Lock()
+
+
+class InferenceWorkerPool:
+    """
+    YOLO detection in child processes, so the model's compute and PyTorch's
+    threads never contend with uvicorn or the camera thread for the GIL.
+
+    Frames are read by the workers straight out of the cameras' shared-memory
+    FrameBuses (CameraStream(shared=True)); `buses` is one bus or a list, and
+    stream i means buses[i]. Workers return plain detection arrays and hold no
+    tracking state (the caller tracks, see perception.tracker), so a restarted
+    worker doesn't reset any track ids. Stream i goes to worker
+    `i % num_workers`; extra workers serve extra cameras, and the frames a
+    worker gets in one call run as one batch.
+
+    Health policy: a worker that dies, fails to load, or doesn't answer within
+    request_timeout is killed and restarted with exponential backoff (capped at
+    max_backoff). Frames are dropped while a worker is (re)starting.
+    """
+    def __init__(self, buses, model_path=None, imgsz=640, conf_threshold=0.4,
+                 num_workers=1, backend=None, torch_threads=None, request_timeout=10.0,
+                 load_timeout=120.0, max_backoff=30.0):
+        buses = list(buses) if isinstance(buses, (list, tuple)) else [buses]
+        if not all(bus.shared for bus in buses):
+            raise ValueError("Inference workers need a shared-memory FrameBus (CameraStream(shared=True))")
+        self.buses = buses
+        self.backend = backend
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        self.torch_threads = torch_threads
+        self.request_timeout = request_timeout
+        self.load_timeout = load_timeout
+        self.max_backoff = max_backoff
+        self.logger = logging.getLogger("InferenceWorkerPool")
+
+        # spawn: forking a process with live threads (camera, uvicorn) is unsafe
+        self.ctx = mp.get_context("spawn")
+        self.workers = [_WorkerHandle(i) for i in range(num_workers)]
+        self.names_ready = threading.Event()
+        self.names = None
+        self._seq = itertools.count(1)
+        self.stopped = False
+        self.t = None
+
+    def start(self):
+        for handle in self.workers:
+            self._spawn(handle)
+        self.t = threading.Thread(target=self._supervise, args=(), name="inference-supervisor")
+        self.t.daemon = True
+        self.t.start()
+        return self
+
+    def _spawn(self, handle):
+        # Caller holds handle.lock (or nobody else can see the handle yet)
+        handle.generation += 1
+        handle.ready = False
+        handle.requests = self.ctx.Queue()
+        handle.results = self.ctx.Queue()
+        handle.process = self.ctx.Process(
+            target=worker_main, name=f"inference-worker-{handle.index}",
+            args=([(bus.name, bus.shape, bus.dtype.str, bus.slots) for bus in self.buses],
+                  self.backend, self.model_path, self.imgsz, self.conf_threshold, self.torch_threads,
+                  handle.requests, handle.results))
+        handle.process.daemon = True
+        handle.process.start()
+        handle.started_at = time.monotonic()
+        self.logger.info(f"Started inference worker {handle.index} (pid {handle.process.pid}, gen {handle.generation})")
+
+    def _kill(self, handle, reason):
+        # Caller holds handle.lock
+        handle.last_error = reason
+        handle.ready = False
+        if handle.process is not None and handle.process.is_alive():
+            handle.process.kill()
+        if handle.process is not None:
+            handle.process.join(timeout=1.0)
+        handle.backoff = min(max(1.0, handle.backoff * 2), self.max_backoff)
+        handle.next_start = time.monotonic() + handle.backoff
+        self.logger.error(f"Inference worker {handle.index} down ({reason}), restarting in {handle.backoff:.0f}s")
+
+    def _poll_ready(self, handle):
+        # Caller holds handle.lock. Consumes the worker's startup message if it arrived.
+        try:
+            msg = handle.results.get_nowait()
+        except queue.Empty:
+            if time.monotonic() - handle.started_at > self.load_timeout:
+                self._kill(handle, "model load timed out")
+            return
+        if msg[0] == "ready":
+            handle.ready = True
+            handle.backoff = 0.0
+            handle.names = msg[1]
+            if self.names is None:
+                self.names = msg[1]
+                self.names_ready.set()
+            self.logger.info(f"Inference worker {handle.index} ready")
+        elif msg[0] == "failed":
+            self._kill(handle, f"model load failed: {msg[1]}")
+
+    def _supervise(self):
+        while not self.stopped:
+            for handle in self.workers:
+                with handle.lock:
+                    if self.stopped:
+                        return
+                    running = handle.next_start == 0.0 # else: down, waiting for its restart slot
+                    if running and not handle.ready:
+                        self._poll_ready(handle)
+                        running = handle.next_start == 0.0
+                    if running and not handle.process.is_alive():
+                        self._kill(handle, f"exited with code {handle.process.exitcode}")
+                    elif not running and time.monotonic() >= handle.next_start:
+                        handle.restarts += 1
+                        handle.next_start = 0.0
+                        self._spawn(handle)
+            time.sleep(0.5)
+
+    def infer(self, frame_id, stream=0, roi=None, imgsz=None):
+        """
+        Run detection on frame `frame_id` of buses[stream] (or its `roi` crop) in the
+        worker serving `stream`, optionally at a smaller model input size `imgsz`.
+        Returns (boxes, confs, class ids) arrays, or None if the frame was
+        dropped (worker not ready, frame overwritten, error or timeout).
+        """
+        return self.infer_batch([(stream, frame_id, roi)], imgsz)[0]
+
+    def infer_batch(self, entries, imgsz=None):
+        """
+        Batched infer(): entries are (stream, frame_id, roi). Each worker gets its
+        streams' frames in one request, all workers run concurrently. Returns one
+        arrays tuple (or None if dropped) per entry.
+        """
+        outputs = [None] * len(entries)
+        groups = {}
+        for k, entry in enumerate(entries):
+            groups.setdefault(entry[0] % len(self.workers), []).append(k)
+
+        sent = []
+        for index in sorted(groups): # Fixed lock order
+            handle = self.workers[index]
+            handle.lock.acquire()
+            if not handle.ready:
+                handle.lock.release()
+                continue
+            seq = next(self._seq)
+            handle.requests.put(("infer", seq, [entries[k] for k in groups[index]], imgsz))
+            sent.append((handle, seq, groups[index]))
+
+        for handle, seq, ks in sent:
+            try:
+                reply = self._collect(handle, seq)
+            finally:
+                handle.lock.release()
+            if reply is not None:
+                for k, arrays in zip(ks, reply):
+                    outputs[k] = arrays
+        return outputs
+
+    def _collect(self, handle, seq):
+        # Caller holds handle.lock. Waits for the reply to `seq`, returns its outputs or None.
+        deadline = time.monotonic() + self.request_timeout
+        while True:
+            try:
+                # Short slices so a crashed worker is noticed right away
+                msg = handle.results.get(timeout=0.5)
+            except queue.Empty:
+                if not handle.process.is_alive():
+                    self._kill(handle, f"died with code {handle.process.exitcode}")
+                    return None
+                if time.monotonic() > deadline:
+                    self._kill(handle, "no reply")
+                    return None
+                continue
+            if msg[0] in ("result", "error") and msg[1] == seq:
+                break
+        if msg[0] == "error":
+            handle.last_error = msg[2]
+            return None
+        return msg[2]
+
+    def stats(self):
+        return [{
+            "index": handle.index,
+            "pid": handle.process.pid if handle.process else None,
+            "alive": bool(handle.process and handle.process.is_alive()),
+            "ready": handle.ready,
+            "restarts": handle.restarts,
+            "last_error": handle.last_error
+        } for handle in self.workers]
+
+    def stop(self):
+        self.stopped = True
+        for handle in self.workers:
+            with handle.lock:
+                if handle.process is not None and handle.process.is_alive():
+                    handle.requests.put(None)
+                    handle.process.join(timeout=2.0)
+                    if handle.process.is_alive():
+                        handle.process.kill()
+        if self.t and self.t.is_alive():
+            self.t.join()
@@ -0,0 +1,31 @@
+import numpy as np
+
+# YOLOv8 COCO labels -> Grocery labels
+# COCO classes relevant: 'banana', 'apple', 'orange', 'broccoli', 'carrot', 'bottle', 'cup' ...
+GROCERY_LABELS = {
+    "banana": "Banana",
+    "apple": "Red Apple",
+    "orange": "Orange",
+    "broccoli": "Broccoli",
+    "carrot": "Carrot",
+    "bottle": "Milk", # Assuming bottle -> Milk for now based on prompt
+    "cup": "Cereal", # Weird mapping but placeholders
+    "box": "Cereal", # Not in COCO usually, but maybe YOLO defines it?
+}
+
+def map_label(label):
+    """Map a single raw model label to its grocery label."""
+    return GROCERY_LABELS.get(label, label.title())
+
+def build_label_lookup(names):
+    """
+    Precompute class id -> grocery label as an object array, so a whole
+    frame's class ids can be mapped with one fancy-index: lookup[clss].
+    `names` is the model's {id: raw_label} dict (or a list).
+    """
+    if not isinstance(names, dict):
+        names = dict(enumerate(names))
+    lookup = np.empty(max(names) + 1, dtype=object)
+    for cls_id, raw_label in names.items():
+        lookup[cls_id] = map_label(raw_label)
+    return lookup
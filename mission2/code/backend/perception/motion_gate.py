@@ -0,0 +1,65 @@
+import time
+import cv2
+import numpy as np
+
+class MotionGate:
+    """
+    Decides per frame whether running the model is worth it.
+
+    Frames (or just the ROI) are shrunk to `width` px grayscale and compared
+    with the last frame that *was* inferred, so slow changes still add up. If
+    fewer than `min_changed` of the pixels moved by more than `pixel_threshold`
+    levels the frame is skipped. Inference is forced at least every
+    `max_skip_seconds` so tracks get a real refresh even in a static scene.
+    """
+    def __init__(self, width=160, pixel_threshold=12, min_changed=0.002, max_skip_seconds=1.0):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_skip_seconds = max_skip_seconds
+
+        self.reference = None
+        self.last_run = 0.0
+        self.last_changed = 0.0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.recent_skip_rate = 0.0 # EMA over ~the last 50 frames
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(round(h * self.width / w)))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def should_run(self, frame, force=False, now=None):
+        """True -> run the model on this frame (it becomes the new reference)."""
+        now = now if now is not None else time.monotonic()
+        small = self._small(frame)
+        self.frames_checked += 1
+
+        if not force and self.reference is not None and now - self.last_run < self.max_skip_seconds:
+            diff = cv2.absdiff(small, self.reference)
+            changed = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+            self.last_changed = changed
+            if changed < self.min_changed:
+                self.frames_skipped += 1
+                self.recent_skip_rate += (1.0 - self.recent_skip_rate) * 0.02
+                return False
+
+        self.reference = small
+        self.last_run = now
+        self.recent_skip_rate -= self.recent_skip_rate * 0.02
+        return True
+
+    def reset(self):
+        """Force the next frame through (e.g. after the ROI changed)."""
+        self.reference = None
+
+    def stats(self):
+        return {
+            "frames_checked": self.frames_checked,
+            "frames_skipped": self.frames_skipped,
+            "skip_rate": round(self.frames_skipped / self.frames_checked, 3) if self.frames_checked else 0.0,
+            "recent_skip_rate": round(self.recent_skip_rate, 3),
+            "last_changed_fraction": round(self.last_changed, 4)
+        }
@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+import logging
+
+from metrics import REGISTRY
+from tracing import TRACER
+
+STAGE_TIME = REGISTRY.histogram("perception_stage_seconds", "Time per item in each pipeline stage", ("stage",))
+QUEUE_DEPTH = REGISTRY.gauge("perception_queue_depth", "Items waiting in the stage's inbox", ("stage",))
+QUEUE_DROPPED = REGISTRY.counter("perception_queue_dropped_total", "Items evicted from the stage's inbox (newer frame arrived)", ("stage",))
+
+class StageQueue:
+    """
+    Bounded hand-off queue between two pipeline stages.
+    drop_oldest=True evicts the oldest item when full (for "latest frame wins" inputs);
+    otherwise put() blocks, which applies backpressure to the upstream stage.
+    """
+    def __init__(self, maxsize=2, drop_oldest=False):
+        self.q = queue.Queue(maxsize=maxsize)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+
+    def put(self, item, stopped=lambda: False):
+        while True:
+            try:
+                if self.drop_oldest:
+                    self.q.put_nowait(item)
+                else:
+                    self.q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self.drop_oldest:
+                    try:
+                        self.q.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+                elif stopped():
+                    return
+
+    def get(self, timeout=0.1):
+        try:
+            return self.q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self.q.qsize()
+
+
+class PipelineStage:
+    """
+    One worker thread: takes items from `inbox` (or from `source()` for the first
+    stage), applies `fn`, pushes the result to `outbox`. Waiting for input is not
+    counted in the stage time. fn returning None means "nothing to pass on".
+    `trace(item)` returns span args (e.g. the frame ids) for the FrameTracer.
+    """
+    def __init__(self, name, fn, inbox=None, outbox=None, source=None, trace=None):
+        self.name = name
+        self.fn = fn
+        self.source = source
+        self.inbox = inbox
+        self.outbox = outbox
+        self.trace = trace
+        self.stopped = False
+        self.processed = 0
+        self.busy_time = 0.0
+        self.t = None
+        self.logger = logging.getLogger(f"Stage[{name}]")
+        self.m_time = STAGE_TIME.labels(name)
+        if inbox is not None:
+            QUEUE_DEPTH.labels(name).set_function(inbox.qsize)
+            QUEUE_DROPPED.labels(name).set_function(lambda: inbox.dropped)
+
+    def start(self):
+        self.t = threading.Thread(target=self.run, args=(), name=f"perception-{self.name}")
+        self.t.daemon = True
+        self.t.start()
+        return self
+
+    def run(self):
+        while not self.stopped:
+            item = self.inbox.get() if self.inbox is not None else self.source()
+            if item is None:
+                continue
+
+            # Read before fn, which may consume parts of the item
+            args = self.trace(item) if self.trace is not None and TRACER.active else None
+            start = time.monotonic()
+            try:
+                out = self.fn(item)
+            except Exception as e:
+                self.logger.error(f"Stage error: {e}")
+                continue
+            end = time.monotonic()
+            self.busy_time += end - start
+            self.m_time.observe(end - start)
+            if args is not None:
+                TRACER.span(self.name, start, end, args)
+            self.processed += 1
+
+            if out is not None and self.outbox is not None:
+                self.outbox.put(out, stopped=lambda: self.stopped)
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "avg_ms": round(self.busy_time / self.processed * 1000, 2) if self.processed else 0.0,
+            "queue_depth": self.inbox.qsize() if self.inbox else 0,
+            "queue_dropped": self.inbox.dropped if self.inbox else 0
+        }
+
+    def stop(self):
+        self.stopped = True
+        if self.t and self.t.is_alive():
+            self.t.join()
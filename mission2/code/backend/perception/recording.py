@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import cv2
+import numpy as np
+
+# A recording is a directory: manifest.json plus chunk_NNNNN.npz files, each holding
+# `chunk_frames` encoded frames (data = concatenated JPEG/PNG bytes, offsets, timestamps).
+# Raw camera frames are stored (before gamma/white-balance), so a replay goes through
+# the same FramePreprocessor as the live camera.
+MANIFEST = "manifest.json"
+
+
+def is_recording(path):
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, MANIFEST))
+
+
+class FrameRecorder:
+    """
+    Dumps timestamped frames to a chunked recording. write() only queues the
+    frame; encoding and file I/O happen on the recorder thread, so the capture
+    thread never waits on disk. If the queue is full the frame is dropped (and
+    counted). The manifest is rewritten after every chunk, so a crash loses at
+    most the chunk in progress.
+    """
+    def __init__(self, directory, name="main", chunk_frames=300, quality=90, lossless=False, max_queue=64):
+        self.directory = directory
+        self.name = name
+        self.chunk_frames = chunk_frames
+        self.codec = "png" if lossless else "jpg"
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, 1] if lossless else [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.logger = logging.getLogger(f"FrameRecorder[{name}]")
+        os.makedirs(directory, exist_ok=True)
+
+        self.q = queue.Queue(maxsize=max_queue)
+        self.manifest = {"version": 1, "name": name, "codec": self.codec, "shape": None,
+                         "frames": 0, "chunks": []}
+        self.buffers, self.stamps = [], []
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.t = None
+
+    def start(self):
+        self.t = threading.Thread(target=self.run, args=(), name=f"recorder-{self.name}")
+        self.t.daemon = True
+        self.t.start()
+        return self
+
+    def write(self, frame, timestamp=None):
+        try:
+            self.q.put_nowait((frame, timestamp if timestamp is not None else time.time()))
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def run(self):
+        while True:
+            item = self.q.get()
+            if item is None:
+                break
+            frame, timestamp = item
+            ok, buffer = cv2.imencode("." + self.codec, frame, self.params)
+            if not ok:
+                self.frames_dropped += 1
+                continue
+            if self.manifest["shape"] is None:
+                self.manifest["shape"] = list(frame.shape)
+            self.buffers.append(buffer.reshape(-1))
+            self.stamps.append(timestamp)
+            if len(self.buffers) >= self.chunk_frames:
+                self._flush()
+        self._flush()
+
+    def _flush(self):
+        if not self.buffers:
+            return
+        index = len(self.manifest["chunks"])
+        filename = f"chunk_{index:05d}.npz"
+        offsets = np.cumsum([0] + [len(b) for b in self.buffers]).astype(np.int64)
+        # Frames are already compressed, np.savez just packs them
+        np.savez(os.path.join(self.directory, filename), data=np.concatenate(self.buffers),
+                 offsets=offsets, timestamps=np.array(self.stamps, dtype=np.float64))
+        self.manifest["chunks"].append({"file": filename, "frames": len(self.buffers),
+                                        "t0": self.stamps[0], "t1": self.stamps[-1]})
+        self.manifest["frames"] += len(self.buffers)
+        self.frames_written += len(self.buffers)
+        self.buffers, self.stamps = [], []
+        tmp = os.path.join(self.directory, MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, os.path.join(self.directory, MANIFEST))
+
+    def stop(self):
+        if self.t is not None and self.t.is_alive():
+            self.q.put(None)
+            self.t.join()
+        self.logger.info(f"Recorded {self.frames_written} frames to {self.directory} "
+                         f"({self.frames_dropped} dropped)")
+
+
+class ReplaySource:
+    """
+    cv2.VideoCapture look-alike that plays a recording back, so it can be
+    passed to CameraStream(src=...) in place of a device.
+
+    speed=1.0 keeps the recorded timing, 2.0 plays twice as fast, 0 as fast as
+    frames decode. loop=True restarts at the end, otherwise read() returns
+    (False, None) and `finished` is set. When real-time playback falls more
+    than `max_lag` seconds behind, late frames are skipped. `lockstep`, if given, is polled before
+    each frame and playback waits until it returns True (e.g. "the consumer has
+    finished the previous frame"), which makes benchmark runs reproducible.
+    """
+    poll_interval = 0.0 # CameraStream needn't sleep between reads, read() paces itself
+
+    def __init__(self, directory, speed=1.0, loop=False, lockstep=None, lockstep_timeout=10.0, max_lag=0.1):
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.directory = directory
+        self.name = self.manifest.get("name", "main")
+        self.speed = speed
+        self.loop = loop
+        self.lockstep = lockstep
+        self.lockstep_timeout = lockstep_timeout
+        self.finished = False
+        self.max_lag = max_lag
+        self.frames_read = 0
+        self.frames_late = 0 # Skipped because playback fell more than max_lag seconds behind
+        self.logger = logging.getLogger(f"ReplaySource[{self.name}]")
+        self._frames = self._iter_frames()
+        self._t0 = None # (wall time, recorded time) of the first frame of this pass
+
+    def __len__(self):
+        return self.manifest["frames"]
+
+    def __repr__(self):
+        return f"replay of {self.directory} (speed {self.speed})"
+
+    def _iter_frames(self):
+        for chunk in self.manifest["chunks"]:
+            with np.load(os.path.join(self.directory, chunk["file"])) as npz:
+                data, offsets, stamps = npz["data"], npz["offsets"], npz["timestamps"]
+            for i in range(len(stamps)):
+                yield data[offsets[i]:offsets[i + 1]], float(stamps[i])
+
+    def _next(self):
+        item = next(self._frames, None)
+        if item is None and self.loop and self.frames_read:
+            self._frames = self._iter_frames()
+            self._t0 = None
+            item = next(self._frames, None)
+        return item
+
+    def _late(self, stamp):
+        if self.speed <= 0 or self.lockstep is not None or self._t0 is None or self.frames_read < 2:
+            return False
+        return time.monotonic() - (self._t0[0] + (stamp - self._t0[1]) / self.speed) > self.max_lag
+
+    def read(self):
+        if self.finished:
+            return False, None
+        item = self._next()
+        # Behind schedule (busy CPU): skip frames like a camera would, instead of
+        # stretching the replay. Skipped frames are never decoded.
+        while item is not None and self._late(item[1]):
+            self.frames_late += 1
+            item = self._next()
+        if item is None:
+            self.finished = True
+            return False, None
+        encoded, stamp = item
+
+        if self.lockstep is not None and self.frames_read:
+            # (The first frame is read by CameraStream's constructor, before any consumer exists)
+            deadline = time.monotonic() + self.lockstep_timeout
+            while not self.lockstep():
+                if time.monotonic() > deadline:
+                    self.logger.warning("Lockstep timed out, replaying anyway")
+                    break
+                time.sleep(0.001)
+        frame = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+        if self.speed > 0:
+            now = time.monotonic()
+            # Anchored at the second frame: the first one is read when the CameraStream
+            # opens, possibly long before its capture thread starts
+            if self._t0 is None or self.frames_read == 1:
+                self._t0 = (now, stamp)
+            due = self._t0[0] + (stamp - self._t0[1]) / self.speed
+            if due > now:
+                time.sleep(due - now)
+        self.frames_read += 1
+        return True, frame
+
+    # The bits of the VideoCapture interface CameraStream touches
+    def isOpened(self):
+        return not self.finished
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self))
+        if prop == cv2.CAP_PROP_FPS:
+            chunks = self.manifest["chunks"]
+            duration = chunks[-1]["t1"] - chunks[0]["t0"] if chunks else 0
+            return (len(self) - 1) / duration if duration > 0 else 0.0
+        return 0.0
+
+    def release(self):
+        self.finished = True
+
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Record camera frames for offline replay / benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record")
+    rec.add_argument("--src", default="8", help="Device index or video file")
+    rec.add_argument("--out", required=True, help="Recording directory")
+    rec.add_argument("--name", default="main", help="Camera name stored in the manifest")
+    rec.add_argument("--seconds", type=float, default=30.0)
+    rec.add_argument("--chunk", type=int, default=300, help="Frames per chunk file")
+    rec.add_argument("--quality", type=int, default=90, help="JPEG quality")
+    rec.add_argument("--lossless", action="store_true", help="PNG instead of JPEG")
+    info = sub.add_parser("info")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        replay = ReplaySource(args.path)
+        m = replay.manifest
+        print(f"{args.path}: camera {m['name']}, {m['frames']} frames {m['shape']} ({m['codec']}), "
+              f"{len(m['chunks'])} chunks, {replay.get(cv2.CAP_PROP_FPS):.1f} FPS")
+    else:
+        from perception.camera_stream import CameraStream
+        src = int(args.src) if args.src.isdigit() else args.src
+        recorder = FrameRecorder(args.out, args.name, args.chunk, args.quality, args.lossless)
+        camera = CameraStream(src=src, name=args.name, recorder=recorder).start()
+        try:
+            time.sleep(args.seconds)
+        except KeyboardInterrupt:
+            pass
+        camera.stop()
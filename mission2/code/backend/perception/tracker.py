@@ -0,0 +1,259 @@
+import logging
+
+import lap
+import numpy as np
+
+# Multi-object tracker on plain detection arrays, independent of the detector
+# runtime: ByteTrack's association (high-score detections first, then the
+# low-score ones against the remaining tracks) with every step vectorized over
+# all tracks. Costs are NumPy IoU matrices, assignment is lapx's Jonker-Volgenant
+# solver, motion is a constant-velocity Kalman filter on (cx, cy, aspect, h).
+
+logger = logging.getLogger("Tracker")
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of xyxy boxes: (N,4) x (M,4) -> (N,M) float32."""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), np.float32)
+    a = np.asarray(a, np.float32)
+    b = np.asarray(b, np.float32)
+    # Per-axis overlaps and in-place ops: only (N,M) temporaries, no (N,M,2) ones
+    inter = np.minimum(a[:, None, 2], b[None, :, 2])
+    inter -= np.maximum(a[:, None, 0], b[None, :, 0])
+    np.maximum(inter, 0, out=inter)
+    h = np.minimum(a[:, None, 3], b[None, :, 3])
+    h -= np.maximum(a[:, None, 1], b[None, :, 1])
+    np.maximum(h, 0, out=h)
+    inter *= h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :]
+    union -= inter
+    union += 1e-9
+    return np.divide(inter, union, out=inter)
+
+
+def assign(cost, threshold):
+    """
+    Minimum-cost matching with cost < threshold. Returns (matched row, col)
+    index arrays. Pairs that are each other's only candidate are matched
+    directly (an isolated pair is always in the optimum); the solver only
+    sees the rows and columns that compete for something, a small block even
+    when there are hundreds of boxes.
+    """
+    empty = np.empty(0, np.intp)
+    if not cost.size:
+        return empty, empty
+    candidate = cost < threshold
+    row_n = candidate.sum(axis=1)
+    col_n = candidate.sum(axis=0)
+    single = np.flatnonzero(row_n == 1)
+    single_col = candidate[single].argmax(axis=1)
+    isolated = col_n[single_col] == 1
+    rows, cols = single[isolated], single_col[isolated]
+
+    contested = row_n > 0
+    contested[rows] = False
+    sub_rows = np.flatnonzero(contested)
+    if not len(sub_rows):
+        return rows, cols
+    sub_cols = np.flatnonzero(candidate[sub_rows].any(axis=0))
+    _, x, _ = lap.lapjv(cost[np.ix_(sub_rows, sub_cols)].astype(np.float64), extend_cost=True, cost_limit=threshold)
+    hit = np.flatnonzero(x >= 0)
+    return np.concatenate([rows, sub_rows[hit]]), np.concatenate([cols, sub_cols[x[hit]]])
+
+
+def xyxy_to_xyah(boxes):
+    w, h = boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w / np.maximum(h, 1e-6), h], axis=1)
+
+
+def xyah_to_xyxy(xyah):
+    cx, cy, a, h = xyah[:, 0], xyah[:, 1], xyah[:, 2], xyah[:, 3]
+    w = a * h
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+class KalmanBoxFilter:
+    """
+    Constant-velocity Kalman filter on (cx, cy, aspect, h) plus velocities,
+    for many boxes at once: means are (N, 8), covariances (N, 8, 8). Noise
+    scales with the box height (the ByteTrack / DeepSORT parameterization),
+    so small and large objects get the same relative uncertainty.
+    """
+    def __init__(self, std_position=1 / 20, std_velocity=1 / 160):
+        self.std_position = std_position
+        self.std_velocity = std_velocity
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+
+    def _std(self, h, position, velocity, aspect=(1e-2, 1e-5)):
+        # Per-box standard deviations of the 8 state entries
+        std = np.empty((len(h), 8))
+        std[:, [0, 1, 3]] = (position * h)[:, None]
+        std[:, [4, 5, 7]] = (velocity * h)[:, None]
+        std[:, 2], std[:, 6] = aspect
+        return std
+
+    def initiate(self, xyah):
+        mean = np.concatenate([xyah, np.zeros_like(xyah)], axis=1)
+        std = self._std(xyah[:, 3], 2 * self.std_position, 10 * self.std_velocity)
+        return mean, _diag(std ** 2)
+
+    def predict(self, mean, cov):
+        std = self._std(mean[:, 3], self.std_position, self.std_velocity)
+        mean = mean @ self.F.T
+        cov = self.F @ cov @ self.F.T + _diag(std ** 2)
+        return mean, cov
+
+    def update(self, mean, cov, xyah):
+        h = mean[:, 3]
+        r = np.stack([self.std_position * h, self.std_position * h, np.full_like(h, 1e-1), self.std_position * h], axis=1)
+        s = cov[:, :4, :4] + _diag(r ** 2)     # Innovation covariance (N, 4, 4)
+        pht = cov[:, :, :4]                     # P H^T (N, 8, 4)
+        gain = np.linalg.solve(s, pht.transpose(0, 2, 1)).transpose(0, 2, 1) # P H^T S^-1, S is symmetric
+        mean = mean + np.einsum("nij,nj->ni", gain, xyah - mean[:, :4])
+        cov = cov - gain @ s @ gain.transpose(0, 2, 1)
+        return mean, cov
+
+
+def _diag(values):
+    out = np.zeros(values.shape + (values.shape[-1],))
+    idx = np.arange(values.shape[-1])
+    out[..., idx, idx] = values
+    return out
+
+
+class Tracker:
+    """
+    ByteTrack-style tracker for one camera. update(boxes, confs, clss) takes
+    one frame's detections (xyxy, scores, class ids, in order) and returns the
+    confirmed tracks matched in it as (ids, class ids, confs, boxes), the
+    shape DetectorBackend.track() returns. Boxes are the Kalman-filtered ones.
+
+    Per frame:
+      1. predict every track (one batched Kalman step)
+      2. detections >= high_thresh vs. confirmed and lost tracks, cost
+         1 - IoU * score, matched below match_thresh
+      3. the low-score detections (low_thresh..high_thresh) vs. the confirmed
+         tracks still unmatched, cost 1 - IoU below low_match_thresh; tracks
+         still unmatched become lost
+      4. unconfirmed tracks (seen once) vs. the remaining high detections,
+         below new_match_thresh; unmatched ones are dropped
+      5. remaining detections >= new_track_thresh start new tracks (confirmed
+         right away on the first frame, else on their second match)
+      6. tracks lost for more than max_age updates are removed
+
+    State is kept column-wise (one row per track) so every step is a handful
+    of array operations, whatever the number of boxes; ids start at 1.
+    Not thread-safe, frames must come in order.
+    """
+    def __init__(self, high_thresh=0.25, low_thresh=0.1, new_track_thresh=0.25, match_thresh=0.8,
+                 low_match_thresh=0.5, new_match_thresh=0.7, max_age=30, fuse_score=True):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_thresh = match_thresh
+        self.low_match_thresh = low_match_thresh
+        self.new_match_thresh = new_match_thresh
+        self.max_age = max_age
+        self.fuse_score = fuse_score
+        self.kf = KalmanBoxFilter()
+        self.reset()
+
+    def reset(self):
+        self.frame = 0
+        self.next_id = 1
+        self.ids = np.empty(0, np.int64)
+        self.mean = np.empty((0, 8))
+        self.cov = np.empty((0, 8, 8))
+        self.clss = np.empty(0, np.int32)
+        self.confs = np.empty(0, np.float32)
+        self.confirmed = np.empty(0, bool)
+        self.misses = np.empty(0, np.int32) # Updates since the last match, 0 = matched now
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cost(self, rows, boxes, confs, fuse):
+        iou = iou_matrix(xyah_to_xyxy(self.mean[rows, :4]), boxes)
+        if fuse:
+            iou = iou * confs[None, :]
+        return 1.0 - iou
+
+    def update(self, boxes, confs, clss):
+        self.frame += 1
+        boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+        confs = np.asarray(confs, np.float32)
+        clss = np.asarray(clss, np.int32)
+        keep = confs >= self.low_thresh
+        boxes, confs, clss = boxes[keep], confs[keep], clss[keep]
+
+        if len(self.ids):
+            self.mean, self.cov = self.kf.predict(self.mean, self.cov)
+            self.misses += 1
+        det_track = np.full(len(confs), -1, np.intp) # Track row each detection was matched to
+
+        high = np.flatnonzero(confs >= self.high_thresh)
+        low = np.flatnonzero(confs < self.high_thresh)
+
+        # 1st: high-score detections vs. confirmed tracks, lost ones included
+        pool = np.flatnonzero(self.confirmed)
+        r, c = assign(self._cost(pool, boxes[high], confs[high], self.fuse_score), self.match_thresh)
+        det_track[high[c]] = pool[r]
+        pool = np.delete(pool, r)
+        high = np.delete(high, c)
+
+        # 2nd: low-score detections vs. tracks that were tracked last frame and are still unmatched
+        pool = pool[self.misses[pool] == 1]
+        r, c = assign(self._cost(pool, boxes[low], confs[low], False), self.low_match_thresh)
+        det_track[low[c]] = pool[r]
+
+        # 3rd: tentative tracks vs. the leftover high-score detections
+        pool = np.flatnonzero(~self.confirmed)
+        r, c = assign(self._cost(pool, boxes[high], confs[high], self.fuse_score), self.new_match_thresh)
+        det_track[high[c]] = pool[r]
+        high = np.delete(high, c)
+
+        matched = np.flatnonzero(det_track >= 0)
+        rows = det_track[matched]
+        if len(rows):
+            self.mean[rows], self.cov[rows] = self.kf.update(self.mean[rows], self.cov[rows],
+                                                             xyxy_to_xyah(boxes[matched]))
+            self.clss[rows] = clss[matched]
+            self.confs[rows] = confs[matched]
+            self.misses[rows] = 0
+            self.confirmed[rows] = True
+
+        # Drop tentative tracks that missed, and lost tracks past max_age
+        alive = np.where(self.confirmed, self.misses <= self.max_age, self.misses == 0)
+        if not alive.all():
+            self._keep(alive)
+
+        # New tracks from unmatched confident detections
+        new = high[confs[high] >= self.new_track_thresh]
+        if len(new):
+            mean, cov = self.kf.initiate(xyxy_to_xyah(boxes[new]))
+            ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int64)
+            self.next_id += len(new)
+            self.ids = np.concatenate([self.ids, ids])
+            self.mean = np.concatenate([self.mean, mean])
+            self.cov = np.concatenate([self.cov, cov])
+            self.clss = np.concatenate([self.clss, clss[new]])
+            self.confs = np.concatenate([self.confs, confs[new]])
+            self.confirmed = np.concatenate([self.confirmed, np.full(len(new), self.frame == 1)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new), np.int32)])
+
+        out = np.flatnonzero(self.confirmed & (self.misses == 0))
+        return (self.ids[out], self.clss[out], self.confs[out],
+                xyah_to_xyxy(self.mean[out, :4]).astype(np.float32))
+
+    def _keep(self, mask):
+        self.ids = self.ids[mask]
+        self.mean = self.mean[mask]
+        self.cov = self.cov[mask]
+        self.clss = self.clss[mask]
+        self.confs = self.confs[mask]
+        self.confirmed = self.confirmed[mask]
+        self.misses = self.misses[mask]
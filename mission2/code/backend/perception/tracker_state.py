@@ -1,79 +1,380 @@
 import threading
 import time
 import logging
+from collections import OrderedDict
+import numpy as np
+
+from metrics import REGISTRY, TimedLock
+from tracing import to_wall
+
+LOCK_WAIT = REGISTRY.histogram("tracker_lock_wait_seconds", "Time waiting for the TrackerState lock")
+LOCK_HOLD = REGISTRY.histogram("tracker_lock_hold_seconds", "Time the TrackerState lock is held")
+TRACKS = REGISTRY.gauge("tracker_tracks", "Live tracks")
+STABLE_TRACKS = REGISTRY.gauge("tracker_stable_tracks", "Stable tracks (served on /objects)")
+
+
+class TrackEvents:
+    """
+    The (event_type, data) list handed to listeners for one batch of track
+    changes. It holds copies of the changed columns and only builds the
+    per-track dicts when iterated, once, outside the state lock: listeners
+    that don't look at the payload (EventHub with no clients, VersionWaiter)
+    cost nothing per track.
+    """
+    def __init__(self, kinds, track_ids, labels, scores, boxes, logged, cameras, frame_ids, captured_at):
+        self.kinds = kinds
+        self.columns = (track_ids, labels, scores, boxes, logged, cameras, frame_ids, captured_at)
+        self._items = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        if self._items is None:
+            track_ids, labels, scores, boxes, logged, cameras, frame_ids, captured_at = self.columns
+            track_ids = np.asarray(track_ids).tolist()
+            scores = np.asarray(scores).tolist()
+            boxes = np.asarray(boxes).tolist()
+            logged = np.asarray(logged).tolist()
+            frame_ids = np.asarray(frame_ids).tolist()
+            captured = np.round(to_wall(np.asarray(captured_at)), 3).tolist()
+            self._items = [(kind, {
+                'id': int(track_ids[i]),
+                'name': str(labels[i]),
+                'confidence': float(scores[i]),
+                'box': boxes[i],
+                'logged': bool(logged[i]),
+                'camera': cameras[i],
+                'frame_id': int(frame_ids[i]),
+                'captured_at': captured[i]
+            }) for i, kind in enumerate(self.kinds)]
+        return iter(self._items)
+
 
 class TrackerState:
-    def __init__(self):
-        self.lock = threading.Lock()
-        # Storage: { track_id: { 'label': str, 'score': float, 'box': [], 'last_seen': ts, 'count': int } }
-        self.tracked_objects = {}
+    """
+    Columnar store of tracked objects.
+
+    Each track owns a slot in preallocated NumPy arrays (box/score/last_seen/
+    count/logged); `slot_of` maps track_id -> slot and freed slots are reused.
+    `expiry` keeps track ids ordered by last_seen, so prune() only touches the
+    tracks that actually expired. The set of stable tracks (seen >= min_seen_count
+    times) is maintained incrementally and get_stable_objects() serves a snapshot
+    that is only rebuilt when `version` changes.
+
+    With several cameras every track also records the camera it was seen by
+    (track ids are namespaced per camera by the perception loop), and
+    snapshots can be filtered by camera.
+
+    Each track keeps the id and capture time (time.monotonic()) of the frame
+    it was last seen in; snapshots and events give them as `frame_id` and
+    `captured_at` (epoch seconds) so clients can tell how old a box is.
+    """
+    def __init__(self, capacity=256, min_seen_count=5):
+        self.lock = TimedLock(LOCK_WAIT, LOCK_HOLD)
         self.logger = logging.getLogger("TrackerState")
+        self.min_seen_count = min_seen_count
+
+        self.capacity = 0
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.scores = np.empty(0, dtype=np.float64)
+        self.last_seen = np.empty(0, dtype=np.float64)
+        self.captured_at = np.empty(0, dtype=np.float64) # Capture time (monotonic) of the last sighting's frame
+        self.frame_ids = np.empty(0, dtype=np.int64)     # ... and its frame id
+        self.counts = np.empty(0, dtype=np.int32)
+        self.logged = np.empty(0, dtype=bool)
+        self.labels = []
+        self.cameras = []
+        self.free_slots = []
+        self._grow(capacity)
+
+        self.slot_of = {}              # track_id -> slot
+        self.expiry = OrderedDict()    # track_id -> None, oldest last_seen first
+        self.stable = OrderedDict()    # track_id -> None, in order they became stable
+
+        # Bumped on every change visible through get_stable_objects();
+        # `changed` wakes long-polling readers (see wait_for_change)
+        self.version = 0
+        self.changed = threading.Condition(self.lock)
+        self._snapshot = (0, []) # (version, stable objects), swapped atomically
+        self._camera_snapshots = {} # camera -> (version, stable objects of that camera)
+
+        # Delta listeners, e.g. the API's event hub (see add_listener)
+        self.listeners = []
+        TRACKS.set_function(self.__len__)
+        STABLE_TRACKS.set_function(lambda: len(self.stable))
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _grow(self, new_capacity):
+        old = self.capacity
+        extra = new_capacity - old
+        self.track_ids = np.concatenate([self.track_ids, np.full(extra, -1, dtype=np.int64)])
+        self.boxes = np.concatenate([self.boxes, np.zeros((extra, 4), dtype=np.float32)])
+        self.scores = np.concatenate([self.scores, np.zeros(extra, dtype=np.float64)])
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(extra, dtype=np.float64)])
+        self.captured_at = np.concatenate([self.captured_at, np.zeros(extra, dtype=np.float64)])
+        self.frame_ids = np.concatenate([self.frame_ids, np.zeros(extra, dtype=np.int64)])
+        self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int32)])
+        self.logged = np.concatenate([self.logged, np.zeros(extra, dtype=bool)])
+        self.labels.extend([None] * extra)
+        self.cameras.extend([None] * extra)
+        # Pop from the end -> lowest slots get used first
+        self.free_slots.extend(range(new_capacity - 1, old - 1, -1))
+        self.capacity = new_capacity
+
+    def _alloc(self, track_id, label, camera=None):
+        # Caller holds the lock
+        if not self.free_slots:
+            self._grow(max(16, self.capacity * 2))
+        slot = self.free_slots.pop()
+        self.slot_of[track_id] = slot
+        self.track_ids[slot] = track_id
+        self.labels[slot] = label
+        self.cameras[slot] = camera
+        self.counts[slot] = 0
+        self.logged[slot] = False
+        return slot
+
+    def _touch(self, track_id, slot, now):
+        # Caller holds the lock. Returns True if the track just became stable.
+        self.last_seen[slot] = now
+        self.counts[slot] += 1
+        self.expiry[track_id] = None
+        self.expiry.move_to_end(track_id)
+        if track_id in self.stable:
+            self.version += 1
+        elif self.counts[slot] >= self.min_seen_count:
+            self.stable[track_id] = None
+            self.version += 1
+            return True
+        return False
+
+    def add_listener(self, callback):
+        """
+        Register callback(events) for deltas; events is an iterable of (event_type, data):
+        track.appeared / track.updated / track.stable / track.pruned / track.logged.
+        Called outside the lock, from the thread that made the change.
+        """
+        self.listeners.append(callback)
+
+    def _emit(self, events):
+        for callback in self.listeners:
+            try:
+                callback(events)
+            except Exception as e:
+                self.logger.error(f"Listener error: {e}")
+
+    def _events(self, kinds, track_ids, slots):
+        # Caller holds the lock. Copies the changed columns only, payloads are built later.
+        return TrackEvents(kinds, np.array(track_ids, np.int64), [self.labels[s] for s in slots], self.scores[slots],
+                           self.boxes[slots], self.logged[slots], [self.cameras[s] for s in slots],
+                           self.frame_ids[slots], self.captured_at[slots])
 
     def update(self, track_id, label, score, box, max_history=30):
         """
         Update or add a tracked object.
         """
+        self.update_batch(np.array([int(track_id)]), [label], np.array([score]), np.array([box]))
+
+    def update_batch(self, track_ids, labels, scores, boxes, camera=None, captured_at=None, frame_id=0):
+        """
+        Apply a whole frame's detections under a single lock acquisition.
+        Arguments are parallel sequences (NumPy arrays from the detector);
+        `camera` names the camera the frame came from, `frame_id` and
+        `captured_at` (time.monotonic(), defaults to now) identify the frame.
+        """
+        events = []
+        with self.lock:
+            now = time.monotonic()
+            version = self.version
+            slots = np.empty(len(track_ids), dtype=np.intp)
+            kinds = []
+            for i, track_id in enumerate(track_ids.tolist()):
+                slot = self.slot_of.get(track_id)
+                kind = "track.updated"
+                if slot is None:
+                    slot = self._alloc(track_id, labels[i], camera)
+                    kind = "track.appeared"
+                slots[i] = slot
+                if self._touch(track_id, slot, now):
+                    kind = "track.stable"
+                kinds.append(kind)
+            self.scores[slots] = scores # Update confidence
+            self.boxes[slots] = boxes   # Update position, for now just replace
+            self.captured_at[slots] = captured_at if captured_at is not None else now
+            self.frame_ids[slots] = frame_id
+            if self.version != version:
+                self.changed.notify_all()
+            if self.listeners:
+                events = self._events(kinds, track_ids, slots)
+        if events:
+            self._emit(events)
+
+    def update_boxes(self, track_ids, boxes, captured_at=None, frame_id=0):
+        """
+        Move existing tracks to positions estimated between detector runs (see
+        perception.propagation). Not a sighting: counts and scores stay, ids
+        that were pruned meanwhile are ignored; last_seen, the frame id and
+        capture time are refreshed like for a detection.
+        """
+        events = []
+        with self.lock:
+            now = time.monotonic()
+            rows, slots, ids = [], [], []
+            for i, track_id in enumerate(track_ids.tolist()):
+                slot = self.slot_of.get(track_id)
+                if slot is None:
+                    continue
+                rows.append(i)
+                slots.append(slot)
+                ids.append(track_id)
+                self.expiry.move_to_end(track_id)
+            if not slots:
+                return
+            self.boxes[slots] = boxes[rows]
+            self.last_seen[slots] = now
+            self.captured_at[slots] = captured_at if captured_at is not None else now
+            self.frame_ids[slots] = frame_id
+            if any(track_id in self.stable for track_id in ids):
+                self.version += 1
+                self.changed.notify_all()
+            if self.listeners:
+                events = self._events(["track.updated"] * len(ids), ids, slots)
+        if events:
+            self._emit(events)
+
+    def keep_alive(self, track_ids):
+        """
+        Refresh last_seen of existing tracks for a frame the detector skipped
+        (nothing moved). Not a sighting: counts, boxes and version are unchanged,
+        it only stops prune() from expiring objects that are still in view.
+        """
+        with self.lock:
+            now = time.monotonic()
+            for track_id in track_ids:
+                slot = self.slot_of.get(track_id)
+                if slot is not None:
+                    self.last_seen[slot] = now
+                    self.expiry.move_to_end(track_id)
+
+    def pending(self, track_ids):
+        """Number of these tracks that are live but not stable yet."""
         with self.lock:
-            now = time.time()
-            if track_id in self.tracked_objects:
-                obj = self.tracked_objects[track_id]
-                obj['last_seen'] = now
-                obj['count'] += 1
-                obj['score'] = score # Update confidence
-                obj['box'] = box     # Update position
-                # We could do moving average on box if needed, for now just replace
-            else:
-                self.tracked_objects[track_id] = {
-                    'label': label,
-                    'score': score,
-                    'box': box,
-                    'last_seen': now,
-                    'count': 1,
-                    'logged': False # Flag to check if already added to inventory
-                }
-    
+            return sum(1 for tid in track_ids if tid in self.slot_of and tid not in self.stable)
+
+    def _remove(self, track_id):
+        # Caller holds the lock
+        slot = self.slot_of.pop(track_id)
+        self.expiry.pop(track_id, None)
+        if track_id in self.stable:
+            del self.stable[track_id]
+            self.version += 1
+        self.track_ids[slot] = -1
+        self.labels[slot] = None
+        self.cameras[slot] = None
+        self.free_slots.append(slot)
+
     def prune(self, max_age_seconds=3.0):
         """
         Remove objects not seen for max_age_seconds.
+        Only expired tracks are visited (expiry is ordered by last_seen).
         """
+        pruned = []
         with self.lock:
-            now = time.time()
-            to_remove = []
-            for tid, obj in self.tracked_objects.items():
-                if now - obj['last_seen'] > max_age_seconds:
-                    to_remove.append(tid)
-            
-            for tid in to_remove:
-                del self.tracked_objects[tid]
-                # self.logger.debug(f"Pruned object {tid}")
+            cutoff = time.monotonic() - max_age_seconds
+            version = self.version
+            while self.expiry:
+                track_id = next(iter(self.expiry))
+                if self.last_seen[self.slot_of[track_id]] >= cutoff:
+                    break
+                self._remove(track_id)
+                pruned.append(track_id)
+                # self.logger.debug(f"Pruned object {track_id}")
+            if self.version != version:
+                self.changed.notify_all()
+        if pruned and self.listeners:
+            self._emit([("track.pruned", {'id': int(tid)}) for tid in pruned])
+
+    def _build_snapshot(self, track_ids):
+        # Caller holds the lock
+        slots = [self.slot_of[tid] for tid in track_ids]
+        boxes = self.boxes[slots].tolist()
+        scores = self.scores[slots].tolist()
+        logged = self.logged[slots].tolist()
+        frame_ids = self.frame_ids[slots].tolist()
+        captured = np.round(self.captured_at[slots] + (time.time() - time.monotonic()), 3).tolist()
+        return [{
+            'id': int(tid),
+            'name': str(self.labels[slot]),
+            'confidence': scores[i],
+            'box': boxes[i],
+            'logged': logged[i],
+            'camera': self.cameras[slot],
+            'frame_id': frame_ids[i],
+            'captured_at': captured[i]
+        } for i, (tid, slot) in enumerate(zip(track_ids, slots))]
 
-    def get_stable_objects(self, min_seen_count=5):
+    def get_stable_snapshot(self, camera=None):
+        """Return (version, stable objects) as one consistent pair, optionally of one camera only."""
+        snapshot = self._snapshot
+        if snapshot[0] != self.version:
+            with self.lock:
+                if self._snapshot[0] != self.version:
+                    self._snapshot = (self.version, self._build_snapshot(list(self.stable)))
+                snapshot = self._snapshot
+        if camera is None:
+            return snapshot
+        # Filtered views are derived from the full snapshot, also once per version
+        cached = self._camera_snapshots.get(camera)
+        if cached is None or cached[0] != snapshot[0]:
+            cached = (snapshot[0], [obj for obj in snapshot[1] if obj['camera'] == camera])
+            self._camera_snapshots[camera] = cached
+        return cached
+
+    def wait_for_change(self, since, timeout):
+        """Block until version > since or timeout. Returns the current version."""
+        with self.lock:
+            self.changed.wait_for(lambda: self.version > since, timeout)
+            return self.version
+
+    def get_stable_objects(self, min_seen_count=None, camera=None):
         """
-        Return list of objects that have been seen consistently.
+        Return list of objects that have been seen consistently (by `camera`, if given).
+        The returned list is a shared snapshot, treat it as read-only.
         """
-        with self.lock:
-            stable = []
-            for tid, obj in self.tracked_objects.items():
-                if obj['count'] >= min_seen_count:
-                    stable.append({
-                        'id': int(tid),
-                        'name': str(obj['label']),
-                        'confidence': float(obj['score']),
-                        'box': [float(c) for c in obj['box']], # Cast box coords too
-                        'logged': bool(obj.get('logged', False))
-                    })
-            return stable
+        if min_seen_count is not None and min_seen_count != self.min_seen_count:
+            # Non-default threshold: no maintained set for it, scan the live slots
+            with self.lock:
+                ids = [tid for tid, slot in self.slot_of.items() if self.counts[slot] >= min_seen_count
+                       and (camera is None or self.cameras[slot] == camera)]
+                return self._build_snapshot(ids)
+
+        return self.get_stable_snapshot(camera)[1]
 
     def mark_logged(self, track_id):
         """
         Mark an object as logged to inventory.
         """
         with self.lock:
-            if track_id in self.tracked_objects:
-                self.tracked_objects[track_id]['logged'] = True
-                return {
-                    'label': self.tracked_objects[track_id]['label'],
-                    'box': self.tracked_objects[track_id]['box'],
-                    'score': self.tracked_objects[track_id]['score']
-                }
-            return None
+            slot = self.slot_of.get(track_id)
+            if slot is None:
+                return None
+            self.logged[slot] = True
+            if track_id in self.stable:
+                self.version += 1
+                self.changed.notify_all()
+            result = {
+                'label': self.labels[slot],
+                'box': self.boxes[slot].tolist(),
+                'score': float(self.scores[slot]),
+                'camera': self.cameras[slot],
+                'frame_id': int(self.frame_ids[slot]),
+                'captured': float(self.captured_at[slot]) # monotonic, for latency accounting
+            }
+            events = self._events(["track.logged"], [track_id], [slot]) if self.listeners else None
+        if events:
+            self._emit(events)
+        return result
@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+
+# On-demand sampling profiler for all threads of this process. Standard library
+# only: a sampler thread reads sys._current_frames() `hz` times a second, so
+# nothing runs (or is imported) until a profile is requested.
+
+logger = logging.getLogger("Profiler")
+
+
+def thread_cpu_time(ident):
+    """CPU seconds used so far by the thread with this threading ident (None if unsupported)."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack for `seconds` and aggregates them into
+    collapsed stacks ("thread;outer:fn;...;inner:fn count", the input format of
+    flamegraph.pl and speedscope), plus CPU time per thread over the window.
+
+    mode="cpu" only counts a thread's sample if it was on the CPU for at least
+    `min_busy` of the time since the previous sample (so threads parked in
+    queue.get / Condition.wait, waking briefly now and then, don't drown the
+    flamegraph); mode="wall" counts every sample, to see where threads block.
+    Thread names are kept and numbered pool threads (api-storage_0, ...) are
+    folded into one name.
+
+    Only one profile runs at a time; run() blocks for `seconds`.
+    """
+    _busy = threading.Lock()
+
+    def __init__(self, seconds=5.0, hz=100, mode="cpu", max_depth=64, min_busy=0.1):
+        if mode not in ("cpu", "wall"):
+            raise ValueError(f"Unknown profile mode {mode}")
+        self.seconds = seconds
+        self.interval = 1.0 / hz
+        self.mode = mode
+        self.max_depth = max_depth
+        self.min_busy = min_busy
+        self.stacks = Counter()
+        self.samples = Counter() # thread name -> samples counted
+        self.ticks = 0
+
+    @staticmethod
+    def _thread_name(thread):
+        name = thread.name if thread else "unknown"
+        # ThreadPoolExecutor workers are "<prefix>_<n>"
+        prefix, _, suffix = name.rpartition("_")
+        return prefix if prefix and suffix.isdigit() else name
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    @classmethod
+    def running(cls):
+        return cls._busy.locked()
+
+    def run(self):
+        """Profile for `seconds`; returns the result dict, or None if another profile is running."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            return self._run()
+        finally:
+            self._busy.release()
+
+    def _run(self):
+        logger.info(f"Profiling all threads for {self.seconds:.1f}s at {1 / self.interval:.0f} Hz ({self.mode})")
+        me = threading.get_ident()
+        cpu_start, cpu_last = {}, {}
+        own_cpu, process_cpu = thread_cpu_time(me), time.process_time()
+        wall_start = time.monotonic()
+        deadline = wall_start + self.seconds
+        next_tick = last_tick = wall_start
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            busy_threshold = (now - last_tick) * self.min_busy
+            last_tick = now
+            threads = {t.ident: t for t in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                cpu = thread_cpu_time(ident)
+                if cpu is not None:
+                    cpu_start.setdefault(ident, cpu)
+                    previous = cpu_last.get(ident)
+                    cpu_last[ident] = cpu
+                    if self.mode == "cpu" and (previous is None or cpu - previous < busy_threshold):
+                        continue
+                name = self._thread_name(threads.get(ident))
+                self.stacks[f"{name};{self._stack(frame)}"] += 1
+                self.samples[name] += 1
+            del frames, frame # Don't keep other threads' frames alive while sleeping
+            self.ticks += 1
+            next_tick += self.interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+        elapsed = time.monotonic() - wall_start
+
+        # Per-thread CPU over the window (threads that exited meanwhile keep their last reading)
+        threads = {t.ident: t for t in threading.enumerate()}
+        cpu_by_thread = Counter()
+        for ident, start in cpu_start.items():
+            end = thread_cpu_time(ident) if ident in threads else None
+            cpu_by_thread[self._thread_name(threads.get(ident))] += (end if end is not None else cpu_last[ident]) - start
+        process_cpu = time.process_time() - process_cpu
+        own_cpu = thread_cpu_time(me) - own_cpu if own_cpu is not None else None
+        return {
+            "seconds": round(elapsed, 3),
+            "mode": self.mode,
+            "hz": round(self.ticks / elapsed, 1) if elapsed else 0.0,
+            "threads": [{"name": name, "cpu_s": round(cpu, 4), "cpu_pct": round(100 * cpu / elapsed, 1),
+                         "samples": self.samples.get(name, 0)}
+                        for name, cpu in cpu_by_thread.most_common()],
+            "process_cpu_s": round(process_cpu, 3),
+            "profiler_cpu_s": round(own_cpu, 4) if own_cpu is not None else None, # The sampler's own cost
+            "collapsed": self.collapsed()
+        }
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+if __name__ == "__main__":
+    # Profile this process doing some busy work, e.g. to check the output format
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--mode", default="cpu")
+    args = parser.parse_args()
+
+    def spin():
+        while True:
+            sum(i * i for i in range(10000))
+
+    threading.Thread(target=spin, name="spin", daemon=True).start()
+    result = SamplingProfiler(args.seconds, mode=args.mode).run()
+    print(result["collapsed"])
+    for thread in result["threads"]:
+        print(thread)
@@ -0,0 +1,67 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+PENDING, STARTING, READY, FAILED = "pending", "starting", "ready", "failed"
+
+
+class Readiness:
+    """
+    Per-subsystem startup state (camera, model, perception, ...) plus one-off
+    milestones (first frame, first detection, ...) timed from process start.
+    Served by /ready and /status so clients can tell "still loading" from "broken".
+    """
+    def __init__(self, subsystems=()):
+        self.t0 = time.monotonic()
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("Startup")
+        self.subsystems = OrderedDict((name, {"state": PENDING, "error": None, "ready_s": None})
+                                      for name in subsystems)
+        self.milestones = OrderedDict()
+
+    def elapsed(self):
+        return round(time.monotonic() - self.t0, 3)
+
+    def _set(self, name, state, error=None):
+        with self.lock:
+            entry = self.subsystems.setdefault(name, {"state": PENDING, "error": None, "ready_s": None})
+            entry["state"] = state
+            entry["error"] = error
+            if state == READY and entry["ready_s"] is None:
+                entry["ready_s"] = self.elapsed()
+
+    def starting(self, name):
+        self._set(name, STARTING)
+
+    def ready(self, name):
+        self._set(name, READY)
+        self.logger.info(f"{name} ready after {self.elapsed():.2f}s")
+
+    def failed(self, name, error):
+        self._set(name, FAILED, str(error))
+        self.logger.error(f"{name} failed: {error}")
+
+    def is_ready(self, *names):
+        with self.lock:
+            names = names or list(self.subsystems)
+            return all(self.subsystems.get(n, {}).get("state") == READY for n in names)
+
+    def milestone(self, name):
+        """Record the first time `name` happens (later calls are ignored)."""
+        if name in self.milestones:
+            return
+        with self.lock:
+            if name in self.milestones:
+                return
+            self.milestones[name] = self.elapsed()
+        self.logger.info(f"Startup milestone {name} at {self.milestones[name]:.2f}s")
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "ready": all(s["state"] == READY for s in self.subsystems.values()),
+                "uptime_s": self.elapsed(),
+                "subsystems": {name: dict(entry) for name, entry in self.subsystems.items()},
+                "milestones": dict(self.milestones)
+            }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the backend modules the way main.py does (from logic..., perception...)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,75 @@
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from api import create_app
+from logic.inventory import InventoryManager
+from logic.inventory_store import SqliteInventoryStore
+from perception.tracker_state import TrackerState
+
+
+@pytest.fixture
+def tracker_state():
+    return TrackerState(min_seen_count=1)
+
+
+@pytest.fixture
+def client(tmp_path, tracker_state):
+    inventory = InventoryManager(SqliteInventoryStore(str(tmp_path / "inventory.db")), write_behind=False)
+    with TestClient(create_app(tracker_state, inventory)) as client:
+        yield client
+    inventory.close()
+
+
+def see(tracker_state, track_id=1):
+    tracker_state.update_batch(np.array([track_id]), ["milk"], np.array([0.9]),
+                               np.array([[10.0, 20.0, 30.0, 40.0]]))
+
+
+def test_objects_etag_and_since(client, tracker_state):
+    see(tracker_state)
+    first = client.get("/objects")
+    assert [obj["id"] for obj in first.json()] == [1]
+    version = int(first.headers["X-Version"])
+    assert client.get("/objects", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    # Nothing newer than `since`: 304 once the wait times out
+    assert client.get("/objects", params={"since": version, "wait": 0.05}).status_code == 304
+
+
+def test_objects_long_poll_wakes_on_change(client, tracker_state):
+    see(tracker_state)
+    version = int(client.get("/objects").headers["X-Version"])
+    threading.Timer(0.1, see, (tracker_state, 2)).start()
+    response = client.get("/objects", params={"since": version, "wait": 5})
+    assert response.status_code == 200
+    assert sorted(obj["id"] for obj in response.json()) == [1, 2]
+
+
+def test_inventory_etag(client):
+    client.post("/inventory/add", json={"name": "Milk", "category": "dairy"})
+    first = client.get("/inventory")
+    assert first.status_code == 200
+    assert [i["name"] for i in first.json()] == ["Milk"]
+    etag = first.headers["ETag"]
+    assert client.get("/inventory", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/inventory/add", json={"name": "Milk", "category": "dairy"})
+    second = client.get("/inventory", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.json()[0]["qty"] == 2
+
+
+def test_inventory_delete_by_name(client):
+    client.post("/inventory/add", json={"name": "Milk", "category": "dairy"})
+    client.post("/inventory/add", json={"name": "Bread", "category": "bakery"})
+    assert client.delete("/inventory/delete", params={"item_name": "milk"}).json() == {"success": True}
+    assert client.delete("/inventory/delete", params={"item_name": "milk"}).json() == {"success": False}
+    assert [i["name"] for i in client.get("/inventory").json()] == ["Bread"]
+
+
+def test_inventory_clear(client):
+    client.post("/inventory/add", json={"name": "Milk", "category": "dairy"})
+    assert client.post("/inventory/clear").status_code == 200
+    assert client.get("/inventory").json() == []
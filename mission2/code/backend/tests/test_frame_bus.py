@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pytest
+
+from perception.frame_bus import FrameBus
+
+
+def test_publish_and_read_back():
+    bus = FrameBus((4, 4, 3), slots=4)
+    assert bus.latest() is None
+    frame_id = bus.publish(np.full((4, 4, 3), 7, np.uint8), timestamp=1.5)
+    packet = bus.latest()
+    assert packet.frame_id == frame_id == 1 and packet.timestamp == 1.5
+    assert (packet.frame == 7).all()
+    with pytest.raises(ValueError):
+        packet.frame[0, 0, 0] = 1 # Readers get read-only views
+    with pytest.raises(ValueError):
+        bus.publish(np.zeros((2, 2, 3), np.uint8))
+
+
+def test_transform_writes_into_the_slot():
+    bus = FrameBus((2, 2), slots=2)
+    bus.publish(np.ones((2, 2), np.uint8), transform=lambda src, dst: np.multiply(src, 3, out=dst))
+    assert (bus.latest().frame == 3).all()
+
+
+def test_old_slots_are_reused():
+    bus = FrameBus((1,), slots=3)
+    for i in range(1, 6):
+        bus.publish(np.array([i], np.uint8))
+    assert bus.get(5).frame[0] == 5
+    assert bus.get(4).frame[0] == 4
+    assert bus.get(1) is None # Overwritten by frame 4
+    assert bus.is_current(5) and not bus.is_current(2)
+
+
+def test_wait_next():
+    bus = FrameBus((1,), slots=2)
+    assert bus.wait_next(0, timeout=0.01) is None
+    threading.Timer(0.05, bus.publish, (np.array([9], np.uint8),)).start()
+    packet = bus.wait_next(0, timeout=2.0)
+    assert packet.frame_id == 1 and packet.frame[0] == 9
+
+
+def test_shared_bus_attach():
+    bus = FrameBus((2, 2), slots=2, shared=True)
+    try:
+        reader = FrameBus.attach(bus.name, (2, 2), slots=2)
+        bus.publish(np.full((2, 2), 5, np.uint8))
+        assert (reader.wait_next(0, timeout=1.0).frame == 5).all()
+        reader.close()
+    finally:
+        bus.close()
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_readers_get_none_after_close(shared):
+    bus = FrameBus((2, 2), slots=2, shared=shared)
+    bus.publish(np.zeros((2, 2), np.uint8))
+    waiting = []
+    reader = threading.Thread(target=lambda: waiting.append(bus.wait_next(1, timeout=5.0)))
+    reader.start()
+    bus.close()
+    reader.join(2.0)
+    assert waiting == [None] # Woken by close, not the timeout
+    assert bus.latest() is None and bus.get(1) is None
+    assert bus.wait_next(0, timeout=0.01) is None
+    assert not bus.is_current(1)
+    with pytest.raises(ValueError):
+        bus.publish(np.zeros((2, 2), np.uint8))
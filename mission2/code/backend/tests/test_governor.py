@@ -0,0 +1,55 @@
+from perception.governor import PerceptionGovernor
+
+
+def rate(governor, infer_ms=10.0, seconds=10.0, step=1 / 240, start=0.0):
+    """Inferences admitted per second when offered a frame every `step` seconds."""
+    governor.frames_admitted = 0
+    now = start
+    while now < start + seconds:
+        if governor.due(now):
+            governor.started(now)
+            governor.record(infer_ms)
+        now += step
+    return governor.frames_admitted / seconds
+
+
+def test_idle_defaults_keep_camera_rate_for_fast_models():
+    governor = PerceptionGovernor(adjust_interval=0.5, load_fn=lambda: 0.0)
+    assert rate(governor) > 25 # 10 ms at 50% duty still allows active_fps (30)
+    assert governor.budget == governor.budget_ms
+
+
+def test_idle_duty_paces_slow_models():
+    governor = PerceptionGovernor(adjust_interval=0.5, load_fn=lambda: 0.0)
+    assert 9 <= rate(governor, infer_ms=50.0) <= 11 # 50 ms at 50% duty -> ~10 FPS
+
+
+def test_idle_backs_off_under_load_by_default():
+    load = [2.0]
+    scanning = [False]
+    governor = PerceptionGovernor(adjust_interval=0.5, priority=lambda: scanning[0], load_fn=lambda: load[0])
+    assert 13 <= rate(governor) <= 17 # Half of active_fps
+    assert governor.budget == governor.budget_ms / 2
+    assert governor.stats()["mode"] == "idle"
+    # A scan gets full rate regardless of load
+    scanning[0] = True
+    assert rate(governor, start=10.0) > 25
+    assert governor.budget == governor.budget_ms
+    # Idle again on a quiet machine
+    scanning[0], load[0] = False, 0.1
+    assert rate(governor, start=20.0) > 25
+
+
+def test_idle_limits_when_configured():
+    scanning = [False]
+    governor = PerceptionGovernor(idle_fps=5.0, idle_duty=0.3, adjust_interval=0.5,
+                                  priority=lambda: scanning[0], load_fn=lambda: 0.0)
+    assert 4 <= rate(governor) <= 6
+    scanning[0] = True
+    assert rate(governor, start=10.0) > 25
+
+
+def test_size_steps_down_over_budget():
+    governor = PerceptionGovernor(sizes=(640, 320), budget_ms=50.0, adjust_interval=0.5)
+    rate(governor, infer_ms=100.0, seconds=2.0)
+    assert governor.imgsz == 320
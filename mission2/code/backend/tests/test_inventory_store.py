@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+from logic import inventory_db
+from logic.inventory import InventoryManager
+from logic.inventory_store import JsonInventoryStore, SqliteInventoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteInventoryStore(str(tmp_path / "inventory.db"))
+    yield store
+    store.close()
+
+
+def test_add_item_merges_names_case_insensitively(store):
+    store.add_item("Apple", "fruit", 2, pose={"x": 1})
+    item = store.add_item(" apple ", "fruit", 3)
+    assert item["qty"] == 5
+    assert item["pose"] == {"x": 1}
+    assert len(store.get_all_items()) == 1
+
+
+def test_add_items_batch(store):
+    store.add_item("apple", "fruit")
+    items = store.add_items([
+        {"name": "apple", "category": "fruit", "qty": 4, "pose": None, "timestamp": "t"},
+        {"name": "milk", "category": "dairy", "qty": 1, "pose": None, "timestamp": "t"},
+    ])
+    assert [(i["name"], i["qty"]) for i in items] == [("apple", 5), ("milk", 1)]
+
+
+def test_update_and_delete(store):
+    item = store.add_item("apple", "fruit")
+    assert store.update_item_qty("APPLE", 7)["qty"] == 7
+    assert store.update_item_qty("pear", 1) is None
+    assert store.delete_item_by_id(item["id"])
+    assert not store.delete_item("apple")
+    assert store.get_all_items() == []
+
+
+def test_migrate_from_json(store, tmp_path):
+    path = tmp_path / "inventory_db.json"
+    path.write_text(json.dumps([
+        {"id": 1, "name": "Apple", "category": "fruit", "qty": 2, "timestamp": "t", "pose": {"x": 1}},
+        {"id": 2, "name": "apple", "category": "fruit", "qty": 3, "timestamp": "t", "pose": None},
+        {"id": 3, "name": "Milk", "category": "dairy", "qty": 1, "timestamp": "t", "pose": None},
+    ]))
+    assert store.migrate_from_json(str(path)) == 3
+    items = {i["name"]: i for i in store.get_all_items()}
+    assert items["Apple"]["id"] == 1 and items["Apple"]["qty"] == 5
+    assert items["Milk"]["id"] == 3
+    # Only once per SQLite file
+    assert store.migrate_from_json(str(path)) == 0
+
+
+def test_migrate_from_json_with_duplicate_ids(store, tmp_path):
+    # The legacy store numbered items len(db) + 1, so ids repeat after a delete
+    path = tmp_path / "inventory_db.json"
+    path.write_text(json.dumps([
+        {"id": 1, "name": "apple", "category": "fruit", "qty": 1, "timestamp": "t", "pose": None},
+        {"id": 2, "name": "milk", "category": "dairy", "qty": 2, "timestamp": "t", "pose": None},
+        {"id": 2, "name": "bread", "category": "bakery", "qty": 3, "timestamp": "t", "pose": None},
+    ]))
+    assert store.migrate_from_json(str(path)) == 3
+    items = {i["name"]: i for i in store.get_all_items()}
+    assert items["milk"]["id"] == 2
+    assert items["bread"]["id"] not in (1, 2)
+    assert items["bread"]["qty"] == 3
+
+
+def test_write_behind_coalesces_increments(store):
+    manager = InventoryManager(store=store, write_behind=True, flush_interval_ms=10_000)
+    try:
+        manager.log_item("apple", "fruit") # Unknown item: written through to get an id
+        for _ in range(5):
+            manager.log_item("apple", "fruit")
+        # Cache shows the increments before they reach the store
+        assert manager.get_inventory()[0]["qty"] == 6
+        assert store.get_all_items()[0]["qty"] == 1
+        manager.flush()
+        assert store.get_all_items()[0]["qty"] == 6
+        assert manager.get_inventory()[0]["qty"] == 6
+    finally:
+        manager.close()
+
+
+class RacingStore(SqliteInventoryStore):
+    """Logs another sighting right before each delete/clear, i.e. after the manager's flush."""
+    manager = None
+
+    def _sighting(self):
+        self.manager.log_item("apple", "fruit")
+
+    def delete_item_by_id(self, item_id):
+        self._sighting()
+        return super().delete_item_by_id(item_id)
+
+    def delete_item(self, item_name):
+        self._sighting()
+        return super().delete_item(item_name)
+
+    def clear(self):
+        self._sighting()
+        super().clear()
+
+
+@pytest.mark.parametrize("delete", [
+    lambda manager, item: manager.delete_item(item["id"]),
+    lambda manager, item: manager.delete_item_by_name("Apple"),
+    lambda manager, item: manager.clear(),
+])
+def test_increment_queued_during_delete_is_dropped(tmp_path, delete):
+    store = RacingStore(str(tmp_path / "inventory.db"))
+    manager = InventoryManager(store=store, write_behind=True, flush_interval_ms=10_000)
+    store.manager = manager
+    try:
+        item = manager.log_item("apple", "fruit")
+        manager.log_item("apple", "fruit")
+        delete(manager, item)
+        manager.flush()
+        assert manager._pending_ops == 0
+        assert manager.get_inventory() == []
+        assert store.get_all_items() == []
+    finally:
+        manager.close()
+
+
+def test_migrate_ids_of_merged_and_fresh_rows(store, tmp_path):
+    path = tmp_path / "inventory_db.json"
+    path.write_text(json.dumps([
+        {"id": 1, "name": "apple", "category": "fruit", "qty": 1, "timestamp": "t", "pose": None},
+        {"id": 2, "name": "Apple", "category": "fruit", "qty": 1, "timestamp": "t", "pose": None},
+        {"id": 2, "name": "milk", "category": "dairy", "qty": 1, "timestamp": "t", "pose": None},
+        {"id": 1, "name": "bread", "category": "bakery", "qty": 1, "timestamp": "t", "pose": None},
+        {"id": 3, "name": "eggs", "category": "dairy", "qty": 1, "timestamp": "t", "pose": None},
+    ]))
+    assert store.migrate_from_json(str(path)) == 5
+    items = {i["name"]: i for i in store.get_all_items()}
+    assert items["apple"]["id"] == 1 and items["apple"]["qty"] == 2
+    assert items["milk"]["id"] == 2 # "Apple" merged into apple, it never took id 2
+    # bread's fresh id (3) is taken when eggs, carrying 3, comes in
+    assert len({i["id"] for i in items.values()}) == 4
+
+
+def test_json_store_matches_names_like_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(inventory_db, "DB_PATH", str(tmp_path / "inventory_db.json"))
+    store = JsonInventoryStore()
+    store.add_item("Milk", "dairy")
+    store.add_items([{"name": " milk ", "category": "dairy", "qty": 2, "pose": None, "timestamp": "t"}])
+    store.add_item("MILK ", "dairy")
+    assert [(i["name"], i["qty"]) for i in store.get_all_items()] == [("Milk", 4)]
+    assert store.update_item_qty(" milk", 9)["qty"] == 9
+    assert store.delete_item("milk ")
+    assert store.get_all_items() == []
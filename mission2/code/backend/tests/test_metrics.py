@@ -0,0 +1,45 @@
+import pytest
+
+from metrics import Registry
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    frames = registry.counter("frames_total", "Frames", ("camera",))
+    frames.labels("top").inc()
+    frames.labels("top").inc(2)
+    frames.labels('si"de').inc()
+    depth = registry.gauge("queue_depth", "Depth")
+    depth.set_function(lambda: 3)
+    text = registry.render()
+    assert "# TYPE frames_total counter" in text
+    assert 'frames_total{camera="top"} 3.0' in text
+    assert 'frames_total{camera="si\\"de"} 1.0' in text
+    assert "queue_depth 3.0" in text
+    assert text.endswith("\n")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        latency.observe(value)
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_count 4" in lines
+    assert "latency_seconds_sum 6.25" in lines
+
+
+def test_failing_gauge_function_is_skipped():
+    registry = Registry()
+    registry.gauge("broken", "Broken").set_function(lambda: 1 / 0)
+    assert not [line for line in registry.render().splitlines() if line.startswith("broken ")]
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = Registry()
+    assert registry.counter("a_total", "A") is registry.counter("a_total", "A")
+    with pytest.raises(ValueError):
+        registry.gauge("a_total", "A")
@@ -0,0 +1,36 @@
+import numpy as np
+
+from perception.motion_gate import MotionGate
+
+
+def frame(value=100, patch=None):
+    image = np.full((120, 160, 3), value, np.uint8)
+    if patch is not None:
+        image[patch] = 255
+    return image
+
+
+def test_static_scene_is_skipped_until_max_skip():
+    gate = MotionGate(max_skip_seconds=1.0)
+    assert gate.should_run(frame(), now=0.0) # First frame is the reference
+    assert not gate.should_run(frame(), now=0.1)
+    assert not gate.should_run(frame(), now=0.9)
+    assert gate.should_run(frame(), now=1.1) # Forced refresh
+    assert gate.frames_skipped == 2
+
+
+def test_motion_and_force_open_the_gate():
+    gate = MotionGate()
+    gate.should_run(frame(), now=0.0)
+    assert gate.should_run(frame(patch=np.s_[40:60, 40:60]), now=0.1)
+    assert gate.should_run(frame(patch=np.s_[40:60, 40:60]), force=True, now=0.2)
+    gate.reset()
+    assert gate.should_run(frame(patch=np.s_[40:60, 40:60]), now=0.3)
+
+
+def test_small_changes_add_up_against_the_reference():
+    # Compared with the last inferred frame, not the previous one
+    gate = MotionGate(pixel_threshold=12, max_skip_seconds=10.0)
+    gate.should_run(frame(100), now=0.0)
+    assert not gate.should_run(frame(106), now=0.1)
+    assert gate.should_run(frame(114), now=0.2)
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from perception.propagation import FlowPropagator
+
+
+def scene(dx=0, dy=0, size=(480, 640)):
+    """Smooth random texture with a textured object at (200 + dx, 150 + dy)."""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(0, 255, size, dtype=np.uint8), (7, 7), 0)
+    patch = cv2.GaussianBlur(np.random.default_rng(1).integers(0, 255, (100, 80), dtype=np.uint8), (3, 3), 0)
+    image = background // 3
+    image[150 + dy:250 + dy, 200 + dx:280 + dx] = patch
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+BOX = np.array([[200, 150, 280, 250]], np.float32)
+
+
+def test_step_follows_the_object():
+    flow = FlowPropagator()
+    flow.observe(1, scene())
+    flow.reset(1, [7], BOX)
+    for i in range(2, 7):
+        ids, boxes = flow.step(i, scene(dx=6 * (i - 1), dy=3 * (i - 1)))
+        assert ids.tolist() == [7]
+    assert np.abs(boxes[0] - (BOX[0] + [30, 15, 30, 15])).max() < 3
+    assert not flow.needs_detection
+
+
+def test_reset_flows_old_detections_to_the_newest_frame():
+    flow = FlowPropagator()
+    flow.observe(1, scene())
+    flow.step(2, scene(dx=8))
+    flow.step(3, scene(dx=16))
+    ids, boxes, frame_id, _ = flow.reset(1, [3], BOX) # Inference of frame 1 finished late
+    assert frame_id == 3
+    assert np.abs(boxes[0] - (BOX[0] + [16, 0, 16, 0])).max() < 3
+
+
+def test_reset_of_a_forgotten_frame_keeps_boxes():
+    flow = FlowPropagator(history=2)
+    for i in range(1, 5):
+        flow.observe(i, scene())
+    ids, boxes, frame_id, timestamp = flow.reset(1, [3], BOX)
+    assert frame_id == 1 and timestamp is None
+    assert (boxes == BOX).all()
+    assert flow.needs_detection
+
+
+def test_lost_object_asks_for_detection():
+    flow = FlowPropagator()
+    flow.observe(1, scene())
+    flow.reset(1, [1], BOX)
+    flow.step(2, np.random.default_rng(5).integers(0, 255, (480, 640, 3), dtype=np.uint8))
+    assert flow.needs_detection
@@ -0,0 +1,60 @@
+import numpy as np
+
+from perception.tracker_state import TrackerState
+
+
+def feed(state, ids, box=(10.0, 20.0, 30.0, 40.0)):
+    ids = np.asarray(ids)
+    state.update_batch(ids, ["milk"] * len(ids), np.full(len(ids), 0.9),
+                       np.tile(np.asarray(box, np.float32), (len(ids), 1)), camera="cam", frame_id=7)
+
+
+def test_events_and_stability():
+    state = TrackerState(min_seen_count=2)
+    received = []
+    state.add_listener(lambda events: received.append(list(events)))
+
+    feed(state, [1, 2])
+    assert [kind for kind, _ in received[-1]] == ["track.appeared"] * 2
+    assert state.get_stable_objects() == []
+
+    feed(state, [1])
+    kind, data = received[-1][0]
+    assert kind == "track.stable"
+    assert data["id"] == 1 and data["name"] == "milk" and data["camera"] == "cam"
+    assert data["box"] == [10.0, 20.0, 30.0, 40.0] and data["frame_id"] == 7
+    assert [obj["id"] for obj in state.get_stable_objects()] == [1]
+
+
+def test_payloads_are_a_snapshot_of_the_update():
+    state = TrackerState(min_seen_count=1)
+    received = []
+    state.add_listener(received.append) # Keeps the lazy events, reads them later
+    feed(state, [1])
+    feed(state, [1], box=(50.0, 60.0, 70.0, 80.0))
+    assert [data["box"] for events in received for _, data in events] == [
+        [10.0, 20.0, 30.0, 40.0], [50.0, 60.0, 70.0, 80.0]]
+
+
+def test_update_boxes_moves_known_tracks_only():
+    state = TrackerState(min_seen_count=1)
+    feed(state, [1])
+    version = state.version
+    received = []
+    state.add_listener(lambda events: received.extend(events))
+    state.update_boxes(np.array([1, 99]), np.array([[1, 2, 3, 4], [5, 6, 7, 8]], np.float32), frame_id=8)
+    assert state.version > version
+    assert [(kind, data["id"], data["box"]) for kind, data in received] == [("track.updated", 1, [1, 2, 3, 4])]
+    assert state.get_stable_objects()[0]["frame_id"] == 8
+
+
+def test_prune_and_mark_logged():
+    state = TrackerState(min_seen_count=1)
+    received = []
+    state.add_listener(lambda events: received.extend(events))
+    feed(state, [1, 2])
+    assert state.mark_logged(1)["label"] == "milk"
+    assert received[-1][0] == "track.logged" and received[-1][1]["logged"]
+    state.prune(max_age_seconds=-1)
+    assert len(state) == 0
+    assert [data["id"] for kind, data in received if kind == "track.pruned"] == [1, 2]
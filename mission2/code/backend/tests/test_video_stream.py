@@ -0,0 +1,87 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from perception.frame_bus import FrameBus
+from video_stream import MjpegBroadcaster
+
+
+class FakeCamera:
+    """Publishes a new frame every few ms, like CameraStream's read loop."""
+    def __init__(self, fps=100, shape=(120, 160, 3)):
+        self.bus = FrameBus(shape)
+        self.fps = fps
+        self.stopped = False
+        self.t = threading.Thread(target=self._run, daemon=True)
+        self.t.start()
+
+    def _run(self):
+        i = 0
+        while not self.stopped:
+            self.bus.publish(np.full(self.bus.shape, i % 255, np.uint8))
+            i += 1
+            time.sleep(1 / self.fps)
+
+    def read_latest(self):
+        return self.bus.latest()
+
+    def wait_for_frame(self, last_id=0, timeout=1.0):
+        return self.bus.wait_next(last_id, timeout)
+
+    def stop(self):
+        self.stopped = True
+        self.t.join()
+
+
+@pytest.fixture
+def broadcaster():
+    camera = FakeCamera()
+    broadcaster = MjpegBroadcaster(camera, max_fps=50)
+    yield broadcaster
+    broadcaster.stop()
+    camera.stop()
+
+
+def test_subscribers_receive_jpeg_parts(broadcaster):
+    subs = [broadcaster.subscribe(broadcaster.rendition(width=80)) for _ in range(3)]
+    for sub in subs:
+        chunk = sub.get(timeout=2.0)
+        assert chunk is not None and chunk.startswith(b'--frame\r\n')
+        assert b'\xff\xd8' in chunk # JPEG SOI marker
+    # Same rendition: one encode serves every subscriber
+    assert broadcaster.cache.encodes <= broadcaster.frames_sent
+    for sub in subs:
+        sub.close()
+    assert broadcaster.subscribers == []
+
+
+def test_resubscribe_after_last_viewer_leaves(broadcaster):
+    # Churn viewers so some leave while the encoder thread is between checks
+    for _ in range(50):
+        sub = broadcaster.subscribe()
+        sub.get(timeout=0.01)
+        sub.close()
+    sub = broadcaster.subscribe()
+    assert sub.get(timeout=2.0) is not None
+    sub.close()
+    assert broadcaster.t is not None and broadcaster.t.is_alive()
+
+
+def test_encoder_failure_lets_next_subscriber_restart(broadcaster):
+    real_wait = broadcaster.camera_stream.wait_for_frame
+    def broken(*args, **kwargs):
+        raise RuntimeError("camera gone")
+    broadcaster.camera_stream.wait_for_frame = broken
+    sub = broadcaster.subscribe()
+    deadline = time.monotonic() + 2.0
+    while broadcaster.t is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert broadcaster.t is None
+    sub.close()
+
+    broadcaster.camera_stream.wait_for_frame = real_wait
+    sub = broadcaster.subscribe()
+    assert sub.get(timeout=2.0) is not None
+    sub.close()
@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from metrics import REGISTRY
+
+# Frame latency, "glass to X": how old the captured frame is when it reaches
+# a point of the pipeline (inference done, tracker updated, boxes propagated,
+# served on /objects, used for a /log pose). Capture times are time.monotonic(), stamped by
+# CameraStream; the clock is system-wide, so worker processes agree with it.
+
+FRAME_AGE = REGISTRY.histogram("frame_age_seconds",
+                               "Capture -> pipeline point (inference / tracker / propagated / objects / log)", ("point",))
+
+logger = logging.getLogger("Tracing")
+
+
+def to_wall(monotonic_ts):
+    """time.monotonic() stamp -> epoch seconds, for API clients."""
+    return time.time() - (time.monotonic() - monotonic_ts)
+
+
+class LatencyStats:
+    """Rolling window of frame ages per pipeline point, with percentiles for /status."""
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {} # point -> deque of seconds
+        self.series = {}
+
+    def record(self, point, captured, now=None):
+        """A frame captured at `captured` (monotonic) reached `point`."""
+        age = (now if now is not None else time.monotonic()) - captured
+        samples = self.samples.get(point)
+        if samples is None:
+            with self.lock:
+                samples = self.samples.setdefault(point, deque(maxlen=self.window))
+                self.series[point] = FRAME_AGE.labels(point)
+        samples.append(age)
+        self.series[point].observe(age)
+        return age
+
+    def percentiles(self):
+        out = {}
+        for point, samples in list(self.samples.items()):
+            ms = np.array(samples) * 1000
+            if not len(ms):
+                continue
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+            out[point] = {"count": len(ms), "p50_ms": round(float(p50), 1), "p90_ms": round(float(p90), 1),
+                          "p99_ms": round(float(p99), 1), "max_ms": round(float(ms.max()), 1)}
+        return out
+
+
+class FrameTracer:
+    """
+    Collects spans (capture, pipeline stages, tracker update, API serving) for
+    a window of time and dumps them as Chrome trace-event JSON (open in
+    chrome://tracing or ui.perfetto.dev). Spans carry the frame ids they
+    handled, so one frame can be followed from capture to the API.
+    Outside a window span() is a single attribute check.
+    """
+    def __init__(self, max_events=50000):
+        self.max_events = max_events
+        self.lock = threading.Lock()
+        self.active = False
+        self.until = 0.0
+        self.events = []
+        self.threads = {}
+        self.dropped = 0
+
+    def start(self, seconds):
+        """Start a window of `seconds`; False if one is already running."""
+        with self.lock:
+            if self.active:
+                return False
+            self.events, self.threads, self.dropped = [], {}, 0
+            self.until = time.monotonic() + seconds
+            self.active = True
+            return True
+
+    def span(self, name, start, end, args=None, category="perception"):
+        """Record a span between two time.monotonic() stamps."""
+        if not self.active:
+            return
+        if end > self.until:
+            self.active = False
+            return
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "ts": round(start * 1e6, 1),
+                 "dur": round((end - start) * 1e6, 1), "pid": os.getpid(), "tid": thread.ident}
+        if args:
+            event["args"] = args
+        with self.lock:
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    def stop(self):
+        self.active = False
+
+    def dump(self):
+        """The collected window as a Chrome trace object (dict, json.dumps-able)."""
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        meta = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in threads.items()]
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms",
+                "otherData": {"events_dropped": self.dropped}}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.dump(), f)
+
+
+LATENCY = LatencyStats()
+TRACER = FrameTracer()
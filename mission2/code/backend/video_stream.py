@@ -0,0 +1,271 @@
+import threading
+import time
+import logging
+from collections import namedtuple, OrderedDict
+import cv2
+
+from async_bridge import LoopSignal
+from metrics import REGISTRY
+
+ENCODE_TIME = REGISTRY.histogram("video_jpeg_encode_seconds", "JPEG encode per rendition (resize + imencode)")
+
+# How a client wants its preview: output width (None = full), JPEG quality, tracker overlay
+Rendition = namedtuple("Rendition", ["width", "quality", "annotated"])
+
+DEFAULT_QUALITY = 95 # cv2.imencode's own default
+MIN_WIDTH = 160
+MIN_QUALITY, MAX_QUALITY = 10, 95
+
+
+def make_rendition(width=None, quality=None, annotate=False, frame_width=640):
+    """
+    Normalize request parameters so equivalent requests share one cache entry:
+    widths are clamped and rounded to 16 px, quality clamped and rounded to 5.
+    """
+    if width is not None:
+        width = max(MIN_WIDTH, min(int(width), frame_width))
+        width = None if width >= frame_width else width - width % 16
+    if quality is None:
+        quality = DEFAULT_QUALITY
+    quality = max(MIN_QUALITY, min(int(quality), MAX_QUALITY))
+    quality -= quality % 5
+    return Rendition(width, quality, bool(annotate))
+
+
+def mjpeg_part(jpeg_bytes):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+
+
+class RenditionCache:
+    """
+    Encoded JPEGs per (frame_id, rendition) for the last few frames. Concurrent
+    requests for the same entry wait for the first one instead of encoding again.
+    The annotated base image (tracker boxes drawn on the frame) is also built
+    once per frame and shared by all annotated renditions.
+    """
+    def __init__(self, tracker_state=None, max_frames=2, camera=None):
+        self.tracker_state = tracker_state
+        self.camera = camera
+        self.max_frames = max_frames
+        self.lock = threading.Lock()
+        self.frames = OrderedDict() # frame_id -> { key: _Entry }
+        self.encodes = 0
+
+    class _Entry:
+        def __init__(self):
+            self.ready = threading.Event()
+            self.data = None
+
+    def _get_or_create(self, frame_id, key):
+        # Returns (entry, owner): owner is responsible for computing it
+        with self.lock:
+            entries = self.frames.get(frame_id)
+            if entries is None:
+                entries = self.frames[frame_id] = {}
+                while len(self.frames) > self.max_frames:
+                    self.frames.popitem(last=False)
+            entry = entries.get(key)
+            if entry is not None:
+                return entry, False
+            entry = entries[key] = self._Entry()
+            return entry, True
+
+    def _compute(self, frame_id, key, fn):
+        entry, owner = self._get_or_create(frame_id, key)
+        if owner:
+            try:
+                entry.data = fn()
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait(1.0)
+        return entry.data
+
+    def _annotated(self, packet):
+        def draw():
+            image = packet.frame.copy()
+            objects = self.tracker_state.get_stable_objects(camera=self.camera) if self.tracker_state else []
+            for obj in objects:
+                xmin, ymin, xmax, ymax = (int(c) for c in obj['box'])
+                color = (160, 160, 160) if obj['logged'] else (35, 142, 107) # BGR
+                cv2.rectangle(image, (xmin, ymin), (xmax, ymax), color, 2)
+                cv2.putText(image, f"{obj['name']} {int(obj['confidence'] * 100)}%",
+                            (xmin, max(ymin - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            return image
+        return self._compute(packet.frame_id, "annotated", draw)
+
+    def get(self, packet, rendition):
+        """JPEG bytes of `packet` in the given rendition, encoded at most once."""
+        def render():
+            image = self._annotated(packet) if rendition.annotated else packet.frame
+            if image is None:
+                return None
+            start = time.perf_counter()
+            if rendition.width:
+                h, w = image.shape[:2]
+                height = int(round(h * rendition.width / w))
+                image = cv2.resize(image, (rendition.width, height), interpolation=cv2.INTER_AREA)
+            ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, rendition.quality])
+            ENCODE_TIME.observe(time.perf_counter() - start)
+            self.encodes += 1
+            return buffer.tobytes() if ret else None
+        return self._compute(packet.frame_id, rendition, render)
+
+
+class FrameSubscriber:
+    """
+    Latest-only mailbox for one /video_feed client. If the client hasn't taken
+    the previous frame yet it is simply replaced: slow clients skip frames
+    instead of buffering them.
+    """
+    def __init__(self, broadcaster, rendition, fps):
+        self.broadcaster = broadcaster
+        self.rendition = rendition
+        self.interval = 1.0 / fps
+        self.next_due = 0.0
+        self.cond = threading.Condition()
+        self.chunk = None
+        self.closed = False
+        self.dropped = 0
+        self.signal = None # Set by aget(), wakes the async consumer
+
+    def offer(self, chunk):
+        with self.cond:
+            if self.chunk is not None:
+                self.dropped += 1
+            self.chunk = chunk
+            self.cond.notify()
+        if self.signal:
+            self.signal.set()
+
+    def get(self, timeout=5.0):
+        """Return the next multipart chunk, or None on timeout/close."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.chunk is not None or self.closed, timeout)
+            chunk, self.chunk = self.chunk, None
+            return chunk
+
+    async def aget(self, timeout=5.0):
+        """get() for the event loop: waits without holding a thread."""
+        if self.signal is None:
+            self.signal = LoopSignal()
+        deadline = time.monotonic() + timeout
+        while True:
+            self.signal.clear()
+            with self.cond:
+                if self.chunk is not None or self.closed:
+                    chunk, self.chunk = self.chunk, None
+                    return chunk
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not await self.signal.wait(remaining):
+                return None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.signal:
+            self.signal.set()
+        self.broadcaster.unsubscribe(self)
+
+
+class MjpegBroadcaster:
+    """
+    Encodes each new camera frame once per requested rendition and fans the
+    bytes out to every /video_feed subscriber of that rendition, each paced to
+    its own FPS (capped at max_fps). The encoder thread sleeps while nobody is
+    subscribed.
+    """
+    def __init__(self, camera_stream, tracker_state=None, max_fps=15.0, camera=None):
+        self.camera_stream = camera_stream
+        self.max_fps = max_fps
+        self.cache = RenditionCache(tracker_state, camera=camera) # camera: only annotate its tracks
+        self.logger = logging.getLogger("MjpegBroadcaster")
+
+        self.cond = threading.Condition()
+        self.subscribers = []
+        self.stopped = False
+        self.t = None
+        self.frames_sent = 0
+
+    def rendition(self, width=None, quality=None, annotate=False):
+        return make_rendition(width, quality, annotate, frame_width=self.camera_stream.bus.shape[1])
+
+    def subscribe(self, rendition=None, fps=None):
+        fps = min(fps or self.max_fps, self.max_fps)
+        sub = FrameSubscriber(self, rendition or self.rendition(), max(fps, 0.5))
+        with self.cond:
+            self.subscribers = self.subscribers + [sub]
+            if self.t is None:
+                self.t = threading.Thread(target=self.run, args=(), name="mjpeg-broadcaster")
+                self.t.daemon = True
+                self.t.start()
+            self.cond.notify_all()
+        self.logger.info(f"Viewer connected {sub.rendition} @ {fps} FPS ({len(self.subscribers)} total)")
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.cond:
+            self.subscribers = [s for s in self.subscribers if s is not sub]
+        self.logger.info(f"Viewer disconnected ({len(self.subscribers)} total)")
+
+    def latest_jpeg(self, rendition=None):
+        """JPEG of the newest camera frame, shared with the stream if already encoded."""
+        packet = self.camera_stream.read_latest()
+        if packet is None:
+            return None
+        return self.cache.get(packet, rendition or self.rendition())
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.logger.error(f"Encoder thread failed: {e}", exc_info=True)
+        finally:
+            with self.cond:
+                self.t = None # The next subscribe() starts a fresh thread
+
+    def _run(self):
+        last_id = 0
+        while not self.stopped:
+            # Idle (no encoding at all) while nobody is watching
+            with self.cond:
+                self.cond.wait_for(lambda: self.subscribers or self.stopped)
+                subscribers = self.subscribers
+            if self.stopped:
+                return
+
+            # Sleep until the earliest subscriber is due, then take the newest frame
+            now = time.monotonic()
+            wait = min(sub.next_due for sub in subscribers) - now
+            if wait > 0:
+                time.sleep(wait)
+            packet = self.camera_stream.wait_for_frame(last_id, timeout=1.0)
+            if packet is None:
+                continue
+            last_id = packet.frame_id
+
+            with self.cond:
+                subscribers = self.subscribers
+            now = time.monotonic()
+            due = [sub for sub in subscribers if sub.next_due <= now]
+            chunks = {}
+            for sub in due:
+                if sub.rendition not in chunks:
+                    jpeg = self.cache.get(packet, sub.rendition)
+                    chunks[sub.rendition] = mjpeg_part(jpeg) if jpeg else None
+                chunk = chunks[sub.rendition]
+                if chunk is not None:
+                    sub.offer(chunk)
+                    self.frames_sent += 1
+                sub.next_due += sub.interval
+                if sub.next_due < now:
+                    sub.next_due = now + sub.interval # Fell behind, don't burst to catch up
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.t and self.t.is_alive():
+            self.t.join()
@@ -14,11 +14,14 @@ const { width, height } = Dimensions.get('window');
 const CAM_WIDTH = width;
 const CAM_HEIGHT = width * (4 / 3);
 
+// Reduced preview rendition for phones on shared Wi-Fi (boxes stay in 640x480 coords)
+const PREVIEW_PARAMS = 'width=480&quality=70';
+
 export default function LiveViewScreen({ navigation }) {
     const [objects, setObjects] = useState([]);
     const [connected, setConnected] = useState(false);
 
-    const [imageUri, setImageUri] = useState(`${API_URL}/camera/latest?t=${Date.now()}`);
+    const [imageUri, setImageUri] = useState(`${API_URL}/camera/latest?${PREVIEW_PARAMS}&t=${Date.now()}`);
 
     // Refs for stability and auto-logging
     const failureCount = React.useRef(0);
@@ -148,7 +151,7 @@ export default function LiveViewScreen({ navigation }) {
             <View style={styles.cameraContainer}>
                 {/* Live Video Feed (WebView) */}
                 <WebView
-                    source={{ uri: `${API_URL}/video_feed` }}
+                    source={{ uri: `${API_URL}/video_feed?${PREVIEW_PARAMS}&fps=12` }}
                     style={styles.cameraPreview}
                     scrollEnabled={false}
                     javaScriptEnabled={true}